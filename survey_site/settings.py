@@ -69,8 +69,13 @@ CSRF_TRUSTED_ORIGINS = get_config(
 
 # Application definition
 
+# "public" is the slim profile for workers that mostly serve the survey: the
+# admin modules (and import-export, tablib, the analytics and exporters they
+# import) load on the first /admin/ request instead of at startup.
+SURVEY_APP_PROFILE = get_config('SURVEY_APP_PROFILE', default='full')
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig' if SURVEY_APP_PROFILE == 'public' else 'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -82,12 +87,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'surveys.middleware.StaticFilesMiddleware',
+    'surveys.timing.ServerTimingMiddleware',
+    'surveys.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'surveys.routers.ReadYourWritesMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -123,6 +130,120 @@ DATABASES = {
     )
 }
 
+# Read replica for admin changelists, analytics and exports (see surveys.routers).
+# Reads fall back to the primary while the replica is unreachable or more than
+# SURVEY_REPLICA_MAX_LAG seconds behind (checked every
+# SURVEY_REPLICA_CHECK_INTERVAL seconds), and for SURVEY_READ_YOUR_WRITES_SECONDS
+# after an admin user saves something. Leave it unset when running the tests;
+# the routing tests stand in a replica of their own.
+DATABASE_REPLICA_URL = get_config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=get_config('DB_CONN_MAX_AGE', default=600, cast=int),
+        ssl_require=get_config('DB_SSL_REQUIRE', default=False, cast=bool),
+    )
+    DATABASE_ROUTERS = ['surveys.routers.ReplicaRouter']
+SURVEY_REPLICA_MAX_LAG = get_config('SURVEY_REPLICA_MAX_LAG', default=30.0, cast=float)
+SURVEY_REPLICA_CHECK_INTERVAL = get_config('SURVEY_REPLICA_CHECK_INTERVAL', default=5.0, cast=float)
+SURVEY_READ_YOUR_WRITES_SECONDS = get_config('SURVEY_READ_YOUR_WRITES_SECONDS', default=60, cast=int)
+
+# Opt-in connection pool for PostgreSQL (psycopg 3 with psycopg_pool).
+# Each worker process keeps DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections open
+# and a request waits up to DB_POOL_TIMEOUT seconds for one. Connections idle
+# for DB_POOL_MAX_IDLE seconds are closed and none lives longer than
+# DB_POOL_MAX_LIFETIME. The pool replaces persistent connections (DB_CONN_MAX_AGE).
+# With DB_POOL_CHECK, the pool pings a connection before handing it out: for a
+# pooled database Django turns CONN_HEALTH_CHECKS into the pool's
+# check=ConnectionPool.check_connection (passing 'check' in the pool options
+# as well would be a duplicate keyword).
+DB_POOL = get_config('DB_POOL', default=False, cast=bool)
+if DB_POOL and DATABASES['default'].get('ENGINE') == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = get_config('DB_POOL_CHECK', default=True, cast=bool)
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': get_config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': get_config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': get_config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+        'max_idle': get_config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+        'max_lifetime': get_config('DB_POOL_MAX_LIFETIME', default=1800.0, cast=float),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Must be shared by every worker process on every host (database, Redis,
+# Memcached, ...) so catalog edits in the admin reach all of them. The default
+# is a table in the primary database (migration 0020 creates it); a file cache
+# only reaches the workers of one host (`check --deploy` warns about it).
+
+CACHE_BACKEND = get_config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': get_config('CACHE_LOCATION', default='') or (
+            'survey_cache' if CACHE_BACKEND.endswith('.DatabaseCache') else str(BASE_DIR / '.cache')
+        ),
+    }
+}
+
+
+# Survey
+
+# Seconds a worker trusts its question catalog snapshot before re-checking
+# the shared catalog version in the cache.
+SURVEY_CATALOG_CHECK_INTERVAL = get_config('SURVEY_CATALOG_CHECK_INTERVAL', default=1.0, cast=float)
+
+# Serve the survey GET page without a CSRF token in the HTML so a shared cache
+# (Cloudflare) can store it; browsers revalidate it against a strong ETag.
+SURVEY_EDGE_CACHE = get_config('SURVEY_EDGE_CACHE', default=False, cast=bool)
+SURVEY_EDGE_MAX_AGE = get_config('SURVEY_EDGE_MAX_AGE', default=0, cast=int)
+SURVEY_EDGE_S_MAXAGE = get_config('SURVEY_EDGE_S_MAXAGE', default=300, cast=int)
+
+# When set, validated submissions are appended to this local SQLite journal and
+# written to the database later by `manage.py flush_spool`.
+SURVEY_SPOOL_PATH = get_config('SURVEY_SPOOL_PATH', default='')
+
+# The survey keeps no session state: after a submission the thank-you page
+# gets a signed confirmation token in its URL, valid for this many seconds.
+SURVEY_CONFIRMATION_MAX_AGE = get_config('SURVEY_CONFIRMATION_MAX_AGE', default=600, cast=int)
+
+# Route the public survey pages to their native async views (set by asgi.py).
+SURVEY_ASYNC_VIEWS = get_config('SURVEY_ASYNC_VIEWS', default=False, cast=bool)
+
+# Rows each per-option answer counter is split over; more shards mean fewer
+# concurrent submissions waiting on the same row.
+SURVEY_TALLY_SHARDS = get_config('SURVEY_TALLY_SHARDS', default=8, cast=int)
+
+# Add a Server-Timing header (phases, query count and time) to every response
+# and log one JSON line per request to `surveys.timing`: at INFO, or at WARNING
+# for requests slower than SURVEY_SLOW_REQUEST_MS.
+SURVEY_SERVER_TIMING = get_config('SURVEY_SERVER_TIMING', default=True, cast=bool)
+SURVEY_SLOW_REQUEST_MS = get_config('SURVEY_SLOW_REQUEST_MS', default=1000, cast=int)
+
+# Prometheus metrics at /metrics, aggregated over worker processes through
+# per-thread sample files in SURVEY_METRICS_DIR (default .metrics/ next to
+# manage.py). Clear that directory when deploying. /metrics is only served
+# with a token set, and then requires `Authorization: Bearer <token>`.
+SURVEY_METRICS = get_config('SURVEY_METRICS', default=True, cast=bool)
+SURVEY_METRICS_DIR = get_config('SURVEY_METRICS_DIR', default='') or str(BASE_DIR / '.metrics')
+SURVEY_METRICS_TOKEN = get_config('SURVEY_METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'surveys.timing': {
+            'handlers': ['console'],
+            'level': get_config('SURVEY_TIMING_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -162,8 +283,22 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-if ENVIRONMENT == 'production':
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# The build pipeline (surveys.assets) fingerprints, minifies and precompresses
+# files and extracts critical CSS; it needs collectstatic, so it is on in
+# production by default.
+SURVEY_STATIC_PIPELINE = get_config('SURVEY_STATIC_PIPELINE', default=(ENVIRONMENT == 'production'), cast=bool)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': (
+            'surveys.assets.SurveyStaticFilesStorage'
+            if SURVEY_STATIC_PIPELINE
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+# Templates whose markup decides which CSS rules are inlined as critical CSS
+SURVEY_CRITICAL_TEMPLATES = ['base.html', 'surveys/survey_form.html']
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -14,10 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import include, path
 
+from surveys.startup import admin_urls
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    admin_urls("admin/"),
     path("", include("surveys.urls", namespace="surveys")),
 ]
@@ -1,14 +1,69 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.html import format_html, format_html_join
 from import_export.admin import ImportExportModelAdmin, ImportExportActionModelAdmin
 from import_export.formats import base_formats
 
-from .models import Question, QuestionOption, SurveyAnswer, SurveyResponse
+from .analytics import CrossTabForm, crosstab
+from .catalog import get_catalog
+from .changelist import KeysetPaginationMixin
+from .columnar import columnar_response, write_answers, write_archived_responses, write_responses
+from .exports import detailed_csv_response
+from .models import ArchivedResponse, OptionTally, Question, QuestionOption, SurveyAnswer, SurveyResponse
 from .resources import (
     QuestionResource,
     SurveyResponseResource,
     SurveyAnswerResource,
+    SurveyAnswerBulkResource,
     SurveyResponseDetailedResource,
 )
+from .routers import replica_reads
+from .search import search_answers
+from .tallies import option_totals, unlinked_choice_answers
+
+UNLINKED_ANSWERS_MESSAGE = (
+    "%d choice answers are stored as label text only and are not counted here; "
+    "run manage.py backfill_answer_options."
+)
+
+
+def _columnar_action(write, fmt, basename, permission="export"):
+    """Build an admin action that downloads the selection as a Parquet or Arrow file"""
+
+    @admin.action(description=f"Export selected as {fmt.capitalize()} (typed columns)", permissions=[permission])
+    def action(modeladmin, request, queryset):
+        try:
+            with replica_reads():
+                return columnar_response(write, queryset, fmt, basename)
+        except (ImproperlyConfigured, ValueError) as exc:
+            modeladmin.message_user(request, str(exc), messages.ERROR)
+
+    action.__name__ = f"export_{fmt}"
+    return action
+
+
+class ReplicaReadsMixin:
+    """Read changelists and import-export exports of response data from the replica (see surveys.routers)."""
+
+    def changelist_view(self, request, extra_context=None):
+        # POSTs run actions, which may write (delete_selected); export actions route their own reads.
+        if request.method not in ("GET", "HEAD"):
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # The page's rows are only read when the template renders.
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+    def get_export_data(self, file_format, request, queryset, **kwargs):
+        with replica_reads():
+            return super().get_export_data(file_format, request, queryset, **kwargs)
 
 
 class QuestionOptionInline(admin.TabularInline):
@@ -21,22 +76,75 @@ class QuestionOptionInline(admin.TabularInline):
 @admin.register(Question)
 class QuestionAdmin(ImportExportModelAdmin):
     resource_class = QuestionResource
-    list_display = ("id", "category", "target_audience", "is_active")
+    list_display = ("id", "category", "target_audience", "is_active", "answer_total")
     list_filter = ("target_audience", "is_active")
     search_fields = ("prompt", "category")
     ordering = ("id",)
     inlines = [QuestionOptionInline]
+    readonly_fields = ("option_tallies",)
     formats = (base_formats.CSV, base_formats.XLSX, base_formats.JSON)
 
+    def get_queryset(self, request):
+        """Annotate option answer totals from the tally shards, not from SurveyAnswer"""
+        totals = (
+            OptionTally.objects.filter(question=OuterRef("pk"))
+            .order_by()
+            .values("question")
+            .annotate(total=Sum("count"))
+            .values("total")
+        )
+        return super().get_queryset(request).annotate(answer_total=Coalesce(Subquery(totals), 0))
+
+    @admin.display(description="Option answers", ordering="answer_total")
+    def answer_total(self, obj):
+        return obj.answer_total
+
+    @admin.display(description="Answers per option")
+    def option_tallies(self, obj):
+        if obj.pk is None:
+            return "-"
+        options = list(obj.options.all())
+        if not options:
+            return "Free-text question"
+        totals = option_totals([obj.pk])
+        unlinked = unlinked_choice_answers([obj.pk])
+        roles = SurveyResponse.RespondentRole
+        header = format_html_join("", "<th>{}</th>", ((label,) for label in roles.labels))
+        rows = format_html_join(
+            "",
+            "<tr><td>{}</td>{}<td>{}</td></tr>",
+            (
+                (
+                    option.label,
+                    format_html_join(
+                        "", "<td>{}</td>", ((totals.get(option.pk, {}).get(role, 0),) for role in roles.values)
+                    ),
+                    sum(totals.get(option.pk, {}).values()),
+                )
+                for option in options
+            ),
+        )
+        table = format_html(
+            "<table><thead><tr><th>Option</th>{}<th>Total</th></tr></thead><tbody>{}</tbody></table>",
+            header,
+            rows,
+        )
+        if unlinked:
+            return format_html("<p>{}</p>{}", UNLINKED_ANSWERS_MESSAGE % unlinked, table)
+        return table
+
 
 class SurveyAnswerInline(admin.TabularInline):
     model = SurveyAnswer
     extra = 0
-    readonly_fields = ("question", "answer_text")
+    readonly_fields = ("question", "option", "answer_text")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("question", "option")
 
 
 @admin.register(SurveyResponse)
-class SurveyResponseAdmin(ImportExportActionModelAdmin):
+class SurveyResponseAdmin(ReplicaReadsMixin, KeysetPaginationMixin, ImportExportActionModelAdmin):
     """
     Admin for Survey Responses with export functionality.
     Provides two export options:
@@ -46,10 +154,16 @@ class SurveyResponseAdmin(ImportExportActionModelAdmin):
     resource_class = SurveyResponseDetailedResource
     list_display = ("respondent_name", "respondent_email", "respondent_role", "created_at")
     list_filter = ("respondent_role", "created_at")
-    search_fields = ("respondent_name", "respondent_email")
+    search_fields = ("=respondent_email", "respondent_name")
     inlines = [SurveyAnswerInline]
     readonly_fields = ("created_at", "updated_at")
     formats = (base_formats.CSV, base_formats.XLSX, base_formats.JSON)
+    change_list_template = "admin/surveys/surveyresponse/change_list.html"
+    actions = [
+        "export_detailed_csv_stream",
+        _columnar_action(write_responses, "parquet", "survey_responses"),
+        _columnar_action(write_responses, "arrow", "survey_responses"),
+    ]
     
     def get_resource_class(self):
         """Use detailed resource for export"""
@@ -58,12 +172,143 @@ class SurveyResponseAdmin(ImportExportActionModelAdmin):
     def get_export_resource_class(self):
         """Use detailed resource for export"""
         return SurveyResponseDetailedResource
+
+    @admin.action(
+        description="Export selected responses as CSV (streaming, one column per question)",
+        permissions=["export"],
+    )
+    def export_detailed_csv_stream(self, request, queryset):
+        """Constant-memory alternative to the detailed export for large selections"""
+        with replica_reads():
+            return detailed_csv_response(queryset, asynchronous=isinstance(request, ASGIRequest))
+
+    def get_urls(self):
+        return [
+            path(
+                "analytics/",
+                self.admin_site.admin_view(self.analytics_view),
+                name="surveys_surveyresponse_analytics",
+            ),
+        ] + super().get_urls()
+
+    def analytics_view(self, request):
+        """Cross-tabulate two choice questions, split by respondent role"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        catalog = get_catalog()
+        form = CrossTabForm(catalog, request.GET or None)
+        tables = []
+        if form.is_valid():
+            try:
+                with replica_reads():
+                    tables = crosstab(
+                        catalog,
+                        form.cleaned_data["row_question"],
+                        form.cleaned_data["column_question"],
+                        form.cleaned_data["start"],
+                        form.cleaned_data["end"],
+                    )
+                    unlinked = unlinked_choice_answers(
+                        [form.cleaned_data["row_question"], form.cleaned_data["column_question"]]
+                    )
+                if unlinked:
+                    self.message_user(request, UNLINKED_ANSWERS_MESSAGE % unlinked, messages.WARNING)
+            except ImproperlyConfigured as exc:
+                self.message_user(request, str(exc), messages.ERROR)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Response analytics",
+            "form": form,
+            "tables": tables,
+        }
+        return TemplateResponse(request, "admin/surveys/analytics.html", context)
+
+
 @admin.register(SurveyAnswer)
-class SurveyAnswerAdmin(ImportExportModelAdmin):
+class SurveyAnswerAdmin(ReplicaReadsMixin, KeysetPaginationMixin, ImportExportModelAdmin):
     """Admin for individual Survey Answers - useful for detailed analysis"""
     resource_class = SurveyAnswerResource
-    list_display = ("response", "question", "answer_text", "created_at")
-    list_filter = ("question__category", "created_at")
-    search_fields = ("answer_text", "response__respondent_name", "question__prompt")
+    # Imports are bulk inserts; one log entry per imported answer would double the writes.
+    skip_admin_log = True
+    list_display = ("response", "question", "answer", "created_at")
+    list_select_related = ("response", "question", "option")
+    list_filter = ("question__category", "question", "created_at")
+    # Exact email matches use an index, other terms the full-text index (see
+    # get_search_results); pick the option or question with the filters.
+    search_fields = ("=response__respondent_email", "answer_text")
     readonly_fields = ("created_at",)
     formats = (base_formats.CSV, base_formats.XLSX, base_formats.JSON)
+    actions = [
+        _columnar_action(write_answers, "parquet", "survey_answers"),
+        _columnar_action(write_answers, "arrow", "survey_answers"),
+    ]
+
+    def get_import_resource_classes(self, request):
+        """Import in batches (see SurveyAnswerBulkResource); exports keep the detailed columns"""
+        return [SurveyAnswerBulkResource]
+
+    # Choice answers leave answer_text empty; sort them by their option's label.
+    @admin.display(description="Answer", ordering=Coalesce("option__label", "answer_text"))
+    def answer(self, obj):
+        return obj.answer_display
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        if "@" in search_term:
+            # An address is most likely a respondent's; otherwise it is searched for in the answers.
+            by_email = queryset.filter(response__respondent_email=search_term.strip())
+            if by_email.exists():
+                return by_email, False
+        # Results come back best match first.
+        return search_answers(search_term, queryset), False
+
+
+@admin.register(ArchivedResponse)
+class ArchivedResponseAdmin(ReplicaReadsMixin, KeysetPaginationMixin, admin.ModelAdmin):
+    """Read-only view of responses moved out by ``manage.py archive_responses``"""
+    list_display = ("response_id", "respondent_role", "created_at", "archived_at")
+    list_filter = ("respondent_role", "created_at")
+    search_fields = ("=response_id",)
+    fields = ("response_id", "respondent_role", "created_at", "archived_at", "respondent", "answers")
+    readonly_fields = fields
+    actions = [
+        "export_detailed_csv_stream",
+        _columnar_action(write_archived_responses, "parquet", "archived_responses", "view"),
+        _columnar_action(write_archived_responses, "arrow", "archived_responses", "view"),
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Export selected as CSV (one column per question)", permissions=["view"])
+    def export_detailed_csv_stream(self, request, queryset):
+        with replica_reads():
+            return detailed_csv_response(
+                SurveyResponse.objects.none(), "archived_responses.csv", archived=queryset,
+                asynchronous=isinstance(request, ASGIRequest),
+            )
+
+    @admin.display(description="Respondent")
+    def respondent(self, obj):
+        data = ArchivedResponse.unpack(obj.payload)
+        return " ".join(filter(None, [data["respondent_name"], data["respondent_email"]])) or "Anonymous"
+
+    @admin.display(description="Answers")
+    def answers(self, obj):
+        prompts = {question.id: question.prompt for question in get_catalog()}
+        return format_html(
+            "<table><tbody>{}</tbody></table>",
+            format_html_join(
+                "",
+                "<tr><th>{}</th><td>{}</td></tr>",
+                (
+                    (f"Q{key}: {prompts.get(int(key), '(retired question)')}", text)
+                    for key, text in ArchivedResponse.unpack(obj.payload)["answers"].items()
+                ),
+            ),
+        )
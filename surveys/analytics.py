@@ -0,0 +1,205 @@
+"""
+Cross-tabulation of two choice questions for the admin analytics page.
+
+Choice answers are loaded into NumPy arrays of option ids with one query per
+question and mapped to small integer codes through a lookup array; the counts
+for every respondent role come from a single ``bincount`` over the combined
+codes. NumPy is optional and imported on first use.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+
+from django import forms
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+from .catalog import Catalog, QuestionSnapshot
+from .models import SurveyAnswer, SurveyResponse
+
+ROLES = SurveyResponse.RespondentRole
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImproperlyConfigured('The analytics page requires NumPy (pip install numpy).') from exc
+    return numpy
+
+
+class CrossTabForm(forms.Form):
+    row_question = forms.TypedChoiceField(label='Rows', coerce=int)
+    column_question = forms.TypedChoiceField(label='Columns', coerce=int)
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def __init__(self, catalog: Catalog, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        choices = [(q.id, f'Q{q.id}: {q.prompt[:60]}') for q in catalog if q.has_options]
+        self.fields['row_question'].choices = choices
+        self.fields['column_question'].choices = choices
+        self.catalog = catalog
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            self.add_error('end', 'The end date must not be before the start date.')
+        if cleaned_data.get('row_question') and cleaned_data.get('row_question') == cleaned_data.get('column_question'):
+            self.add_error('column_question', 'Pick two different questions.')
+        return cleaned_data
+
+
+@dataclass
+class ChiSquare:
+    statistic: float
+    dof: int
+    p_value: float
+    cramers_v: float
+
+
+@dataclass
+class CrossTab:
+    title: str
+    rows: list[str]
+    columns: list[str]
+    counts: list[list[int]]
+    row_percentages: list[list[float]]
+    total: int
+    chi_square: ChiSquare | None
+
+    @property
+    def body(self) -> list[tuple[str, list[tuple[int, float]]]]:
+        return [
+            (label, list(zip(counts, percentages)))
+            for label, counts, percentages in zip(self.rows, self.counts, self.row_percentages)
+        ]
+
+
+def _window(start: date | None, end: date | None) -> dict:
+    """Lookups for responses created between the start and end dates, inclusive."""
+    lookups = {}
+    tz = timezone.get_current_timezone()
+    if start:
+        lookups['response__created_at__gte'] = datetime.combine(start, time.min, tzinfo=tz)
+    if end:
+        lookups['response__created_at__lt'] = datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)
+    return lookups
+
+
+def load_codes(question: QuestionSnapshot, start: date | None = None, end: date | None = None):
+    """
+    Return ``(response_ids, option_codes, role_codes)`` arrays for the choice
+    answers to ``question``, sorted by response id. Option codes index
+    ``question.options``; role codes index ``RespondentRole.values``.
+    """
+    np = _numpy()
+    role_code = Case(
+        *(When(response__respondent_role=role, then=Value(index)) for index, role in enumerate(ROLES.values)),
+        default=Value(-1),
+        output_field=IntegerField(),
+    )
+    rows = (
+        SurveyAnswer.objects.filter(question_id=question.id, option__isnull=False, **_window(start, end))
+        .order_by('response_id')
+        .annotate(role_code=role_code)
+        .values_list('response_id', 'option_id', 'role_code')
+    )
+    flat = np.fromiter(chain.from_iterable(rows.iterator(chunk_size=20000)), dtype=np.int64).reshape(-1, 3)
+    # Option primary keys -> positions in question.options, via a lookup array.
+    option_ids = np.array([option.id for option in question.options], dtype=np.int64)
+    lookup = np.full(max(option_ids.max(initial=0), flat[:, 1].max(initial=0)) + 1, -1, dtype=np.int64)
+    lookup[option_ids] = np.arange(len(option_ids))
+    codes = lookup[flat[:, 1]]
+    keep = (codes >= 0) & (flat[:, 2] >= 0)
+    return flat[keep, 0], codes[keep], flat[keep, 2]
+
+
+def chi_square(counts) -> ChiSquare | None:
+    """Pearson's chi-square test of independence over the non-empty rows and columns."""
+    np = _numpy()
+    observed = counts[counts.sum(axis=1) > 0][:, counts.sum(axis=0) > 0].astype(float)
+    if observed.shape[0] < 2 or observed.shape[1] < 2:
+        return None
+    total = observed.sum()
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / total
+    statistic = float(((observed - expected) ** 2 / expected).sum())
+    dof = (observed.shape[0] - 1) * (observed.shape[1] - 1)
+    return ChiSquare(
+        statistic=statistic,
+        dof=dof,
+        p_value=chi2_sf(statistic, dof),
+        cramers_v=math.sqrt(statistic / (total * (min(observed.shape) - 1))),
+    )
+
+
+def chi2_sf(statistic: float, dof: int) -> float:
+    """Survival function of the chi-square distribution (regularized upper incomplete gamma)."""
+    if statistic <= 0:
+        return 1.0
+    a, x = dof / 2.0, statistic / 2.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower incomplete gamma.
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Continued fraction for the upper incomplete gamma (modified Lentz).
+    tiny = 1e-300
+    b = x + 1.0 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2.0
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+def crosstab(catalog: Catalog, row_question_id: int, column_question_id: int,
+             start: date | None = None, end: date | None = None) -> list[CrossTab]:
+    """Cross-tabulate two choice questions: one table for all respondents, then one per role."""
+    np = _numpy()
+    row_question = catalog.by_id[row_question_id]
+    column_question = catalog.by_id[column_question_id]
+    row_ids, row_codes, roles = load_codes(row_question, start, end)
+    column_ids, column_codes, _ = load_codes(column_question, start, end)
+    _, row_index, column_index = np.intersect1d(row_ids, column_ids, assume_unique=True, return_indices=True)
+
+    n_rows, n_columns, n_roles = len(row_question.options), len(column_question.options), len(ROLES.values)
+    cells = (roles[row_index] * n_rows + row_codes[row_index]) * n_columns + column_codes[column_index]
+    by_role = np.bincount(cells, minlength=n_roles * n_rows * n_columns).reshape(n_roles, n_rows, n_columns)
+
+    slices = [('All respondents', by_role.sum(axis=0))]
+    slices.extend(zip(ROLES.labels, by_role))
+    tables = []
+    for title, counts in slices:
+        row_totals = counts.sum(axis=1, keepdims=True)
+        percentages = np.divide(counts * 100.0, row_totals, out=np.zeros(counts.shape), where=row_totals > 0)
+        tables.append(CrossTab(
+            title=title,
+            rows=[option.label for option in row_question.options],
+            columns=[option.label for option in column_question.options],
+            counts=counts.tolist(),
+            row_percentages=percentages.round(1).tolist(),
+            total=int(counts.sum()),
+            chi_square=chi_square(counts),
+        ))
+    return tables
@@ -0,0 +1,95 @@
+"""
+Moving old responses out of the live tables.
+
+``archive_responses`` copies each response, with its answers as they appear
+in ``ResponseDocument``, into one compressed ``ArchivedResponse`` row. It then
+deletes the response, its answers and its document, one primary-key chunk
+per transaction. Deletes are plain SQL (no per-row signals); the tallies are
+counted down in the same transaction, so they keep matching ``SurveyAnswer``.
+The exports read the archive again when asked to (``archived=``).
+"""
+
+from collections import Counter
+from datetime import datetime
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .documents import document_answers
+from .exports import RESPONSE_FIELDS, answers_for_chunk, iter_pk_chunks
+from .models import ArchivedResponse, ResponseDocument, SurveyAnswer, SurveyResponse
+from .tallies import apply_deltas, count_answers
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def archivable(before: datetime | None = None, retired_questions: bool = False):
+    """
+    Responses created before ``before``, or (with ``retired_questions``)
+    without any answer to an active question; either criterion qualifies.
+    """
+    criteria = Q()
+    if before is not None:
+        criteria |= Q(created_at__lt=before)
+    if retired_questions:
+        criteria |= ~Q(pk__in=SurveyAnswer.objects.filter(question__is_active=True).values('response_id'))
+    if not criteria:
+        return SurveyResponse.objects.none()
+    return SurveyResponse.objects.filter(criteria)
+
+
+def _delete(model, column: str, ids: list[int]) -> None:
+    with connections['default'].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {model._meta.db_table} WHERE {column} IN ({', '.join(['%s'] * len(ids))})",
+            ids,
+        )
+
+
+def archive_chunk(chunk: list[tuple]) -> int:
+    """Archive the responses of one chunk of ``RESPONSE_FIELDS`` + ``submission_id`` rows."""
+    ids = [row[0] for row in chunk]
+    with transaction.atomic():
+        # Lock the responses, then re-read them; edits that committed first are archived too.
+        chunk = list(
+            SurveyResponse.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by('pk')
+            .values_list(*RESPONSE_FIELDS, 'submission_id')
+        )
+        if not chunk:
+            return 0
+        ids = [row[0] for row in chunk]
+        answers = answers_for_chunk(chunk, labels=True)
+        ArchivedResponse.objects.bulk_create([
+            ArchivedResponse(
+                response_id=response_id,
+                submission_id=submission_id,
+                respondent_role=role,
+                created_at=created_at,
+                payload=ArchivedResponse.pack({
+                    'respondent_name': name,
+                    'respondent_email': email,
+                    'answers': document_answers(answers.get(response_id, {})),
+                }),
+            )
+            for response_id, name, email, role, created_at, submission_id in chunk
+        ])
+        deltas = Counter()
+        deltas.subtract(count_answers(
+            SurveyAnswer.objects.filter(response_id__in=ids)
+            .values_list('question_id', 'option_id', 'response__respondent_role')
+        ))
+        apply_deltas(deltas)
+        _delete(SurveyAnswer, 'response_id', ids)
+        _delete(ResponseDocument, 'response_id', ids)
+        _delete(SurveyResponse, 'id', ids)
+    return len(chunk)
+
+
+def archive_responses(queryset, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Archive every response of ``queryset``, one transaction per chunk. Returns the number archived."""
+    archived = 0
+    for chunk in iter_pk_chunks(queryset, ('id',), chunk_size):
+        archived += archive_chunk(chunk)
+    return archived
@@ -0,0 +1,246 @@
+"""
+The ``collectstatic`` build for the survey pages.
+
+``SurveyStaticFilesStorage`` extends WhiteNoise's compressed manifest storage,
+which fingerprints every file, writes gzip (and, with ``pip install brotli``,
+brotli) variants and lets WhiteNoise serve fingerprinted names with immutable
+cache headers. Before fingerprinting it also:
+
+- minifies every stylesheet, so the hash covers the minified file;
+- writes WebP and AVIF variants of PNG and JPEG images, when Pillow can
+  encode them and the result is smaller than the original.
+
+Afterwards it extracts the critical CSS of each stylesheet: the rules whose
+selectors only use elements, classes and ids found in
+``SURVEY_CRITICAL_TEMPLATES``. It is stored under ``critical/`` and inlined by
+the ``survey_assets`` template tags, which load the full stylesheet without
+blocking rendering.
+"""
+
+import io
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+CRITICAL_DIR = 'critical'
+
+# Variants written for raster images, in order of preference: (extension, media type, Pillow save options).
+IMAGE_VARIANTS = (
+    ('avif', 'image/avif', {'quality': 60}),
+    ('webp', 'image/webp', {'quality': 80}),
+)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Elements that form widgets and the survey_assets tags add to the templates' own markup.
+RENDERED_TAGS = {
+    'html', 'head', 'body', 'div', 'label', 'input', 'textarea', 'select', 'option', 'ul', 'li', 'span',
+    'picture', 'source', 'img',
+}
+
+_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and redundant whitespace; strings are left alone."""
+    parts = _STRING.split(_COMMENT.sub('', css))
+    for index in range(0, len(parts), 2):
+        text = re.sub(r'\s+', ' ', parts[index])
+        # Not around ":" before a selector's pseudo-class, nor "+"/"-", which calc() needs spaced.
+        text = re.sub(r' ?([{};,>]) ?', r'\1', text)
+        text = re.sub(r': ', ':', text)
+        parts[index] = text.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def _blocks(css: str):
+    """Yield ``(prelude, body)`` for each top-level block of minified CSS; body is None for statements."""
+    depth = 0
+    start = 0
+    prelude = None
+    quote = None
+    for index, char in enumerate(css):
+        if quote:
+            if char == quote and css[index - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude = css[start:index].strip()
+                start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield prelude, css[start:index]
+                start = index + 1
+        elif char == ';' and depth == 0:
+            yield css[start:index].strip(), None
+            start = index + 1
+
+
+def _split_selectors(prelude: str) -> list[str]:
+    selectors, depth, start = [], 0, 0
+    for index, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index])
+            start = index + 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+class TemplateVocabulary:
+    """The element names, classes and ids that appear in some templates' markup."""
+
+    def __init__(self, sources: list[str]):
+        self.tags = set(RENDERED_TAGS)
+        self.classes = set()
+        self.ids = set()
+        # Stylesheets the templates load with {% stylesheet %}: the ones that get critical CSS.
+        self.stylesheets = set()
+        for source in sources:
+            self.stylesheets.update(re.findall(r'{%\s*stylesheet\s+["\']([^"\']+)["\']', source))
+            # Template tags and variables are not markup; keep the literal text around them.
+            markup = re.sub(r'{%.*?%}|{{.*?}}|{#.*?#}', ' ', source, flags=re.DOTALL)
+            self.tags.update(tag.lower() for tag in re.findall(r'<([a-zA-Z][\w-]*)', markup))
+            for value in re.findall(r'\bclass\s*=\s*["\']([^"\']*)["\']', markup):
+                self.classes.update(value.split())
+            self.ids.update(re.findall(r'\bid\s*=\s*["\']([^"\']+)["\']', markup))
+
+    @classmethod
+    def from_templates(cls, names: list[str]) -> 'TemplateVocabulary':
+        sources = []
+        for name in names:
+            try:
+                sources.append(get_template(name).template.source)
+            except TemplateDoesNotExist:
+                continue
+        return cls(sources)
+
+    def matches(self, selector: str) -> bool:
+        # Pseudo-classes, pseudo-elements and attribute tests don't change which elements qualify.
+        selector = re.sub(r'::?[\w-]+(\([^)]*\))?|\[[^\]]*\]', '', selector)
+        classes = set(re.findall(r'\.([\w-]+)', selector))
+        ids = set(re.findall(r'#([\w-]+)', selector))
+        tags = {tag.lower() for tag in re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', selector)}
+        return classes <= self.classes and ids <= self.ids and tags <= self.tags
+
+
+def critical_css(css: str, vocabulary: TemplateVocabulary) -> str:
+    """The rules of minified ``css`` that can apply to the vocabulary's markup."""
+    kept = []
+    keyframes = {}
+    for prelude, body in _blocks(css):
+        if body is None:
+            if prelude.startswith(('@import', '@charset')):
+                kept.append(prelude + ';')
+        elif prelude.startswith(('@media', '@supports')):
+            inner = critical_css(body, vocabulary)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith(('@keyframes', '@-webkit-keyframes')):
+            keyframes[prelude.split()[-1]] = f'{prelude}{{{body}}}'
+        elif prelude.startswith('@font-face'):
+            kept.append(f'{prelude}{{{body}}}')
+        elif not prelude.startswith('@'):
+            selectors = [selector for selector in _split_selectors(prelude) if vocabulary.matches(selector)]
+            if selectors:
+                kept.append(f"{','.join(selectors)}{{{body}}}")
+    # Animations are kept only when a kept rule uses them.
+    used = ''.join(kept)
+    kept.extend(rule for name, rule in keyframes.items() if re.search(rf'\b{re.escape(name)}\b', used))
+    return ''.join(kept)
+
+
+def image_variants(data: bytes) -> dict[str, bytes]:
+    """Encoded WebP/AVIF variants of an image that are smaller than ``data``; empty without Pillow."""
+    try:
+        from PIL import Image, features
+    except ImportError:  # optional dependency
+        return {}
+    variants = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        for extension, _, options in IMAGE_VARIANTS:
+            if not features.check(extension):
+                continue
+            output = io.BytesIO()
+            image.save(output, format=extension.upper(), **options)
+            if output.tell() < len(data):
+                variants[extension] = output.getvalue()
+    return variants
+
+
+def variant_name(name: str, extension: str) -> str:
+    return f'{posixpath.splitext(name)[0]}.{extension}'
+
+
+def critical_name(name: str) -> str:
+    return posixpath.join(CRITICAL_DIR, name)
+
+
+class SurveyStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Compressed manifest storage that minifies CSS, adds image variants and extracts critical CSS."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+        vocabulary = TemplateVocabulary.from_templates(
+            getattr(settings, 'SURVEY_CRITICAL_TEMPLATES', ['base.html', 'surveys/survey_form.html'])
+        )
+        paths = dict(paths)
+        stylesheets = {}
+        for name, (storage, path) in list(paths.items()):
+            lowered = name.lower()
+            if lowered.endswith('.css'):
+                with storage.open(path) as file:
+                    css = file.read().decode('utf-8')
+                stylesheets[name] = minify_css(css)
+                self._replace(name, stylesheets[name].encode('utf-8'))
+                paths[name] = (self, name)
+            elif lowered.endswith(IMAGE_EXTENSIONS):
+                with storage.open(path) as file:
+                    variants = image_variants(file.read())
+                for extension, data in variants.items():
+                    variant = variant_name(name, extension)
+                    if variant not in paths:
+                        self._replace(variant, data)
+                        paths[variant] = (self, variant)
+
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        for name, css in stylesheets.items():
+            if name in vocabulary.stylesheets:
+                css = self._absolute_urls(name, critical_css(css, vocabulary))
+                self._replace(critical_name(name), css.encode('utf-8'))
+                yield name, critical_name(name), True
+
+    def _replace(self, name: str, data: bytes) -> None:
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
+
+    def _absolute_urls(self, name: str, css: str) -> str:
+        """Inlined CSS resolves ``url()`` against the page, so point relative ones at their fingerprinted URL."""
+        def replace(match):
+            url = match.group(2)
+            if re.match(r'^(?:[a-z]+:|/|#)', url):
+                return match.group(0)
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(name), url.split('#')[0].split('?')[0]))
+            try:
+                return f'url("{self.url(target)}")'
+            except ValueError:
+                return match.group(0)
+        return _URL.sub(replace, css)
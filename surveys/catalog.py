@@ -0,0 +1,258 @@
+"""
+Immutable, process-local snapshot of the active question catalog.
+
+The survey pages, ``SurveyForm`` and the export resources all read the same
+questions and options. Instead of querying them on every request, each worker
+process keeps one ``Catalog`` snapshot and only rebuilds it when the shared
+catalog version (stored in the Django cache) changes. Saving or deleting a
+``Question``/``QuestionOption`` bumps that version, see ``surveys.signals``.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable, Iterator, Mapping
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Question, QuestionOption
+
+VERSION_CACHE_KEY = "surveys:catalog:version"
+
+# Q1 answers that mark a respondent as a builder.
+BUILDER_ROLE_VALUES = frozenset({"developer", "founder"})
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class OptionSnapshot:
+    id: int
+    value: str
+    label: str
+    order: int
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class QuestionSnapshot:
+    id: int
+    category: str
+    prompt: str
+    target_audience: str
+    note: str
+    options: tuple[OptionSnapshot, ...]
+    labels: Mapping[str, str]
+
+    @property
+    def is_builder_only(self) -> bool:
+        return self.target_audience == Question.TargetAudience.BUILDERS
+
+    @property
+    def has_options(self) -> bool:
+        return bool(self.options)
+
+    def label_for(self, value: str) -> str:
+        """Return the display label for an option value (free text passes through)."""
+        return self.labels.get(value, value)
+
+    def option_for_value(self, value: str) -> OptionSnapshot | None:
+        for option in self.options:
+            if option.value == value:
+                return option
+        return None
+
+    def option_for_id(self, option_id: int) -> OptionSnapshot | None:
+        for option in self.options:
+            if option.id == option_id:
+                return option
+        return None
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Catalog:
+    version: str
+    digest: str
+    questions: tuple[QuestionSnapshot, ...]
+    by_id: Mapping[int, QuestionSnapshot]
+
+    def __iter__(self) -> Iterator[QuestionSnapshot]:
+        return iter(self.questions)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    @classmethod
+    def build(cls, question_rows: Iterable[tuple], option_rows: Iterable[tuple], version: str = "") -> "Catalog":
+        """
+        Assemble a catalog from plain rows.
+
+        ``question_rows`` are ``(id, category, prompt, target_audience, note)``
+        tuples in display order; ``option_rows`` are
+        ``(id, question_id, value, label, order)`` tuples in display order.
+        """
+        options_by_question: dict[int, list[OptionSnapshot]] = {}
+        for option_id, question_id, value, label, order in option_rows:
+            options_by_question.setdefault(question_id, []).append(
+                OptionSnapshot(id=option_id, value=value, label=label, order=order)
+            )
+
+        questions = []
+        for question_id, category, prompt, target_audience, note in question_rows:
+            options = tuple(options_by_question.get(question_id, ()))
+            questions.append(
+                QuestionSnapshot(
+                    id=question_id,
+                    category=category,
+                    prompt=prompt,
+                    target_audience=target_audience,
+                    note=note,
+                    options=options,
+                    labels=MappingProxyType({opt.value: opt.label for opt in options}),
+                )
+            )
+
+        digest_source = [
+            [q.id, q.category, q.prompt, q.target_audience, q.note,
+             [[o.id, o.value, o.label, o.order] for o in q.options]]
+            for q in questions
+        ]
+        digest = hashlib.sha256(
+            json.dumps(digest_source, separators=(",", ":")).encode()
+        ).hexdigest()[:16]
+
+        return cls(
+            version=version or digest,
+            digest=digest,
+            questions=tuple(questions),
+            by_id=MappingProxyType({q.id: q for q in questions}),
+        )
+
+
+QUESTION_FIELDS = ("id", "category", "prompt", "target_audience", "note")
+OPTION_FIELDS = ("id", "question_id", "value", "label", "order")
+
+
+def active_question_rows():
+    return Question.objects.filter(is_active=True).order_by("id").values_list(*QUESTION_FIELDS)
+
+
+def active_option_rows():
+    return (
+        QuestionOption.objects.filter(question__is_active=True)
+        .order_by("question_id", "order", "id")
+        .values_list(*OPTION_FIELDS)
+    )
+
+
+def load_catalog(version: str = "") -> Catalog:
+    """Build a fresh catalog from the database (two queries)."""
+    return Catalog.build(active_question_rows(), active_option_rows(), version=version)
+
+
+async def aload_catalog(version: str = "") -> Catalog:
+    """Async variant of ``load_catalog`` for the ASGI views."""
+    question_rows = [row async for row in active_question_rows()]
+    option_rows = [row async for row in active_option_rows()]
+    return Catalog.build(question_rows, option_rows, version=version)
+
+
+def _version_cache():
+    return caches[getattr(settings, "SURVEY_CATALOG_CACHE", "default")]
+
+
+def _check_interval() -> float:
+    return getattr(settings, "SURVEY_CATALOG_CHECK_INTERVAL", 1.0)
+
+
+def current_version() -> str:
+    """Return the shared catalog version, creating one if the cache lost it."""
+    cache = _version_cache()
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex[:12], timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+async def acurrent_version() -> str:
+    cache = _version_cache()
+    version = await cache.aget(VERSION_CACHE_KEY)
+    if version is None:
+        await cache.aadd(VERSION_CACHE_KEY, uuid.uuid4().hex[:12], timeout=None)
+        version = await cache.aget(VERSION_CACHE_KEY)
+    return version
+
+
+class _LocalSnapshot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.catalog: Catalog | None = None
+        self.checked_at = 0.0
+
+    def fresh(self) -> Catalog | None:
+        """Return the held catalog if it was validated within the check interval."""
+        catalog = self.catalog
+        if catalog is not None and time.monotonic() - self.checked_at < _check_interval():
+            return catalog
+        return None
+
+    def store(self, catalog: Catalog) -> Catalog:
+        self.catalog = catalog
+        self.checked_at = time.monotonic()
+        return catalog
+
+
+_local = _LocalSnapshot()
+
+
+def get_catalog() -> Catalog:
+    """
+    Return the active catalog snapshot.
+
+    In steady state this touches only the version key in the cache (at most
+    once per ``SURVEY_CATALOG_CHECK_INTERVAL`` seconds) and makes no queries.
+    """
+    catalog = _local.fresh()
+    if catalog is not None:
+        return catalog
+
+    version = current_version()
+    catalog = _local.catalog
+    if catalog is not None and catalog.version == version:
+        return _local.store(catalog)
+
+    with _local.lock:
+        catalog = _local.catalog
+        if catalog is None or catalog.version != version:
+            catalog = load_catalog(version)
+        return _local.store(catalog)
+
+
+async def aget_catalog() -> Catalog:
+    """
+    Async variant of ``get_catalog``. Concurrent rebuilds are not serialized
+    (they would have to block the event loop on the lock); they are rare and
+    produce identical snapshots.
+    """
+    catalog = _local.fresh()
+    if catalog is not None:
+        return catalog
+
+    version = await acurrent_version()
+    catalog = _local.catalog
+    if catalog is None or catalog.version != version:
+        catalog = await aload_catalog(version)
+    return _local.store(catalog)
+
+
+def invalidate(*, broadcast: bool = True) -> None:
+    """
+    Drop this process' snapshot and, by default, bump the shared version so
+    every other worker rebuilds on its next check.
+    """
+    _local.catalog = None
+    if broadcast:
+        _version_cache().set(VERSION_CACHE_KEY, uuid.uuid4().hex[:12], timeout=None)
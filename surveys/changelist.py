@@ -0,0 +1,111 @@
+"""
+Admin changelist pieces for tables with millions of rows.
+
+``EstimatedCountPaginator`` counts exactly only up to a small limit and asks
+the PostgreSQL planner beyond it. ``KeysetChangeList`` pages by primary key
+("next page" links carry the last id seen) instead of ``OFFSET``, so every
+page costs the same; it falls back to numbered pages when the user sorts by
+a column or a search ranks the results (a ``search_rank`` annotation).
+``KeysetPaginationMixin`` wires both into a ``ModelAdmin``.
+"""
+
+import copy
+import json
+
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = "after"
+
+
+def estimated_count(queryset) -> int | None:
+    """The planner's row estimate for ``queryset`` on PostgreSQL, else None."""
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    # Up to this many rows are counted exactly, with a bounded subquery.
+    count_limit = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        exact = self.object_list.order_by()[: self.count_limit + 1].count()
+        if exact <= self.count_limit:
+            return exact
+        self.estimated = True
+        return max(self.count_limit + 1, estimated_count(self.object_list) or 0)
+
+
+class KeysetChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        try:
+            self.cursor = int(request.GET.get(CURSOR_VAR, ""))
+        except ValueError:
+            self.cursor = None
+        if CURSOR_VAR in request.GET:
+            # Keep the cursor out of the filter lookups.
+            request = copy.copy(request)
+            request.GET = request.GET.copy()
+            del request.GET[CURSOR_VAR]
+        self.next_cursor = None
+        super().__init__(request, *args, **kwargs)
+
+    @property
+    def keyset(self) -> bool:
+        return ORDER_VAR not in self.params and ALL_VAR not in self.params and not self.ranked
+
+    @property
+    def ranked(self) -> bool:
+        return "search_rank" in getattr(self, "queryset", self.root_queryset).query.annotations
+
+    def get_ordering(self, request, queryset):
+        if ORDER_VAR not in self.params:
+            if "search_rank" in queryset.query.annotations:
+                return ["-search_rank", "-pk"]
+            return ["-pk"]
+        return super().get_ordering(request, queryset)
+
+    def get_results(self, request):
+        if not self.keyset:
+            return super().get_results(request)
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        if self.cursor is not None:
+            queryset = queryset.filter(pk__lt=self.cursor)
+        # One extra row tells whether there is a next page.
+        rows = list(queryset[: self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[: self.list_per_page]
+            self.next_cursor = rows[-1].pk
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.next_cursor is not None or self.cursor is not None
+        self.paginator = paginator
+
+    def next_page_url(self) -> str:
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+    def first_page_url(self) -> str:
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+
+class KeysetPaginationMixin:
+    """Newest-first keyset pagination, bounded counts and no full-table count."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/surveys/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries only the processes of one host can see.
+HOST_LOCAL_CACHES = (
+    "django.core.cache.backends.filebased.FileBasedCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_catalog_cache(app_configs, **kwargs):
+    alias = getattr(settings, "SURVEY_CATALOG_CACHE", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend not in HOST_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            f"The {alias!r} cache ({backend}) is local to this host.",
+            hint=(
+                "Workers on other hosts never see question catalog edits. Use a cache shared by "
+                "every host (the database cache, Redis or Memcached) unless one host runs all workers."
+            ),
+            id="surveys.W001",
+        )
+    ]
@@ -0,0 +1,240 @@
+"""
+Columnar (Parquet / Arrow IPC) exports of survey responses.
+
+pyarrow is optional and imported on first use. Every primary-key chunk read
+by ``surveys.exports`` becomes one record batch, so memory use depends on the
+chunk size rather than on the number of responses. Dictionaries of the
+categorical columns are fixed before the first batch is written, which keeps
+the codes stable across batches (the Arrow file format requires it).
+"""
+
+import json
+import tempfile
+from typing import Iterable
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse
+
+from .catalog import Catalog, get_catalog
+from .exports import iter_archived_chunks, iter_export_chunks, iter_pk_chunks, read_snapshot
+from .metrics import time_export
+from .models import ArchivedResponse, SurveyAnswer, SurveyResponse
+
+FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+# Larger than the CSV default: Parquet writes one row group per batch.
+DEFAULT_CHUNK_SIZE = 10000
+
+ANSWER_FIELDS = (
+    'id', 'response_id', 'response__respondent_role', 'question_id', 'option_id', 'option__label', 'answer_text',
+    'created_at',
+)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImproperlyConfigured('Columnar exports require pyarrow (pip install pyarrow).') from exc
+    return pyarrow
+
+
+class _Dictionary:
+    """Fixed categorical dictionary: known codes first, then any other stored values."""
+
+    def __init__(self, codes: Iterable[str], stored: Iterable[str] = (), aliases: dict | None = None):
+        self.codes = list(codes)
+        self.codes.extend(sorted(set(stored) - set(self.codes) - set(aliases or ())))
+        self.index = {code: position for position, code in enumerate(self.codes)}
+        for alias, code in (aliases or {}).items():
+            self.index[alias] = self.index[code]
+
+    def array(self, pa, values):
+        unknown = {value for value in values if value and value not in self.index}
+        if unknown:
+            # A null would silently drop the answer; the dictionary must be fixed up front.
+            raise ValueError(f'Values missing from the column dictionary: {", ".join(sorted(map(str, unknown)))}')
+        indices = pa.array([self.index[value] if value else None for value in values], type=pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.codes, type=pa.string()))
+
+
+def _timestamp_type(pa):
+    return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+
+
+def _role_dictionary(queryset, field: str = 'respondent_role') -> _Dictionary:
+    stored = queryset.order_by().values_list(field, flat=True).distinct()
+    return _Dictionary(SurveyResponse.RespondentRole.values, stored)
+
+
+def _option_dictionary(question, archived_texts: Iterable[str] = ()) -> _Dictionary:
+    # Documents hold option ids (archived payloads and older documents hold
+    # labels); the column holds the option value as its code. Answer texts
+    # that match no option are kept as they are.
+    labels = {option.label: option.value for option in question.options}
+    stored = set(
+        SurveyAnswer.objects.filter(question_id=question.id, option__isnull=True)
+        .exclude(answer_text__in=[*labels, ''])
+        .order_by()
+        .values_list('answer_text', flat=True)
+        .distinct()
+    )
+    stored.update(text for text in archived_texts if text)
+    ids = {option.id: option.value for option in question.options}
+    return _Dictionary([option.value for option in question.options], stored, aliases={**labels, **ids})
+
+
+def _archived_texts(archived, catalog: Catalog, chunk_size: int) -> dict[str, set[str]]:
+    """Distinct archived answers to option questions, keyed by question id; a pass over the archive."""
+    texts = {str(question.id): set() for question in catalog if question.has_options}
+    for chunk in iter_archived_chunks(archived, chunk_size):
+        for *_, answers in chunk:
+            for key, seen in texts.items():
+                if key in answers:
+                    seen.add(answers[key])
+    return texts
+
+
+def _writer(pa, sink, schema, fmt: str):
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(sink, schema, compression='zstd')
+    if fmt == 'arrow':
+        return pa.ipc.new_file(sink, schema)
+    raise ValueError(f'Unknown columnar format {fmt!r}; expected one of {", ".join(FORMATS)}.')
+
+
+def write_responses(sink, fmt: str = 'parquet', queryset=None, catalog: Catalog | None = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, archived=None) -> int:
+    """
+    Write the wide response table (one column per active question) to
+    ``sink`` and return the number of rows. Option questions become
+    dictionary-encoded columns of option values. Rows of the ``archived``
+    queryset of ``ArchivedResponse`` follow the live ones when given.
+    """
+    pa = _pyarrow()
+    catalog = catalog or get_catalog()
+    rows = 0
+    with time_export(fmt, 'responses'), read_snapshot():
+        roles = _role_dictionary(SurveyResponse.objects.all() if queryset is None else queryset)
+        archived_texts = {}
+        if archived is not None:
+            roles = _Dictionary(roles.codes, _role_dictionary(archived).codes)
+            archived_texts = _archived_texts(archived, catalog, chunk_size)
+        fields = [
+            pa.field('response_id', pa.int64(), nullable=False),
+            pa.field('respondent_name', pa.string()),
+            pa.field('respondent_email', pa.string()),
+            pa.field('respondent_role', pa.dictionary(pa.int32(), pa.string())),
+            pa.field('created_at', _timestamp_type(pa)),
+        ]
+        columns = []
+        for question in catalog:
+            metadata = {'prompt': question.prompt, 'category': question.category}
+            if question.has_options:
+                dictionary = _option_dictionary(question, archived_texts.get(str(question.id), ()))
+                metadata['labels'] = json.dumps({option.value: option.label for option in question.options})
+                field_type = pa.dictionary(pa.int32(), pa.string())
+            else:
+                dictionary = None
+                field_type = pa.string()
+            fields.append(pa.field(f'q{question.id}', field_type, metadata=metadata))
+            columns.append((str(question.id), dictionary))
+        schema = pa.schema(fields)
+
+        writer = _writer(pa, sink, schema, fmt)
+        try:
+            for chunk in iter_export_chunks(queryset, archived, chunk_size):
+                response_ids, names, emails, role_values, created, answers = zip(*chunk)
+                arrays = [
+                    pa.array(response_ids, type=pa.int64()),
+                    pa.array(names, type=pa.string()),
+                    pa.array(emails, type=pa.string()),
+                    roles.array(pa, role_values),
+                    pa.array(created, type=_timestamp_type(pa)),
+                ]
+                for key, dictionary in columns:
+                    values = [document.get(key) for document in answers]
+                    if dictionary is None:
+                        arrays.append(pa.array(values, type=pa.string()))
+                    else:
+                        try:
+                            arrays.append(dictionary.array(pa, values))
+                        except ValueError as exc:
+                            raise ValueError(
+                                f'{exc} (question {key}). Run "manage.py rebuild_response_documents" '
+                                'to refresh documents written before their options changed.'
+                            ) from exc
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows += len(chunk)
+        finally:
+            writer.close()
+    return rows
+
+
+def write_archived_responses(sink, fmt: str = 'parquet', queryset=None, catalog: Catalog | None = None,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """``write_responses`` for a queryset of ``ArchivedResponse`` (default: all) only."""
+    if queryset is None:
+        queryset = ArchivedResponse.objects.all()
+    return write_responses(sink, fmt, SurveyResponse.objects.none(), catalog, chunk_size, archived=queryset)
+
+
+def write_answers(sink, fmt: str = 'parquet', queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Write the long answer table (one row per answer) to ``sink`` and return the number of rows."""
+    pa = _pyarrow()
+    if queryset is None:
+        queryset = SurveyAnswer.objects.all()
+    queryset = queryset.select_related(None).prefetch_related(None)
+    rows = 0
+    with time_export(fmt, 'answers'), read_snapshot():
+        roles = _role_dictionary(queryset, 'response__respondent_role')
+        schema = pa.schema([
+            pa.field('response_id', pa.int64(), nullable=False),
+            pa.field('respondent_role', pa.dictionary(pa.int32(), pa.string())),
+            pa.field('question_id', pa.int16(), nullable=False),
+            pa.field('option_id', pa.int32()),
+            pa.field('answer_text', pa.string()),
+            pa.field('answered_at', _timestamp_type(pa)),
+        ])
+        writer = _writer(pa, sink, schema, fmt)
+        try:
+            for chunk in iter_pk_chunks(queryset, ANSWER_FIELDS, chunk_size):
+                _, response_ids, role_values, question_ids, option_ids, labels, texts, created = zip(*chunk)
+                writer.write_batch(pa.RecordBatch.from_arrays([
+                    pa.array(response_ids, type=pa.int64()),
+                    roles.array(pa, role_values),
+                    pa.array(question_ids, type=pa.int16()),
+                    pa.array(option_ids, type=pa.int32()),
+                    pa.array([label or text for label, text in zip(labels, texts)], type=pa.string()),
+                    pa.array(created, type=_timestamp_type(pa)),
+                ], schema=schema))
+                rows += len(chunk)
+        finally:
+            writer.close()
+    return rows
+
+
+def columnar_response(write, queryset, fmt: str, basename: str) -> FileResponse:
+    """
+    Run ``write`` (``write_responses`` or ``write_answers``) into a temporary
+    file and return it as a download; the file is never held in memory.
+    """
+    content_type, extension = FORMATS[fmt]
+    output = tempfile.TemporaryFile()
+    try:
+        write(output, fmt, queryset)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{basename}.{extension}',
+        content_type=content_type,
+    )
@@ -0,0 +1,69 @@
+"""
+Maintenance of ``ResponseDocument``, the per-response copy of all answers.
+
+The submission paths write documents directly next to their inserts; edits
+made through models (admin, imports) refresh them from the ``post_save`` /
+``post_delete`` receivers in ``surveys.signals``. All of this happens inside
+the writer's transaction. Choice answers are stored as their option's id and
+labelled when read (``surveys.exports.display_answer``), so relabelling an
+option touches no document. ``manage.py rebuild_response_documents``
+recomputes every document from ``SurveyAnswer`` for backfills and repairs.
+"""
+
+from typing import Iterable
+
+from django.db import transaction
+
+from .exports import DEFAULT_CHUNK_SIZE, RESPONSE_FIELDS, answers_for_chunk, iter_response_chunks
+from .models import ResponseDocument, SurveyResponse
+
+DOCUMENT_FIELDS = ['respondent_name', 'respondent_email', 'respondent_role', 'created_at', 'answers', 'updated_at']
+
+
+def document_answers(answers: dict[int, int | str]) -> dict[str, int | str]:
+    """JSON object keys are strings; keep them in question order."""
+    return {str(question_id): text for question_id, text in sorted(answers.items())}
+
+
+def build_documents(chunk: list[tuple], answers: dict[int, dict[int, int | str]]) -> list[ResponseDocument]:
+    """Build documents for ``RESPONSE_FIELDS`` rows and the answers from ``answers_for_chunk``."""
+    return [
+        ResponseDocument(
+            response_id=response_id,
+            respondent_name=name,
+            respondent_email=email,
+            respondent_role=role,
+            created_at=created_at,
+            answers=document_answers(answers.get(response_id, {})),
+        )
+        for response_id, name, email, role, created_at in chunk
+    ]
+
+
+def upsert_documents(documents: list[ResponseDocument], batch_size: int | None = None) -> None:
+    ResponseDocument.objects.bulk_create(
+        documents,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['response'],
+        update_fields=DOCUMENT_FIELDS,
+    )
+
+
+def refresh_documents(response_ids: Iterable[int]) -> None:
+    """Recompute the documents of ``response_ids`` from the response and answer tables."""
+    chunk = list(
+        SurveyResponse.objects.filter(pk__in=set(response_ids)).order_by('pk').values_list(*RESPONSE_FIELDS)
+    )
+    if chunk:
+        upsert_documents(build_documents(chunk, answers_for_chunk(chunk)))
+
+
+def rebuild_documents(chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Recompute every document, one transaction per chunk. Returns the number of responses."""
+    rebuilt = 0
+    for chunk in iter_response_chunks(chunk_size=chunk_size):
+        with transaction.atomic():
+            upsert_documents(build_documents(chunk, answers_for_chunk(chunk)))
+        rebuilt += len(chunk)
+    return rebuilt
@@ -0,0 +1,226 @@
+"""
+Bounded-memory exports of survey responses.
+
+Rows are read in primary-key ranges (keyset pagination) inside one read-only
+snapshot as plain ``values_list`` tuples, so memory use depends on the chunk
+size only. The wide exports read ``ResponseDocument`` rows, which already
+carry every answer of a response, and optionally the compressed copies in
+``ArchivedResponse`` after them. Documents hold choice answers as option ids,
+so labels are looked up in the catalog when a row is written and a relabelled
+option never leaves stale text behind.
+
+Under ASGI a streaming response over a plain iterator is read to the end in
+a thread before anything is sent, so ``detailed_csv_response`` streams
+asynchronously there: ``iterate_in_thread`` pulls one chunk of lines at a
+time from the thread the view ran on, which holds the snapshot's transaction
+and connection.
+"""
+
+import csv
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.http import StreamingHttpResponse
+
+from .catalog import Catalog, get_catalog
+from .metrics import time_export
+from .models import ArchivedResponse, ResponseDocument, SurveyAnswer, SurveyResponse
+from .routers import in_context
+
+DETAILED_BASE_HEADERS = ['ID', 'Respondent Name', 'Respondent Email', 'Respondent Role', 'Response Date']
+RESPONSE_FIELDS = ('id', 'respondent_name', 'respondent_email', 'respondent_role', 'created_at')
+DOCUMENT_FIELDS = ('response_id', 'respondent_name', 'respondent_email', 'respondent_role', 'created_at', 'answers')
+ARCHIVE_FIELDS = ('response_id', 'respondent_role', 'created_at', 'payload')
+DEFAULT_CHUNK_SIZE = 2000
+
+ROLE_LABELS = dict(SurveyResponse.RespondentRole.choices)
+
+
+def question_column_name(question) -> str:
+    # Truncate long prompts for column headers
+    prompt_short = question.prompt[:60] + '...' if len(question.prompt) > 60 else question.prompt
+    return f'Q{question.id}: {prompt_short}'
+
+
+def detailed_headers(catalog: Catalog) -> list[str]:
+    return DETAILED_BASE_HEADERS + [question_column_name(question) for question in catalog]
+
+
+@contextmanager
+def read_snapshot(using: str | None = None):
+    """
+    Run the enclosed reads in one transaction, on the database that response
+    reads are routed to unless ``using`` is given. On PostgreSQL it is
+    REPEATABLE READ, so every chunk sees the same snapshot; SQLite read
+    transactions are snapshots already.
+    """
+    using = using or router.db_for_read(SurveyResponse)
+    connection = connections[using]
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        yield
+
+
+def iter_pk_chunks(queryset, fields, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[tuple]]:
+    """
+    Yield lists of ``fields`` tuples in ascending primary-key order; the first
+    field must be the primary key.
+
+    Must run inside ``read_snapshot`` for the chunks to be mutually consistent;
+    the upper bound is fixed up front so rows inserted meanwhile never appear.
+    """
+    queryset = queryset.order_by('pk')
+    upper = queryset.values_list('pk', flat=True).last()
+    if upper is None:
+        return
+    queryset = queryset.filter(pk__lte=upper)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page.values_list(*fields)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def iter_response_chunks(queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[tuple]]:
+    """Yield lists of ``RESPONSE_FIELDS`` tuples in ascending primary-key order."""
+    if queryset is None:
+        queryset = SurveyResponse.objects.all()
+    return iter_pk_chunks(queryset, RESPONSE_FIELDS, chunk_size)
+
+
+def iter_document_chunks(queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[tuple]]:
+    """
+    Yield lists of ``DOCUMENT_FIELDS`` tuples in ascending response order,
+    restricted to the responses of ``queryset`` when given.
+    """
+    documents = ResponseDocument.objects.all()
+    if queryset is not None:
+        documents = documents.filter(response__in=queryset.order_by().values('pk'))
+    return iter_pk_chunks(documents, DOCUMENT_FIELDS, chunk_size)
+
+
+def iter_archived_chunks(queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[tuple]]:
+    """Like ``iter_document_chunks``, for the ``ArchivedResponse`` rows of ``queryset``."""
+    if queryset is None:
+        queryset = ArchivedResponse.objects.all()
+    for chunk in iter_pk_chunks(queryset, ARCHIVE_FIELDS, chunk_size):
+        rows = []
+        for response_id, role, created_at, payload in chunk:
+            data = ArchivedResponse.unpack(payload)
+            rows.append((response_id, data['respondent_name'], data['respondent_email'], role, created_at,
+                         data['answers']))
+        yield rows
+
+
+def iter_export_chunks(queryset=None, archived=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list[tuple]]:
+    """
+    Document chunks for the live responses of ``queryset``, followed by those
+    of the ``archived`` queryset of ``ArchivedResponse`` when given.
+    """
+    chunks = iter_document_chunks(queryset, chunk_size)
+    if archived is None:
+        return chunks
+    return chain(chunks, iter_archived_chunks(archived, chunk_size))
+
+
+def answers_for_chunk(chunk: list[tuple], question_ids=None, labels: bool = False) -> dict[int, dict[int, int | str]]:
+    """
+    Map response id -> {question id: option id or answer text} for one chunk
+    of responses; with ``labels``, option labels instead of ids.
+    """
+    wanted = {row[0] for row in chunk}
+    answers: dict[int, dict[int, str]] = {}
+    rows = SurveyAnswer.objects.filter(
+        response_id__gte=chunk[0][0],
+        response_id__lte=chunk[-1][0],
+    )
+    if question_ids is not None:
+        rows = rows.filter(question_id__in=question_ids)
+    rows = rows.values_list('response_id', 'question_id', 'answer_text', 'option__label' if labels else 'option_id')
+    for response_id, question_id, answer_text, option in rows.iterator():
+        if response_id in wanted:
+            answers.setdefault(response_id, {})[question_id] = option or answer_text
+    return answers
+
+
+def display_answer(question, stored) -> str:
+    """Text of a stored answer: an option id becomes its current label; text passes through."""
+    if isinstance(stored, int):
+        option = question.option_for_id(stored)
+        return option.label if option is not None else str(stored)
+    return stored or ''
+
+
+def iter_detailed_rows(queryset=None, catalog: Catalog | None = None,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE, archived=None) -> Iterator[list]:
+    """Yield one wide row per response: respondent columns, then one column per active question."""
+    catalog = catalog or get_catalog()
+    columns = [(question, str(question.id)) for question in catalog]
+    for chunk in iter_export_chunks(queryset, archived, chunk_size):
+        for response_id, name, email, role, created_at, answers in chunk:
+            yield [
+                response_id,
+                name or 'Anonymous',
+                email or '',
+                ROLE_LABELS.get(role, role),
+                created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else '',
+                *(display_answer(question, answers.get(key)) for question, key in columns),
+            ]
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def iter_detailed_csv(queryset=None, chunk_size: int = DEFAULT_CHUNK_SIZE, archived=None) -> Iterator[str]:
+    catalog = get_catalog()
+    writer = csv.writer(_Echo())
+    with time_export('csv', 'responses'):
+        yield writer.writerow(detailed_headers(catalog))
+        with read_snapshot():
+            for row in iter_detailed_rows(queryset, catalog, chunk_size, archived):
+                yield writer.writerow(row)
+
+
+async def iterate_in_thread(iterable: Iterable[str], batch_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[str]:
+    """
+    Iterate ``iterable`` on the thread-sensitive sync thread, joining up to
+    ``batch_size`` items per thread hop. Closing the async iterator closes
+    ``iterable`` on that thread too.
+    """
+    iterator = iter(iterable)
+    take = sync_to_async(lambda: ''.join(islice(iterator, batch_size)), thread_sensitive=True)
+    try:
+        while chunk := await take():
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def detailed_csv_response(queryset=None, filename: str = 'survey_responses.csv',
+                          archived=None, asynchronous: bool = False) -> StreamingHttpResponse:
+    """
+    Stream the wide CSV export. Pass ``asynchronous=True`` when serving under
+    ASGI, where a synchronous iterator would be buffered in full.
+    """
+    # The rows are read while the response streams, after the view returns: keep its database routing.
+    content = in_context(iter_detailed_csv(queryset, archived=archived))
+    if asynchronous:
+        content = iterate_in_thread(content)
+    response = StreamingHttpResponse(content, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
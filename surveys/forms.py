@@ -1,8 +1,22 @@
-from typing import Iterable
+import threading
 
 from django import forms
 
-from .models import Question, SurveyResponse
+from .catalog import BUILDER_ROLE_VALUES, Catalog, QuestionSnapshot
+from .models import SurveyResponse
+
+
+class _SharedFields(dict):
+    """
+    ``base_fields`` of a compiled survey form.
+
+    ``BaseForm.__init__`` deep-copies ``base_fields`` for every instance; the
+    compiled fields are never mutated per request, so instances share them and
+    construction only binds data.
+    """
+
+    def __deepcopy__(self, memo):
+        return dict(self)
 
 
 class SurveyForm(forms.Form):
@@ -22,94 +36,121 @@ class SurveyForm(forms.Form):
         initial=SurveyResponse.RespondentRole.GENERAL,
         widget=forms.RadioSelect,
     )
+    # Idempotency token rendered into each form; a resubmitted token is saved only once.
+    submission_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
 
-    def __init__(self, *args, questions: Iterable[Question] | None = None, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.questions = list(questions or [])
-        self._question_configs: dict[str, dict] = {}
-        for question in self.questions:
-            field_name = self.answer_field_name(question)
-            options = list(question.options.all())
-            self._question_configs[field_name] = {
-                "question": question,
-                "options": options,
-            }
-            if options:
-                self.fields[field_name] = forms.ChoiceField(
-                    label=question.prompt,
-                    choices=[(option.value, option.label) for option in options],
-                    widget=forms.RadioSelect,
-                    required=False,  # All questions are optional by default
-                    help_text=self._build_help_text(question),
-                )
-            else:
-                # Q4 and Q6 use single-line inputs, Q5 and Q8 use larger textarea
-                if question.id == 4 or question.id == 6:
-                    widget = forms.TextInput(
-                        attrs={
-                            "placeholder": "Your answer...",
-                            "class": "single-line-input",
-                        }
-                    )
-                elif question.id == 5 or question.id == 8:
-                    widget = forms.Textarea(
-                        attrs={
-                            "rows": 5,
-                            "placeholder": "Please share your thoughts..." if question.id == 8 else "Please be honest about your experience...",
-                        }
-                    )
-                else:
-                    widget = forms.Textarea(
-                        attrs={
-                            "rows": 3,
-                            "placeholder": "Share as much detail as you can...",
-                        }
-                    )
-                # All questions are optional by default
-                # Builder-only questions will be validated in clean() method
-                self.fields[field_name] = forms.CharField(
-                    label=question.prompt,
-                    widget=widget,
-                    required=False,  # All questions are optional by default
-                    help_text=self._build_help_text(question),
-                )
+    # Set on the subclasses generated by ``build_survey_form_class``.
+    catalog: Catalog | None = None
+    questions: tuple[QuestionSnapshot, ...] = ()
+    text_field_names: tuple[str, ...] = ()
+    builder_field_names: tuple[str, ...] = ()
 
     @staticmethod
-    def answer_field_name(question: Question) -> str:
+    def answer_field_name(question: QuestionSnapshot) -> str:
         return f"question_{question.id}"
 
     @staticmethod
-    def _build_help_text(question: Question) -> str:
+    def _build_help_text(question: QuestionSnapshot) -> str:
         parts = [question.category]
-        if question.target_audience == Question.TargetAudience.BUILDERS:
+        if question.is_builder_only:
             parts.append("Builders only")
         if question.note:
             parts.append(question.note)
         return " • ".join(parts)
 
+    @classmethod
+    def _build_answer_field(cls, question: QuestionSnapshot) -> forms.Field:
+        # All questions are optional by default;
+        # builder-only questions are validated in clean().
+        if question.options:
+            return forms.ChoiceField(
+                label=question.prompt,
+                choices=[(option.value, option.label) for option in question.options],
+                widget=forms.RadioSelect,
+                required=False,
+                help_text=cls._build_help_text(question),
+            )
+        # Q4 and Q6 use single-line inputs, Q5 and Q8 use larger textarea
+        if question.id == 4 or question.id == 6:
+            widget = forms.TextInput(
+                attrs={
+                    "placeholder": "Your answer...",
+                    "class": "single-line-input",
+                }
+            )
+        elif question.id == 5 or question.id == 8:
+            widget = forms.Textarea(
+                attrs={
+                    "rows": 5,
+                    "placeholder": "Please share your thoughts..." if question.id == 8 else "Please be honest about your experience...",
+                }
+            )
+        else:
+            widget = forms.Textarea(
+                attrs={
+                    "rows": 3,
+                    "placeholder": "Share as much detail as you can...",
+                }
+            )
+        return forms.CharField(
+            label=question.prompt,
+            widget=widget,
+            required=False,
+            help_text=cls._build_help_text(question),
+        )
+
     def clean(self):
         cleaned_data = super().clean()
-        # Get Q1 answer to determine if user is a builder
-        q1_answer = cleaned_data.get("question_1", "")
-        is_builder = q1_answer in ["developer", "founder"]
-        
-        # Also check respondent_role for backward compatibility
-        respondent_role = cleaned_data.get("respondent_role")
-        is_builder_role = respondent_role == SurveyResponse.RespondentRole.BUILDERS
-        
-        for question in self.questions:
-            field_name = self.answer_field_name(question)
+        for field_name in self.text_field_names:
             answer = cleaned_data.get(field_name)
-            config = self._question_configs.get(field_name, {})
-            options = config.get("options", [])
-            if answer and not options and isinstance(answer, str):
+            if answer and isinstance(answer, str):
                 cleaned_data[field_name] = answer.strip()
-            # Validate builder-only questions based on Q1 answer or respondent_role
-            if (
-                question.target_audience == Question.TargetAudience.BUILDERS
-                and (is_builder or is_builder_role)
-                and not cleaned_data.get(field_name)
-            ):
-                self.add_error(field_name, "This question is required for builders.")
+
+        # Builders are detected from the Q1 answer, or respondent_role for
+        # backward compatibility.
+        is_builder = (
+            cleaned_data.get("question_1", "") in BUILDER_ROLE_VALUES
+            or cleaned_data.get("respondent_role") == SurveyResponse.RespondentRole.BUILDERS
+        )
+        if is_builder:
+            for field_name in self.builder_field_names:
+                if not cleaned_data.get(field_name):
+                    self.add_error(field_name, "This question is required for builders.")
         return cleaned_data
 
+
+def build_survey_form_class(catalog: Catalog) -> type[SurveyForm]:
+    """Generate a ``SurveyForm`` subclass whose fields are compiled from ``catalog``."""
+    attrs = {
+        "__module__": __name__,
+        "catalog": catalog,
+        "questions": catalog.questions,
+        "text_field_names": tuple(
+            SurveyForm.answer_field_name(q) for q in catalog if not q.options
+        ),
+        "builder_field_names": tuple(
+            SurveyForm.answer_field_name(q) for q in catalog if q.is_builder_only
+        ),
+    }
+    for question in catalog:
+        attrs[SurveyForm.answer_field_name(question)] = SurveyForm._build_answer_field(question)
+    form_class = type(f"SurveyForm_{catalog.digest}", (SurveyForm,), attrs)
+    form_class.base_fields = _SharedFields(form_class.base_fields)
+    return form_class
+
+
+_compiled: type[SurveyForm] | None = None
+_compiled_lock = threading.Lock()
+
+
+def get_survey_form_class(catalog: Catalog) -> type[SurveyForm]:
+    """Return the compiled form class for ``catalog``, building it once per version."""
+    global _compiled
+    form_class = _compiled
+    if form_class is not None and form_class.catalog.version == catalog.version:
+        return form_class
+    with _compiled_lock:
+        form_class = _compiled
+        if form_class is None or form_class.catalog.version != catalog.version:
+            form_class = _compiled = build_survey_form_class(catalog)
+    return form_class
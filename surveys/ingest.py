@@ -0,0 +1,225 @@
+"""
+Bulk loading of submissions collected offline (paper forms, kiosks).
+
+Records come from CSV or JSON Lines files keyed by the survey form's field
+names (``respondent_role``, ``question_1``, ...), with optional
+``submission_id`` and ``created_at``. They are read one at a time and each is
+validated by the compiled ``SurveyForm`` of a single catalog snapshot taken up
+front, so offline submissions follow the same rules as the web form. Choice
+answers may give an option's value or its label; labels are mapped to values
+with one lookup table per question built from the snapshot.
+
+Valid submissions are written ``batch_size`` at a time, each batch in one
+transaction. Responses, answers and documents go in with ``COPY ... FROM
+STDIN`` on PostgreSQL and ``executemany`` elsewhere, and the batch's tallies
+are applied with them. Only one batch is held in memory, however long the
+file. Submission ids that are already stored are skipped, so a file whose
+records carry ``submission_id`` can be loaded again safely.
+"""
+
+import csv
+import io
+import json
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .catalog import Catalog
+from .forms import SurveyForm, get_survey_form_class
+from .models import ResponseDocument, SurveyAnswer, SurveyResponse
+from .submissions import Submission
+from .tallies import apply_deltas, count_answers
+
+DEFAULT_BATCH_SIZE = 1000
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+def read_records(path: Path) -> Iterator[tuple[int, dict]]:
+    """Yield ``(line number, record)`` for each record of a CSV or JSON Lines file."""
+    fmt = FORMATS.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported file type {path.suffix!r}; use {', '.join(FORMATS)}.")
+    with path.open(encoding='utf-8-sig', newline='') as file:
+        if fmt == 'csv':
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    record = exc
+                yield number, record
+
+
+def _insertable_fields(model) -> list[models.Field]:
+    return [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+
+
+def _copy_value(field: models.Field, value) -> str:
+    """One column of a ``COPY ... FROM STDIN`` text-format row."""
+    if value is None:
+        return '\\N'
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, cls=field.encoder)
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def insert_rows(model, objs: list[models.Model], using: str = 'default') -> None:
+    """
+    Insert ``objs`` without signals or returned ids: one ``COPY`` on
+    PostgreSQL, one ``executemany`` elsewhere.
+    """
+    if not objs:
+        return
+    connection = connections[using]
+    fields = _insertable_fields(model)
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    values = [[field.pre_save(obj, True) for field in fields] for obj in objs]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            data = io.StringIO()
+            for row in values:
+                data.write('\t'.join(_copy_value(field, value) for field, value in zip(fields, row)))
+                data.write('\n')
+            data.seek(0)
+            sql = f'COPY {table} ({columns}) FROM STDIN'
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, data)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(data.getvalue())
+        else:
+            cursor.executemany(
+                f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})",
+                [
+                    [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+                    for row in values
+                ],
+            )
+
+
+class SubmissionLoader:
+    """Validate offline records against one catalog snapshot and write them in batches."""
+
+    def __init__(self, catalog: Catalog, batch_size: int = DEFAULT_BATCH_SIZE, using: str = 'default'):
+        self.catalog = catalog
+        self.form_class = get_survey_form_class(catalog)
+        self.batch_size = batch_size
+        self.using = using
+        # Field name -> {casefolded value or label: value} for every choice question.
+        self.choices = {
+            SurveyForm.answer_field_name(question): {
+                key.casefold(): option.value
+                for option in question.options
+                for key in (option.label, option.value)
+            }
+            for question in catalog
+            if question.options
+        }
+
+    def submission(self, record: dict) -> Submission:
+        """Build the submission for one record, or raise ``ValidationError``."""
+        if isinstance(record, json.JSONDecodeError):
+            raise ValidationError(f'Invalid JSON: {record}')
+        if not isinstance(record, dict):
+            raise ValidationError('Each line must hold one JSON object.')
+        data = {key: '' if value is None else str(value).strip() for key, value in record.items()}
+        for name, values in self.choices.items():
+            if data.get(name):
+                data[name] = values.get(data[name].casefold(), data[name])
+        form = self.form_class(data=data)
+        if not form.is_valid():
+            raise ValidationError(
+                [f'{field}: {message}' for field, messages in form.errors.items() for message in messages]
+            )
+        submission = Submission.from_form(self.catalog, form.cleaned_data)
+        if data.get('created_at'):
+            created_at = parse_datetime(data['created_at'])
+            if created_at is None:
+                raise ValidationError(f"created_at: {data['created_at']!r} is not a date and time.")
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
+            submission.created_at = created_at
+        return submission
+
+    def write(self, submissions: Iterable[Submission]) -> int:
+        """Write one batch in one transaction, skipping stored submission ids. Returns the number written."""
+        pending = {submission.submission_id: submission for submission in submissions}
+        if not pending:
+            return 0
+        with transaction.atomic(using=self.using):
+            responses = SurveyResponse.objects.using(self.using)
+            existing = set(responses.filter(submission_id__in=list(pending)).values_list('submission_id', flat=True))
+            new = [submission for key, submission in pending.items() if key not in existing]
+            if not new:
+                return 0
+            built = [submission.build_response() for submission in new]
+            insert_rows(SurveyResponse, built, self.using)
+            ids = dict(
+                responses.filter(submission_id__in=[response.submission_id for response in built])
+                .values_list('submission_id', 'id')
+            )
+            for response in built:
+                response.pk = ids[response.submission_id]
+            insert_rows(
+                SurveyAnswer,
+                [answer for submission, response in zip(new, built) for answer in submission.build_answers(response)],
+                self.using,
+            )
+            insert_rows(
+                ResponseDocument,
+                [submission.build_document(response) for submission, response in zip(new, built)],
+                self.using,
+            )
+            apply_deltas(
+                count_answers(row for submission in new for row in submission.tally_rows()), using=self.using
+            )
+        return len(new)
+
+    def load(self, records: Iterable[tuple[int, dict]], dry_run: bool = False, on_error=None, on_batch=None) -> dict:
+        """
+        Validate and write ``(line number, record)`` pairs; invalid records are
+        skipped and passed to ``on_error(line number, ValidationError)``;
+        ``dry_run`` only validates.
+        ``on_batch(stats)`` is called after every batch.
+        """
+        stats = {'read': 0, 'invalid': 0, 'written': 0, 'duplicate': 0}
+        batch = []
+
+        def flush():
+            if not dry_run:
+                written = self.write(batch)
+                stats['written'] += written
+                stats['duplicate'] += len(batch) - written
+            batch.clear()
+            if on_batch is not None:
+                on_batch(stats)
+
+        for number, record in records:
+            stats['read'] += 1
+            try:
+                batch.append(self.submission(record))
+            except ValidationError as exc:
+                stats['invalid'] += 1
+                if on_error is not None:
+                    on_error(number, exc)
+                continue
+            if len(batch) >= self.batch_size:
+                flush()
+        if batch:
+            flush()
+        return stats
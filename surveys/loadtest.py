@@ -0,0 +1,482 @@
+"""
+HTTP load generator for the survey flow, used by ``manage.py loadtest``.
+
+Each virtual user repeats the respondent's path: GET the survey page, read
+the CSRF token (from the page or, for the edge-cached page, the ``csrf``
+endpoint), POST a filled-in form and follow the redirect to the thank-you
+page. The client is a small HTTP/1.1 implementation on asyncio streams with
+one keep-alive connection per virtual user, so thousands of requests in
+flight cost a coroutine each. ``local_server`` serves the project from a
+threaded WSGI server in this process and counts the queries of every request.
+Every POST carries a fresh ``submission_id``, recorded on the ``LoadTest``, so
+``discard_submissions`` can delete exactly the responses of a run.
+"""
+
+import asyncio
+import json
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from django.db import connection
+
+from .models import SurveyResponse
+from .spool import get_spool
+
+LOADTEST_RESPONDENT = "loadtest"
+STEPS = ("form", "csrf", "submit", "thank_you")
+
+
+class HTTPError(Exception):
+    pass
+
+
+@dataclass
+class HTTPResponse:
+    status: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+    def header(self, name: str) -> str | None:
+        name = name.lower()
+        return next((value for key, value in self.headers if key == name), None)
+
+    def cookies(self) -> dict[str, str]:
+        jar = SimpleCookie()
+        for key, value in self.headers:
+            if key == "set-cookie":
+                jar.load(value)
+        return {name: morsel.value for name, morsel in jar.items()}
+
+
+class HTTPConnection:
+    """One keep-alive HTTP/1.1 connection, reopened when the server closes it."""
+
+    def __init__(self, host: str, port: int, ssl: bool = False, timeout: float = 30.0):
+        self.host, self.port, self.ssl, self.timeout = host, port, ssl, timeout
+        self.reader = self.writer = None
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: dict[str, str] | None = None,
+                      body: bytes = b"") -> HTTPResponse:
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._request(method, path, headers or {}, body), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection; retry once on a new one.
+            return await asyncio.wait_for(self._request(method, path, headers or {}, body), self.timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _request(self, method, path, headers, body) -> HTTPResponse:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if body or method == "POST":
+            lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise HTTPError(f"malformed status line {status_line[:80]!r}") from None
+        response_headers = []
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers.append((name.strip().lower(), value.strip()))
+        response = HTTPResponse(status, response_headers, b"")
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            pass
+        elif (response.header("transfer-encoding") or "").lower() == "chunked":
+            chunks = []
+            while size := int((await self.reader.readline()).split(b";")[0], 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            await self.reader.readline()
+            response.body = b"".join(chunks)
+        elif (length := response.header("content-length")) is not None:
+            response.body = await self.reader.readexactly(int(length))
+        else:
+            response.body = await self.reader.read()
+            await self.close()
+        if (response.header("connection") or "").lower() == "close":
+            await self.close()
+        return response
+
+
+class _FormParser(HTMLParser):
+    """Collects the fields of the first POST form on a page, with plausible values."""
+
+    TEXT = "Load test answer"
+
+    def __init__(self):
+        super().__init__()
+        self.in_form = self.done = False
+        self.select = None
+        self.fields: dict[str, str] = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.done:
+            return
+        if tag == "form" and (attrs.get("method") or "").lower() == "post":
+            self.in_form = True
+        if not self.in_form:
+            return
+        name = attrs.get("name")
+        if tag == "input" and name:
+            kind = (attrs.get("type") or "text").lower()
+            if kind in ("radio", "checkbox"):
+                self.fields.setdefault(name, attrs.get("value") or "on")
+            elif kind == "hidden":
+                self.fields[name] = attrs.get("value") or ""
+            elif kind == "email":
+                self.fields[name] = "loadtest@example.com"
+            elif kind not in ("submit", "button", "reset", "file"):
+                self.fields[name] = self.TEXT
+        elif tag == "textarea" and name:
+            self.fields[name] = self.TEXT
+        elif tag == "select" and name:
+            self.select = name
+        elif tag == "option" and self.select and attrs.get("value"):
+            self.fields.setdefault(self.select, attrs["value"])
+
+    def handle_endtag(self, tag):
+        if tag == "select":
+            self.select = None
+        elif tag == "form" and self.in_form:
+            self.in_form, self.done = False, True
+
+
+class _MessageParser(HTMLParser):
+    """Collects the text of ``class="message ..."`` elements (Django messages)."""
+
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+        self.messages: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            self.depth += 1
+        elif "message" in (dict(attrs).get("class") or "").split():
+            self.depth = 1
+            self.messages.append("")
+
+    def handle_endtag(self, tag):
+        if self.depth:
+            self.depth -= 1
+
+    def handle_data(self, data):
+        if self.depth:
+            self.messages[-1] += data
+
+
+def page_messages(html: str) -> list[str]:
+    parser = _MessageParser()
+    parser.feed(html)
+    return [" ".join(message.split()) for message in parser.messages]
+
+
+def form_fields(html: str) -> dict[str, str]:
+    parser = _FormParser()
+    parser.feed(html)
+    return parser.fields
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+
+def latency_stats(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1e3 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1e3,
+        "p95_ms": percentile(ordered, 95) * 1e3,
+        "p99_ms": percentile(ordered, 99) * 1e3,
+        "max_ms": ordered[-1] * 1e3 if ordered else 0.0,
+    }
+
+
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=Counter)
+    error_kinds: Counter = field(default_factory=Counter)
+    flows: list[float] = field(default_factory=list)
+    failed_flows: int = 0
+
+    def error(self, step: str, kind: str) -> None:
+        self.errors[step] += 1
+        self.error_kinds[f"{step}: {kind}"] += 1
+
+
+class QueryCounter:
+    """WSGI wrapper counting database queries per (method, path)."""
+
+    def __init__(self, application):
+        self.application = application
+        self.lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.queries: Counter = Counter()
+
+    def __call__(self, environ, start_response):
+        executed = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal executed
+            executed += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            result = self.application(environ, start_response)
+            # Consume the body here so streamed responses are counted too.
+            body = b"".join(result)
+            if hasattr(result, "close"):
+                result.close()
+        key = (environ["REQUEST_METHOD"], environ["PATH_INFO"])
+        with self.lock:
+            self.requests[key] += 1
+            self.queries[key] += executed
+        return [body]
+
+    def per_request(self, method: str, path: str) -> float | None:
+        requests = self.requests[method, path]
+        return self.queries[method, path] / requests if requests else None
+
+
+def discard_submissions(submission_ids: list[str], batch_size: int = 500) -> int:
+    """
+    Delete the responses saved for ``submission_ids``, after flushing the spool
+    so that submissions still queued there are found. Returns the number deleted.
+    """
+    spool = get_spool()
+    if spool is not None:
+        spool.flush(batch_size=batch_size)
+    deleted = 0
+    for start in range(0, len(submission_ids), batch_size):
+        chunk = submission_ids[start:start + batch_size]
+        deleted += SurveyResponse.objects.filter(submission_id__in=chunk).delete()[1].get(
+            SurveyResponse._meta.label, 0
+        )
+    return deleted
+
+
+@contextmanager
+def local_server(application):
+    """Serve ``application`` from a threaded WSGI server on a free port; yields the base URL."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(application)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        yield f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+class LoadTest:
+    def __init__(self, base_url: str, form_path: str, csrf_path: str, csrf_cookie: str = "csrftoken",
+                 timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = parts.scheme == "https"
+        self.form_path, self.csrf_path, self.csrf_cookie = form_path, csrf_path, csrf_cookie
+        self.timeout = timeout
+        self.recorder = Recorder()
+        self.submission_ids: list[str] = []
+
+    async def _step(self, conn, name, method, path, cookies, body=b"", headers=None):
+        request_headers = {"Accept": "text/html", **(headers or {})}
+        if cookies:
+            request_headers["Cookie"] = "; ".join(f"{key}={value}" for key, value in cookies.items())
+        started = time.perf_counter()
+        try:
+            response = await conn.request(method, path, request_headers, body)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HTTPError) as exc:
+            self.recorder.latencies[name].append(time.perf_counter() - started)
+            self.recorder.error(name, type(exc).__name__)
+            return None
+        self.recorder.latencies[name].append(time.perf_counter() - started)
+        cookies.update(response.cookies())
+        return response
+
+    async def flow(self, conn) -> bool:
+        """One respondent: page, token, submission, thank-you page. Returns True on success."""
+        cookies: dict[str, str] = {}
+        origin = f"{'https' if self.ssl else 'http'}://{self.host}:{self.port}"
+        page = await self._step(conn, "form", "GET", self.form_path, cookies)
+        if page is None or page.status != 200:
+            if page is not None:
+                self.recorder.error("form", f"HTTP {page.status}")
+            return False
+        fields = form_fields(page.body.decode("utf-8", "replace"))
+        if not fields.get("csrfmiddlewaretoken"):
+            # The edge-cached page carries no token; fetch it like the page's script does.
+            token = await self._step(
+                conn, "csrf", "GET", self.csrf_path, cookies, headers={"Accept": "application/json"}
+            )
+            if token is None or token.status != 200:
+                if token is not None:
+                    self.recorder.error("csrf", f"HTTP {token.status}")
+                return False
+            fields["csrfmiddlewaretoken"] = json.loads(token.body)["token"]
+        if "respondent_name" in fields:
+            fields["respondent_name"] = LOADTEST_RESPONDENT
+        # Recorded before sending: a POST that times out may still have been saved.
+        fields["submission_id"] = str(uuid.uuid4())
+        self.submission_ids.append(fields["submission_id"])
+        submitted = await self._step(
+            conn, "submit", "POST", self.form_path, cookies, urlencode(fields).encode(),
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+                "Origin": origin,
+                "Referer": origin + self.form_path,
+            },
+        )
+        if submitted is None or submitted.status != 302:
+            if submitted is not None:
+                # A re-rendered form says why in its messages; keep the first one, shortened.
+                shown = page_messages(submitted.body.decode("utf-8", "replace"))
+                reason = f" ({shown[0][:80]})" if shown else ""
+                self.recorder.error("submit", f"HTTP {submitted.status}{reason}")
+            return False
+        location = urlsplit(urljoin(self.base_url + self.form_path, submitted.header("location") or ""))
+        thanks = await self._step(conn, "thank_you", "GET", location.path or "/", cookies)
+        if thanks is None or thanks.status != 200:
+            if thanks is not None:
+                self.recorder.error("thank_you", f"HTTP {thanks.status}")
+            return False
+        return True
+
+    async def run(self, flows: int, concurrency: int, duration: float | None = None) -> float:
+        """
+        Run ``flows`` flows (or, with ``duration``, as many as fit in that many
+        seconds) with ``concurrency`` virtual users. Returns the elapsed time.
+        """
+        remaining = flows
+        deadline = None if duration is None else time.perf_counter() + duration
+
+        async def user():
+            nonlocal remaining
+            conn = HTTPConnection(self.host, self.port, self.ssl, self.timeout)
+            try:
+                while (remaining > 0 if deadline is None else time.perf_counter() < deadline):
+                    remaining -= 1
+                    started = time.perf_counter()
+                    if await self.flow(conn):
+                        self.recorder.flows.append(time.perf_counter() - started)
+                    else:
+                        self.recorder.failed_flows += 1
+                        await conn.close()
+            finally:
+                await conn.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float, queries: QueryCounter | None = None, **meta) -> dict:
+        recorder = self.recorder
+        paths = {"form": ("GET", self.form_path), "csrf": ("GET", self.csrf_path), "submit": ("POST", self.form_path)}
+        steps = {}
+        for name in STEPS:
+            latencies = recorder.latencies.get(name)
+            if not latencies:
+                continue
+            steps[name] = {
+                "requests": len(latencies),
+                "errors": recorder.errors[name],
+                "error_rate": recorder.errors[name] / len(latencies),
+                **latency_stats(latencies),
+                "queries_per_request": None,
+            }
+            if queries is not None:
+                method, path = paths.get(name, ("GET", None))
+                if path is None:
+                    # The thank-you page: every GET that is not the form or the token.
+                    known = {paths["form"], paths["csrf"]}
+                    counted = [key for key in queries.requests if key[0] == "GET" and key not in known]
+                    total = sum(queries.requests[key] for key in counted)
+                    steps[name]["queries_per_request"] = (
+                        sum(queries.queries[key] for key in counted) / total if total else None
+                    )
+                else:
+                    steps[name]["queries_per_request"] = queries.per_request(method, path)
+        requests = sum(step["requests"] for step in steps.values())
+        total_flows = len(recorder.flows) + recorder.failed_flows
+        return {
+            "meta": {**meta, "elapsed_s": elapsed},
+            "summary": {
+                "flows": total_flows,
+                "failed_flows": recorder.failed_flows,
+                "flows_per_s": len(recorder.flows) / elapsed if elapsed else 0.0,
+                "requests": requests,
+                "requests_per_s": requests / elapsed if elapsed else 0.0,
+                "error_rate": recorder.failed_flows / total_flows if total_flows else 0.0,
+                **latency_stats(recorder.flows),
+            },
+            "steps": steps,
+            "errors": dict(recorder.error_kinds.most_common()),
+        }
+
+
+def compare(report: dict, baseline: dict) -> list[tuple[str, float, float, float]]:
+    """``(metric, baseline, current, change %)`` rows; positive change is always worse."""
+    rows = []
+
+    def add(metric, old, new, higher_is_better=False):
+        if old is None or new is None:
+            return
+        change = ((new - old) / old * 100.0) if old else 0.0
+        rows.append((metric, old, new, -change if higher_is_better else change))
+
+    add("flows/s", baseline["summary"]["flows_per_s"], report["summary"]["flows_per_s"], higher_is_better=True)
+    add("error rate %", baseline["summary"]["error_rate"] * 100, report["summary"]["error_rate"] * 100)
+    for name, step in report["steps"].items():
+        old = baseline.get("steps", {}).get(name)
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+            add(f"{name} {metric}", old.get(metric), step.get(metric))
+    return rows
@@ -0,0 +1,47 @@
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from surveys.archive import DEFAULT_CHUNK_SIZE, archivable, archive_responses
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old responses (and their answers) out of the live tables into compressed "
+        "ArchivedResponse rows, one transaction per chunk. Exports can still include them."
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument(
+            "--before", type=date.fromisoformat, help="Archive responses created before this date (YYYY-MM-DD)."
+        )
+        cutoff.add_argument(
+            "--older-than", type=int, metavar="DAYS", help="Archive responses older than this many days."
+        )
+        parser.add_argument(
+            "--retired-questions",
+            action="store_true",
+            help="Also archive responses that answer no active question.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Responses per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the responses that would be archived.")
+
+    def handle(self, *args, **options):
+        before = None
+        if options["before"]:
+            before = datetime.combine(options["before"], dt_time.min, tzinfo=timezone.get_current_timezone())
+        elif options["older_than"] is not None:
+            before = timezone.now() - timedelta(days=options["older_than"])
+        if before is None and not options["retired_questions"]:
+            raise CommandError("Give --before, --older-than or --retired-questions.")
+
+        responses = archivable(before, options["retired_questions"])
+        if options["dry_run"]:
+            self.stdout.write(f"{responses.count()} responses would be archived")
+            return
+        started = time.monotonic()
+        archived = archive_responses(responses, options["chunk_size"])
+        self.stdout.write(f"archived {archived} responses in {time.monotonic() - started:.1f}s")
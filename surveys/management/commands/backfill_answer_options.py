@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from surveys.exports import iter_pk_chunks
+from surveys.models import QuestionOption, SurveyAnswer
+from surveys.tallies import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Point choice answers stored as label text at their QuestionOption and clear "
+        "the text, one transaction per chunk. Texts that match no option are left as "
+        "free text. Tallies are reconciled afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Answers per transaction.")
+        parser.add_argument("--no-reconcile", action="store_true", help="Skip recomputing the option tallies.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        # Match on the label the form stored, or on the option value.
+        by_text = {}
+        for option_id, question_id, value, label in QuestionOption.objects.values_list(
+            "id", "question_id", "value", "label"
+        ):
+            by_text.setdefault((question_id, value), option_id)
+            by_text[question_id, label] = option_id
+
+        pending = SurveyAnswer.objects.filter(
+            option__isnull=True,
+            question_id__in={question_id for question_id, _ in by_text},
+        )
+        scanned = linked = 0
+        for chunk in iter_pk_chunks(pending, ("id", "question_id", "answer_text"), options["chunk_size"]):
+            updates = [
+                SurveyAnswer(pk=answer_id, option_id=by_text[question_id, text], answer_text="")
+                for answer_id, question_id, text in chunk
+                if (question_id, text) in by_text
+            ]
+            with transaction.atomic():
+                SurveyAnswer.objects.bulk_update(updates, ["option", "answer_text"])
+            scanned += len(chunk)
+            linked += len(updates)
+            self.stdout.write(f"scanned={scanned} linked={linked}")
+
+        if not options["no_reconcile"]:
+            reconcile()
+        self.stdout.write(
+            f"linked {linked} of {scanned} answers to options in {time.monotonic() - started:.1f}s"
+        )
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.middleware.csrf import CSRF_ALLOWED_CHARS, CSRF_SECRET_LENGTH
+from django.utils.crypto import get_random_string
+
+from surveys.catalog import get_catalog
+from surveys.forms import SurveyForm
+from surveys.models import SurveyResponse
+
+BENCH_RESPONDENT = "bench-async"
+
+
+def submission_body(csrf_secret: str) -> bytes:
+    payload = {
+        "csrfmiddlewaretoken": csrf_secret,
+        "respondent_name": BENCH_RESPONDENT,
+        "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+    }
+    for question in get_catalog():
+        if question.is_builder_only:
+            continue
+        field_name = SurveyForm.answer_field_name(question)
+        payload[field_name] = question.options[0].value if question.options else "Benchmark answer"
+    return urlencode(payload).encode()
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(ordered) * 1e3 if ordered else 0.0,
+        "p95_ms": ordered[int(len(ordered) * 0.95) - 1] * 1e3 if ordered else 0.0,
+    }
+
+
+class WSGIDriver:
+    """Calls the WSGI application directly from a thread pool, like a threaded WSGI server."""
+
+    def __init__(self):
+        from django.core.wsgi import get_wsgi_application
+
+        self.application = get_wsgi_application()
+
+    def request(self, method, path, body=b"", cookie=""):
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "SCRIPT_NAME": "",
+            "QUERY_STRING": "",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "HTTP_HOST": "localhost",
+            "HTTP_COOKIE": cookie,
+            "CONTENT_TYPE": "application/x-www-form-urlencoded",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+            "wsgi.version": (1, 0),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        status = []
+        result = self.application(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return int(status[0].split()[0])
+
+    def run(self, method, path, body, cookie, total, concurrency):
+        def timed(_):
+            started = time.perf_counter()
+            code = self.request(method, path, body, cookie)
+            return time.perf_counter() - started, code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, range(total)))
+        return results, time.perf_counter() - started
+
+
+class ASGIDriver:
+    """Calls the ASGI application directly with ``concurrency`` requests in flight."""
+
+    def __init__(self):
+        from django.core.asgi import get_asgi_application
+
+        self.application = get_asgi_application()
+
+    async def request(self, method, path, body=b"", cookie=""):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"cookie", cookie.encode()),
+                (b"content-type", b"application/x-www-form-urlencoded"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+        sent_body = False
+        status = []
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Never disconnect; Django cancels this once the response is sent.
+            await asyncio.Future()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await self.application(scope, receive, send)
+        return status[0]
+
+    def run(self, method, path, body, cookie, total, concurrency):
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timed():
+                async with semaphore:
+                    started = time.perf_counter()
+                    code = await self.request(method, path, body, cookie)
+                    return time.perf_counter() - started, code
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(timed() for _ in range(total)))
+            return results, time.perf_counter() - started
+
+        return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent throughput of the sync WSGI survey views against the "
+        "native async views under ASGI. Each server path runs in its own process "
+        "against the configured database; benchmark submissions are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--child", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["child"]:
+            self._run_child(options)
+            return
+
+        if not get_catalog().questions:
+            raise CommandError("No active questions; run migrations first.")
+
+        reports = {}
+        try:
+            for mode in ("wsgi", "asgi"):
+                env = dict(os.environ, SURVEY_ASYNC_VIEWS="true" if mode == "asgi" else "false")
+                output = subprocess.run(
+                    [
+                        sys.executable, str(settings.BASE_DIR / "manage.py"), "bench_async",
+                        "--child", mode,
+                        "--requests", str(options["requests"]),
+                        "--concurrency", str(options["concurrency"]),
+                    ],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                reports[mode] = json.loads(output.strip().splitlines()[-1])
+        finally:
+            SurveyResponse.objects.filter(respondent_name=BENCH_RESPONDENT).delete()
+
+        self.stdout.write(
+            f"concurrency={options['concurrency']} requests={options['requests']} "
+            f"database={settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]}"
+        )
+        self.stdout.write(
+            f"{'scenario':<14}{'req/s':>10}{'mean ms':>10}{'p95 ms':>10}{'errors':>8}"
+        )
+        for mode, report in reports.items():
+            for scenario, stats in report.items():
+                self.stdout.write(
+                    f"{mode + ' ' + scenario:<14}{stats['throughput_rps']:>10.1f}"
+                    f"{stats['mean_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['errors']:>8}"
+                )
+
+    def _run_child(self, options):
+        driver = ASGIDriver() if options["child"] == "asgi" else WSGIDriver()
+        csrf_secret = get_random_string(CSRF_SECRET_LENGTH, allowed_chars=CSRF_ALLOWED_CHARS)
+        cookie = f"{settings.CSRF_COOKIE_NAME}={csrf_secret}"
+        scenarios = {
+            "GET": ("GET", "/", b"", ""),
+            "POST": ("POST", "/", submission_body(csrf_secret), cookie),
+        }
+        # Warm up the catalog, compiled form class and connections.
+        driver.run("GET", "/", b"", "", 5, 1)
+
+        report = {}
+        for name, (method, path, body, request_cookie) in scenarios.items():
+            expected = 302 if method == "POST" else 200
+            results, elapsed = driver.run(
+                method, path, body, request_cookie, options["requests"], options["concurrency"]
+            )
+            report[name] = summarize(
+                [latency for latency, _ in results],
+                sum(1 for _, code in results if code != expected),
+                elapsed,
+            )
+        self.stdout.write(json.dumps(report))
@@ -0,0 +1,75 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from surveys.catalog import Catalog
+from surveys.forms import SurveyForm, build_survey_form_class
+from surveys.models import Question
+
+
+def synthetic_catalog(size: int) -> Catalog:
+    """A catalog shaped like the real one: mostly choice questions, some free text and builder-only."""
+    question_rows = []
+    option_rows = []
+    option_id = 0
+    for question_id in range(1, size + 1):
+        audience = (
+            Question.TargetAudience.BUILDERS if question_id % 5 == 0 else Question.TargetAudience.ALL
+        )
+        question_rows.append((question_id, "Benchmark", f"Question {question_id}?", audience, ""))
+        if question_id % 3:
+            for order in range(4):
+                option_id += 1
+                option_rows.append(
+                    (option_id, question_id, f"option_{order}", f"Option {order} label", order)
+                )
+    return Catalog.build(question_rows, option_rows, version=f"bench-{size}")
+
+
+def synthetic_payload(catalog: Catalog) -> dict:
+    payload = {
+        "respondent_name": "Bench",
+        "respondent_email": "bench@example.com",
+        "respondent_role": "builders",
+    }
+    for question in catalog:
+        field_name = SurveyForm.answer_field_name(question)
+        payload[field_name] = question.options[1].value if question.options else "  Some free text answer  "
+    return payload
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark SurveyForm compilation, construction and clean() at several catalog sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timing rounds per measurement; the best round is reported.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'questions':>9}  {'compile (ms)':>12}  {'construct (us)':>14}  "
+            f"{'clean (us)':>10}  {'per-request build (us)':>22}"
+        )
+        for size in options["sizes"]:
+            catalog = synthetic_catalog(size)
+            payload = synthetic_payload(catalog)
+            number = max(1, 2000 // size)
+
+            compile_s = self._best(lambda: build_survey_form_class(catalog), number, options["repeat"])
+            form_class = build_survey_form_class(catalog)
+            construct_s = self._best(lambda: form_class(payload), number, options["repeat"])
+            clean_s = self._best(lambda: form_class(payload).is_valid(), number, options["repeat"]) - construct_s
+
+            self.stdout.write(
+                f"{size:>9}  {compile_s * 1e3:>12.3f}  {construct_s * 1e6:>14.1f}  "
+                f"{clean_s * 1e6:>10.1f}  {(compile_s + construct_s) * 1e6:>22.1f}"
+            )
+
+    @staticmethod
+    def _best(func, number, repeat):
+        return min(timeit.repeat(func, number=number, repeat=repeat)) / number
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from surveys.loadtest import compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the same burst of survey flows with persistent connections and with the connection pool "
+        "(DB_POOL), each in a fresh loadtest process against the configured PostgreSQL database, "
+        "and compare submission latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flows", type=int, default=1000, help="Respondent flows per run.")
+        parser.add_argument("--concurrency", type=int, default=100, help="Virtual users in flight (the burst).")
+        parser.add_argument("--max-size", type=int, help="DB_POOL_MAX_SIZE for the pooled run.")
+        parser.add_argument("--output", help="Write both results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if connections["default"].vendor != "postgresql":
+            raise CommandError("The connection pool needs PostgreSQL; point DATABASE_URL at a PostgreSQL database.")
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, env in (("persistent", {"DB_POOL": "false"}), ("pool", {"DB_POOL": "true"})):
+                if name == "pool" and options["max_size"]:
+                    env["DB_POOL_MAX_SIZE"] = str(options["max_size"])
+                self.stdout.write(f"{name}: {options['flows']} flows at concurrency {options['concurrency']}...")
+                results[name] = self._loadtest(Path(tmp) / f"{name}.json", env, options)
+
+        persistent, pooled = results["persistent"], results["pool"]
+        self.stdout.write(f"{'metric':<28}{'persistent':>11}{'pool':>10}{'change':>9}")
+        for metric, old, new, change in compare(pooled, persistent):
+            self.stdout.write(f"{metric:<28}{old:>11.2f}{new:>10.2f}{change:>+8.1f}%")
+        for name, report in results.items():
+            for kind, count in report["errors"].items():
+                self.stdout.write(f"  {name}: {count} x {kind}")
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"results written to {options['output']}")
+
+    def _loadtest(self, output: Path, env: dict, options) -> dict:
+        process = subprocess.run(
+            [
+                sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), "loadtest",
+                "--flows", str(options["flows"]),
+                "--concurrency", str(options["concurrency"]),
+                "--output", str(output),
+            ],
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, **env),
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            settings_used = ", ".join(f"{key}={value}" for key, value in env.items())
+            raise CommandError(f"loadtest failed ({settings_used}):\n{process.stderr}")
+        with open(output) as f:
+            return json.load(f)
@@ -0,0 +1,142 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.startup import (
+    PROFILES,
+    compare,
+    forbidden_imports,
+    parse_importtime,
+    summarize_imports,
+    summarize_runs,
+)
+
+
+def default_host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip(".")
+        if host and host != "*":
+            return host
+    return "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the project in fresh interpreters under python -X importtime and report the time to "
+        "django.setup(), to the WSGI application and to the first response, with the slowest imports, "
+        "for each application profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", nargs="+", choices=PROFILES, default=list(PROFILES))
+        parser.add_argument("--path", default="/", help='Path of the first request ("" to skip the request).')
+        parser.add_argument("--host", help="Host header of the first request (default: from ALLOWED_HOSTS).")
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Cold starts per profile; the median is reported."
+        )
+        parser.add_argument("--top", type=int, default=10, help="Imports and packages to list.")
+        parser.add_argument(
+            "--forbid",
+            action="append",
+            default=[],
+            metavar="MODULE",
+            help="Fail if this module or package is imported before the first response (repeatable).",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against the JSON results of an earlier run.")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="With --baseline, fail if any metric is this many percent worse.",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        host = options["host"] or default_host()
+        report = {"meta": {"path": options["path"], "repeat": options["repeat"]}, "profiles": {}}
+        failures = []
+        for profile in options["profile"]:
+            runs = []
+            for _ in range(options["repeat"]):
+                run, records, modules = self._cold_start(profile, options["path"], host)
+                runs.append(run)
+            result = summarize_runs(runs) | summarize_imports(records, options["top"])
+            result["modules"] = len(modules)
+            result["status"] = runs[-1].get("status")
+            report["profiles"][profile] = result
+            self._print(profile, result)
+            forbidden = forbidden_imports(modules, options["forbid"])
+            if forbidden:
+                failures.append(
+                    f"{profile}: " + ", ".join(f"{name} ({count} modules)" for name, count in forbidden.items())
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"results written to {options['output']}")
+        if failures:
+            raise CommandError(f"Forbidden modules imported: {'; '.join(failures)}")
+        if baseline is not None:
+            self._compare(report, baseline, options["max_regression"])
+
+    def _cold_start(self, profile, path, host):
+        env = dict(os.environ, SURVEY_APP_PROFILE=profile)
+        # Unset while settings are overridden (in tests); the environment then names the module.
+        if settings.SETTINGS_MODULE:
+            env["DJANGO_SETTINGS_MODULE"] = settings.SETTINGS_MODULE
+        started = time.time()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "surveys.startup", path, host],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+            raise CommandError(f"The {profile} profile failed to start:\n" + "\n".join(errors[-20:]))
+        marks = json.loads(process.stdout.strip().splitlines()[-1])
+        run = {
+            "setup_ms": (marks["setup"] - started) * 1e3,
+            "application_ms": (marks["application"] - started) * 1e3,
+        }
+        if "response" in marks:
+            run["first_response_ms"] = (marks["response"] - started) * 1e3
+            run["status"] = marks["status"]
+        return run, parse_importtime(process.stderr), marks["modules"]
+
+    def _print(self, profile, result):
+        first = result.get("first_response_ms")
+        self.stdout.write(
+            f"{profile}: setup {result['setup_ms']:.0f} ms, application {result['application_ms']:.0f} ms, "
+            + (f"first response {first:.0f} ms (HTTP {result['status']}), " if first is not None else "")
+            + f"{result['modules']} modules loaded, {result['import_ms']:.0f} ms in import statements"
+        )
+        self.stdout.write(f"  {'slowest imports':<40}{'cumulative ms':>14}")
+        for module, ms in result["slowest"].items():
+            self.stdout.write(f"  {module:<40}{ms:>14.1f}")
+        self.stdout.write(f"  {'packages':<40}{'self ms':>14}")
+        for package, ms in result["packages"].items():
+            self.stdout.write(f"  {package:<40}{ms:>14.1f}")
+
+    def _compare(self, report, baseline, max_regression):
+        self.stdout.write(f"{'metric':<28}{'baseline':>10}{'current':>10}{'change':>9}")
+        regressions = []
+        for metric, old, new, change in compare(report, baseline):
+            self.stdout.write(f"{metric:<28}{old:>10.2f}{new:>10.2f}{change:>+8.1f}%")
+            if max_regression is not None and change > max_regression:
+                regressions.append(metric)
+        if regressions:
+            raise CommandError(f"Regressed more than {max_regression}%: {', '.join(regressions)}")
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+
+from surveys.spool import get_spool
+
+
+class Command(BaseCommand):
+    help = "Drain the local submission spool (SURVEY_SPOOL_PATH) into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Submissions per database transaction.")
+        parser.add_argument("--loop", action="store_true", help="Keep flushing until interrupted.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between flushes with --loop.")
+        parser.add_argument("--stats", action="store_true", help="Only report spool depth, lag and dead letters.")
+        parser.add_argument(
+            "--dead-letters", action="store_true", help="List the submissions moved to the dead letters."
+        )
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        if spool is None:
+            raise CommandError("SURVEY_SPOOL_PATH is not configured.")
+
+        if options["stats"]:
+            self._report_stats(spool)
+            return
+        if options["dead_letters"]:
+            for submission_id, error in spool.dead_letters():
+                self.stdout.write(f"{submission_id} {error}")
+            return
+
+        while True:
+            # A long-running loop is not a request: drop connections that broke or outlived CONN_MAX_AGE.
+            close_old_connections()
+            lag_before = spool.stats().lag_seconds
+            started = time.monotonic()
+            try:
+                result = spool.flush(batch_size=options["batch_size"])
+            except DatabaseError as exc:
+                if not options["loop"]:
+                    raise
+                # The database is stalled or restarted; everything stays spooled for the next attempt,
+                # which must not reuse the connection that just failed.
+                close_old_connections()
+                self.stderr.write(f"flush failed, retrying in {options['interval']}s: {exc}")
+            else:
+                if result.drained or result.dead or not options["loop"]:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"flushed={result.written} duplicates={result.duplicates} dead={result.dead} "
+                        f"batches={result.batches} lag_before={lag_before:.1f}s "
+                        f"rate={result.drained / elapsed if elapsed else 0:.0f}/s"
+                    )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def _report_stats(self, spool):
+        stats = spool.stats()
+        self.stdout.write(f"pending={stats.pending} lag={stats.lag_seconds:.1f}s dead={stats.dead}")
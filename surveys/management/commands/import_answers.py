@@ -0,0 +1,63 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from import_export.formats import base_formats
+
+from surveys.resources import SurveyAnswerBulkResource
+
+FORMATS = {
+    ".csv": base_formats.CSV,
+    ".xlsx": base_formats.XLSX,
+    ".json": base_formats.JSON,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import answers from a file in the layout of the answer export, creating "
+        "missing responses. Rows are written in batches, one transaction per batch; "
+        "answers that already exist are skipped, so an interrupted import can be re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="CSV, XLSX or JSON file.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate every row without writing.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = FORMATS.get(path.suffix.lower())
+        if fmt is None:
+            raise CommandError(f"Unsupported file type {path.suffix!r}; use {', '.join(FORMATS)}.")
+        try:
+            data = path.read_bytes() if fmt().is_binary() else path.read_text(encoding="utf-8-sig")
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        started = time.monotonic()
+        dataset = fmt().create_dataset(data)
+        self.stdout.write(f"read {len(dataset)} rows in {time.monotonic() - started:.1f}s")
+
+        def progress(done, total):
+            if total:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{done}/{total} rows ({done / total:.0%}, {done / max(elapsed, 1e-6):.0f} rows/s)")
+
+        resource = SurveyAnswerBulkResource(progress=progress)
+        result = resource.import_data(dataset, dry_run=options["dry_run"])
+
+        for error in result.base_errors:
+            self.stderr.write(f"error: {error.error}")
+        for row in result.error_rows[:20]:
+            self.stderr.write(f"row {row.number}: {row.errors[0].error}")
+        for row in result.invalid_rows[:20]:
+            self.stderr.write(f"row {row.number}: {'; '.join(row.error.messages)}")
+        totals = result.totals
+        verb = "checked" if options["dry_run"] else "imported"
+        self.stdout.write(
+            f"{verb} {totals['new']} answers ({resource.created_responses} new responses), "
+            f"skipped {totals['skip']}, {totals['invalid'] + totals['error']} failed "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        if result.has_errors() or result.has_validation_errors():
+            raise CommandError("Some rows were not imported; see the errors above.")
@@ -0,0 +1,67 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.catalog import load_catalog
+from surveys.ingest import DEFAULT_BATCH_SIZE, FORMATS, SubmissionLoader, read_records
+
+# Invalid records printed in full; the rest are only counted.
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Load offline submissions from CSV or JSON Lines files keyed by the survey form's field "
+        "names (respondent_role, question_<id>, ...; optional submission_id and created_at). "
+        "Records are validated like web submissions and written in batches with COPY on "
+        "PostgreSQL; stored submission ids are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", type=Path, help=f"Files ending in {', '.join(FORMATS)}.")
+        parser.add_argument(
+            "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Submissions per transaction."
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Validate every record without writing.")
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            if path.suffix.lower() not in FORMATS:
+                raise CommandError(f"Unsupported file type {path.suffix!r}; use {', '.join(FORMATS)}.")
+            if not path.is_file():
+                raise CommandError(f"{path} does not exist.")
+
+        loader = SubmissionLoader(load_catalog(), options["batch_size"])
+        started = time.monotonic()
+        invalid = 0
+
+        def report_error(number, error):
+            nonlocal invalid
+            invalid += 1
+            if invalid <= MAX_REPORTED_ERRORS:
+                self.stderr.write(f"{path}:{number}: {'; '.join(error.messages)}")
+
+        def report_batch(stats):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{path}: {stats['read']} read, {stats['written']} written, {stats['invalid']} invalid "
+                f"({stats['read'] / max(elapsed, 1e-6):.0f} records/s)"
+            )
+
+        totals = {}
+        for path in options["paths"]:
+            stats = loader.load(
+                read_records(path), options["dry_run"], on_error=report_error, on_batch=report_batch
+            )
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+
+        verb = "validated" if options["dry_run"] else "loaded"
+        self.stdout.write(
+            f"{verb} {totals['read'] - totals['invalid']} of {totals['read']} records: "
+            f"{totals['written']} new responses, {totals['duplicate']} already stored, "
+            f"{totals['invalid']} invalid in {time.monotonic() - started:.1f}s"
+        )
+        if invalid:
+            raise CommandError(f"{invalid} invalid records were skipped.")
@@ -0,0 +1,116 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+
+from surveys.catalog import get_catalog
+from surveys.loadtest import LoadTest, QueryCounter, compare, discard_submissions, local_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay GET-then-POST survey flows at a given concurrency with an asyncio HTTP client "
+        "and report throughput, latency percentiles, error rate and queries per request. "
+        "Without --url the project is served from a threaded WSGI server in this process, "
+        "against the configured database; its load-test submissions are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Base URL of a running deployment (default: start a local server).")
+        parser.add_argument("--flows", type=int, default=200, help="Respondent flows to run.")
+        parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --flows.")
+        parser.add_argument("--concurrency", type=int, default=20, help="Virtual users in flight.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against the JSON results of an earlier run.")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            metavar="PCT",
+            help="With --baseline, fail if any metric is this many percent worse.",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the load-test submissions.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        meta = {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "concurrency": options["concurrency"],
+            "flows": None if options["duration"] else options["flows"],
+            "duration_s": options["duration"],
+        }
+        paths = (reverse("surveys:form"), reverse("surveys:csrf"))
+        if options["url"]:
+            test = LoadTest(options["url"].rstrip("/"), *paths, settings.CSRF_COOKIE_NAME, options["timeout"])
+            elapsed = asyncio.run(test.run(options["flows"], options["concurrency"], options["duration"]))
+            report = test.report(elapsed, target=options["url"], **meta)
+        else:
+            if not get_catalog().questions:
+                raise CommandError("No active questions; run migrations first.")
+            from django.core.wsgi import get_wsgi_application
+
+            queries = QueryCounter(get_wsgi_application())
+            runs = []
+            try:
+                with local_server(queries) as url:
+                    # Warm up the catalog, compiled form class and connections.
+                    runs.append(LoadTest(url, *paths, settings.CSRF_COOKIE_NAME, options["timeout"]))
+                    asyncio.run(runs[-1].run(2, 1))
+                    test = LoadTest(url, *paths, settings.CSRF_COOKIE_NAME, options["timeout"])
+                    runs.append(test)
+                    queries.requests.clear()
+                    queries.queries.clear()
+                    elapsed = asyncio.run(test.run(options["flows"], options["concurrency"], options["duration"]))
+            finally:
+                if not options["keep"]:
+                    discard_submissions([submission_id for run in runs for submission_id in run.submission_ids])
+            report = test.report(
+                elapsed, queries, target="local", database=connections["default"].vendor, **meta
+            )
+
+        self._print(report)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"results written to {options['output']}")
+        if baseline is not None:
+            self._compare(report, baseline, options["max_regression"])
+
+    def _print(self, report):
+        summary = report["summary"]
+        self.stdout.write(
+            f"{summary['flows']} flows in {report['meta']['elapsed_s']:.1f}s: "
+            f"{summary['flows_per_s']:.1f} flows/s, {summary['requests_per_s']:.1f} req/s, "
+            f"{summary['error_rate'] * 100:.2f}% failed"
+        )
+        self.stdout.write(
+            f"{'step':<11}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        for name, step in report["steps"].items():
+            queries = "-" if step["queries_per_request"] is None else f"{step['queries_per_request']:.1f}"
+            self.stdout.write(
+                f"{name:<11}{step['requests']:>9}{step['errors']:>8}{step['p50_ms']:>9.1f}"
+                f"{step['p95_ms']:>9.1f}{step['p99_ms']:>9.1f}{queries:>9}"
+            )
+        for kind, count in report["errors"].items():
+            self.stdout.write(f"  {count} x {kind}")
+
+    def _compare(self, report, baseline, max_regression):
+        self.stdout.write(f"{'metric':<28}{'baseline':>10}{'current':>10}{'change':>9}")
+        regressions = []
+        for metric, old, new, change in compare(report, baseline):
+            self.stdout.write(f"{metric:<28}{old:>10.2f}{new:>10.2f}{change:>+8.1f}%")
+            if max_regression is not None and change > max_regression:
+                regressions.append(metric)
+        if regressions:
+            raise CommandError(f"Regressed more than {max_regression}%: {', '.join(regressions)}")
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from surveys.documents import rebuild_documents
+from surveys.exports import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every ResponseDocument from SurveyAnswer, one transaction per "
+        "chunk. Use it to backfill or repair the per-response documents."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Responses per transaction.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuilt = rebuild_documents(chunk_size=options["chunk_size"])
+        self.stdout.write(f"rebuilt {rebuilt} documents in {time.monotonic() - started:.1f}s")
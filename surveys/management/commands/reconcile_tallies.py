@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys.tallies import reconcile, unlinked_choice_answers
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-option answer tallies from the option references on "
+        "SurveyAnswer, e.g. to repair drift."
+    )
+
+    def handle(self, *args, **options):
+        unlinked = unlinked_choice_answers()
+        if unlinked:
+            # Reconciling now would drop them from the tallies without a trace.
+            raise CommandError(
+                f"{unlinked} choice answers are stored as label text only and would not be counted; "
+                "run manage.py backfill_answer_options, which links them and reconciles."
+            )
+        started = time.monotonic()
+        keys, answers = reconcile()
+        self.stdout.write(
+            f"reconciled {keys} tallies from {answers} answers in {time.monotonic() - started:.1f}s"
+        )
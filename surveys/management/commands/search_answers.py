@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from surveys.models import SurveyAnswer
+from surveys.search import search_answers
+
+
+class Command(BaseCommand):
+    help = "Full-text search over free-text answers, best matches first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("terms", nargs="+", help="Words to search for.")
+        parser.add_argument("--question", type=int, action="append", help="Only answers to this question id (repeatable).")
+        parser.add_argument("--limit", type=int, default=20, help="Number of results to show.")
+
+    def handle(self, *args, **options):
+        answers = SurveyAnswer.objects.all()
+        if options["question"]:
+            answers = answers.filter(question_id__in=options["question"])
+        started = time.monotonic()
+        results = list(
+            search_answers(" ".join(options["terms"]), answers).values_list(
+                "search_rank", "response_id", "question_id", "answer_text"
+            )[: options["limit"]]
+        )
+        for rank, response_id, question_id, text in results:
+            self.stdout.write(f"{rank:8.3f}  response {response_id}  Q{question_id}  {' '.join(text.split())[:120]}")
+        self.stdout.write(f"{len(results)} results in {(time.monotonic() - started) * 1000:.1f}ms")
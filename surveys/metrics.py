@@ -0,0 +1,474 @@
+"""
+Prometheus metrics, aggregated across worker processes through files.
+
+Every thread of every process writes its samples to its own memory-mapped
+file in ``SURVEY_METRICS_DIR``, named after its pid and thread id. A file has
+a single writer, so an increment is an unlocked read-modify-write of one
+double in the mapping. New series are appended: the entry is written first,
+then the used-length header, so readers never see a half-written entry.
+``render`` reads every file, sums the series and formats them in the
+Prometheus text format, followed by gauges for the local submission spool.
+
+A writer holds an exclusive ``flock`` on its file for as long as it has it
+open. Before reading, a scrape merges every file nobody holds (its thread or
+process has exited) into ``compacted.metrics`` and deletes it, so counters
+stay monotonic while the directory stays as large as the number of live
+threads. Clear the directory when the service is (re)deployed.
+"""
+
+import fcntl
+import logging
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+
+_HEADER = struct.Struct("i4x")
+_LENGTH = struct.Struct("i")
+_VALUE = struct.Struct("d")
+_INITIAL_SIZE = 64 * 1024
+_COMPACTED = "compacted.metrics"
+_COMPACT_LOCK = "compact.lock"
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_directory: Path | None = None
+
+
+def metrics_directory() -> Path:
+    global _directory
+    if _directory is None:
+        _directory = Path(getattr(settings, "SURVEY_METRICS_DIR", "") or settings.BASE_DIR / ".metrics")
+    return _directory
+
+
+@receiver(setting_changed)
+def _reset_directory(setting, **kwargs):
+    global _directory
+    if setting == "SURVEY_METRICS_DIR":
+        _directory = None
+        _local.__dict__.clear()
+
+
+def _entries(data) -> list[tuple[str, float, int]]:
+    """``(key, value, value offset)`` for every complete entry of a file's contents."""
+    entries = []
+    if len(data) < _HEADER.size:
+        return entries
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    position = _HEADER.size
+    while position + _LENGTH.size <= used:
+        (length,) = _LENGTH.unpack_from(data, position)
+        key_start = position + _LENGTH.size
+        value_offset = (key_start + length + 7) & ~7
+        if value_offset + _VALUE.size > used:
+            break
+        key = bytes(data[key_start:key_start + length]).decode()
+        entries.append((key, _VALUE.unpack_from(data, value_offset)[0], value_offset))
+        position = value_offset + _VALUE.size
+    return entries
+
+
+def _lock(fd: int, operation: int) -> bool:
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _encode(totals: dict[str, float]) -> bytes:
+    """A sample file holding ``totals``, in the layout ``_ThreadFile`` writes."""
+    data = bytearray(_HEADER.size)
+    for key, value in totals.items():
+        encoded = key.encode()
+        data += _LENGTH.pack(len(encoded)) + encoded
+        data += bytes(-len(data) % 8)
+        data += _VALUE.pack(value)
+    _HEADER.pack_into(data, 0, len(data))
+    return bytes(data)
+
+
+class _ThreadFile:
+    """The calling thread's own sample file; only that thread ever writes to it."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A scrape may be merging a file of an exited thread that had the same id; wait for it to finish.
+        for _ in range(100):
+            self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if _lock(self.fd, fcntl.LOCK_EX):
+                if os.fstat(self.fd).st_nlink:
+                    break
+            os.close(self.fd)
+            time.sleep(0.01)
+        else:
+            raise OSError(f"{path} stayed locked")
+        size = os.fstat(self.fd).st_size
+        if size < _INITIAL_SIZE:
+            os.ftruncate(self.fd, _INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self.map = mmap.mmap(self.fd, size)
+        # A thread id can be reused after its thread exits: continue that file.
+        self.offsets = {key: offset for key, _, offset in _entries(self.map)}
+        self.used = max(_HEADER.unpack_from(self.map, 0)[0], _HEADER.size)
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode()
+        key_start = self.used + _LENGTH.size
+        value_offset = (key_start + len(encoded) + 7) & ~7
+        end = value_offset + _VALUE.size
+        if end > len(self.map):
+            size = len(self.map)
+            while size < end:
+                size *= 2
+            self.map.close()
+            os.ftruncate(self.fd, size)
+            self.map = mmap.mmap(self.fd, size)
+        _LENGTH.pack_into(self.map, self.used, len(encoded))
+        self.map[key_start:key_start + len(encoded)] = encoded
+        _VALUE.pack_into(self.map, value_offset, 0.0)
+        self.used = end
+        _HEADER.pack_into(self.map, 0, end)
+        self.offsets[key] = value_offset
+        return value_offset
+
+    def add(self, key: str, amount: float) -> None:
+        offset = self.offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        _VALUE.pack_into(self.map, offset, _VALUE.unpack_from(self.map, offset)[0] + amount)
+
+    def __del__(self):
+        # Closing the descriptor releases the lock (never unlock: a forked child shares it with its parent).
+        if hasattr(self, "map"):
+            self.map.close()
+            os.close(self.fd)
+
+
+class _DiscardFile:
+    """Stands in for a sample file that could not be opened; metrics never fail a request."""
+
+    def add(self, key: str, amount: float) -> None:
+        pass
+
+
+def _thread_file() -> _ThreadFile | _DiscardFile:
+    pid = os.getpid()
+    thread_file = getattr(_local, "file", None)
+    # A forked worker inherits its parent's thread-local state; never share the parent's file.
+    if thread_file is None or _local.pid != pid:
+        path = metrics_directory() / f"{pid}-{threading.get_ident()}.metrics"
+        try:
+            thread_file = _ThreadFile(path)
+        except OSError:
+            logger.warning("Cannot write metrics to %s; discarding this thread's samples.", path, exc_info=True)
+            thread_file = _DiscardFile()
+        _local.file, _local.pid = thread_file, pid
+    return thread_file
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        REGISTRY[name] = self
+
+    def _key(self, sample: str, labels: dict) -> str:
+        # Series keys are "sample|label=value|..."; label values never contain "|" or "=" unescaped.
+        parts = [sample] + [f"{name}={_key_escape(labels[name])}" for name in self.labelnames]
+        return "|".join(parts)
+
+
+def _key_escape(value) -> str:
+    return str(value).replace("%", "%25").replace("|", "%7C").replace("=", "%3D")
+
+
+def _key_unescape(value: str) -> str:
+    return value.replace("%3D", "=").replace("%7C", "|").replace("%25", "%")
+
+
+def _parse_key(key: str) -> tuple[str, tuple[tuple[str, str], ...]]:
+    sample, *pairs = key.split("|")
+    labels = (pair.partition("=") for pair in pairs)
+    return sample, tuple((name, _key_unescape(value)) for name, _, value in labels)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        _thread_file().add(self._key(self.name + "_total", labels), amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        # Buckets are stored per bucket (one increment) and made cumulative when rendered.
+        thread_file = _thread_file()
+        bucket = self.buckets[bisect_left(self.buckets, value)]
+        thread_file.add(self._key(f"{self.name}_bucket:{_format_value(bucket)}", labels), 1.0)
+        thread_file.add(self._key(f"{self.name}_sum", labels), value)
+        thread_file.add(self._key(f"{self.name}_count", labels), 1.0)
+
+
+REGISTRY: dict[str, _Metric] = {}
+
+request_duration = Histogram(
+    "survey_request_duration_seconds", "Time to respond to a request, by view.", ("view", "method")
+)
+request_queries = Histogram(
+    "survey_request_db_queries", "Database queries per request, by view.", ("view",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+submissions = Counter(
+    "survey_submissions",
+    "Accepted survey submissions, by how they were stored and whether they were new or a replay.",
+    ("mode", "outcome"),
+)
+answers_per_submission = Histogram(
+    "survey_answers_per_submission", "Answers in each accepted submission.", buckets=(1, 2, 5, 10, 20, 50)
+)
+validation_failures = Counter(
+    "survey_validation_failures", "Survey form fields rejected by validation.", ("field",)
+)
+pool_checkouts = Counter(
+    "survey_db_pool_checkouts", "Connections taken from the connection pool, by database.", ("database",)
+)
+pool_waits = Counter(
+    "survey_db_pool_waits", "Pool checkouts that had to wait for a free connection.", ("database",)
+)
+pool_wait_seconds = Counter(
+    "survey_db_pool_wait_seconds", "Time spent waiting for a pooled connection.", ("database",)
+)
+pool_timeouts = Counter(
+    "survey_db_pool_timeouts", "Pool checkouts that failed or timed out.", ("database",)
+)
+pool_connections = Counter(
+    "survey_db_pool_connections", "Connections opened by the pool.", ("database",)
+)
+pool_connections_lost = Counter(
+    "survey_db_pool_connections_lost", "Pooled connections found broken by the health check.", ("database",)
+)
+replica_reads = Counter(
+    "survey_replica_reads",
+    "Read-only admin views and exports, by where they read: replica, or why not (lagging, unavailable, pinned).",
+    ("route",),
+)
+export_duration = Histogram(
+    "survey_export_duration_seconds", "Time to write an export, by format and table.", ("format", "table"),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+
+def compact(directory: Path) -> int:
+    """
+    Merge the sample files that no writer holds into ``compacted.metrics``
+    and delete them. Returns the number of files merged. The caller holds the
+    compaction lock exclusively.
+    """
+    released = []
+    for path in directory.glob("*.metrics"):
+        if path.name == _COMPACTED:
+            continue
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        if _lock(fd, fcntl.LOCK_EX):
+            released.append((path, fd))
+        else:
+            os.close(fd)
+    try:
+        if released:
+            totals: dict[str, float] = defaultdict(float)
+            compacted = directory / _COMPACTED
+            for path in [compacted, *(path for path, _ in released)]:
+                if path.exists():
+                    for key, value, _ in _entries(path.read_bytes()):
+                        totals[key] += value
+            temporary = directory / f"{_COMPACTED}.{os.getpid()}.tmp"
+            temporary.write_bytes(_encode(totals))
+            os.replace(temporary, compacted)
+            for path, _ in released:
+                path.unlink()
+    finally:
+        for _, fd in released:
+            os.close(fd)
+    return len(released)
+
+
+def collect() -> dict[tuple[str, tuple], float]:
+    """Sum every series over all sample files, after compacting those of exited writers."""
+    totals: dict[tuple[str, tuple], float] = defaultdict(float)
+    directory = metrics_directory()
+    if not directory.is_dir():
+        return totals
+    lock = os.open(directory / _COMPACT_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # One scrape compacts; the others read once it is done, never halfway through.
+        if _lock(lock, fcntl.LOCK_EX):
+            try:
+                compact(directory)
+            except OSError:
+                logger.warning("Cannot compact the metrics files in %s.", directory, exc_info=True)
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        for path in directory.glob("*.metrics"):
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue
+            for key, value, _ in _entries(data):
+                totals[_parse_key(key)] += value
+    finally:
+        os.close(lock)
+    return totals
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    samples: dict[str, dict[tuple, float]] = defaultdict(dict)
+    for (sample, labels), value in collect().items():
+        samples[sample][labels] = value
+
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        if isinstance(metric, Counter):
+            for labels, value in sorted(samples.get(metric.name + "_total", {}).items()):
+                lines.append(f"{metric.name}_total{_format_labels(labels)} {_format_value(value)}")
+            continue
+        series = sorted(samples.get(metric.name + "_count", {}))
+        for labels in series:
+            cumulative = 0.0
+            for bound in metric.buckets:
+                cumulative += samples.get(f"{metric.name}_bucket:{_format_value(bound)}", {}).get(labels, 0.0)
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}")
+            for suffix in ("_sum", "_count"):
+                value = samples.get(metric.name + suffix, {}).get(labels, 0.0)
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    lines.extend(_spool_lines())
+    return "\n".join(lines) + "\n"
+
+
+# Read from the spool journal at scrape time. Like the sample files, the spool
+# is local to the host, so the host's own scrape reports it.
+SPOOL_GAUGES = (
+    ("survey_spool_pending", "Submissions waiting in the local write-behind spool."),
+    ("survey_spool_oldest_age_seconds", "Seconds the oldest submission in the local spool has waited."),
+    ("survey_spool_dead_letters", "Spooled submissions moved to the dead letters after failing on their own."),
+)
+
+
+def _spool_lines() -> list[str]:
+    from .spool import get_spool
+
+    spool = get_spool()
+    if spool is None:
+        return []
+    try:
+        stats = spool.stats()
+    except sqlite3.Error:
+        logger.warning("Cannot read the submission spool.", exc_info=True)
+        return []
+    lines = []
+    for (name, documentation), value in zip(SPOOL_GAUGES, (stats.pending, stats.lag_seconds, stats.dead)):
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+    return lines
+
+
+def enabled() -> bool:
+    return getattr(settings, "SURVEY_METRICS", True)
+
+
+def record_submission(submission, mode: str, created: bool) -> None:
+    """Count ``submission``; a replay of an already stored ``submission_id`` is a duplicate."""
+    if enabled():
+        submissions.inc(mode=mode, outcome="new" if created else "duplicate")
+        if created:
+            answers_per_submission.observe(len(submission.answers))
+
+
+def record_validation_errors(form) -> None:
+    if enabled():
+        for field in form.errors:
+            validation_failures.inc(field=field)
+
+
+# psycopg_pool statistic -> counter and scale.
+_POOL_STATS = (
+    ("requests_num", pool_checkouts, 1),
+    ("requests_queued", pool_waits, 1),
+    ("requests_wait_ms", pool_wait_seconds, 1e-3),
+    ("requests_errors", pool_timeouts, 1),
+    ("connections_num", pool_connections, 1),
+    ("connections_lost", pool_connections_lost, 1),
+)
+
+
+def record_pool_stats(database: str, stats: dict) -> None:
+    """Add the counters of a psycopg_pool ``pop_stats()`` result."""
+    for key, counter, scale in _POOL_STATS:
+        if stats.get(key):
+            counter.inc(stats[key] * scale, database=database)
+
+
+def collect_pool_stats() -> None:
+    """Move the statistics of this process's connection pools into the pool counters."""
+    if not enabled():
+        return
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor == "postgresql" and connection.settings_dict["OPTIONS"].get("pool"):
+            record_pool_stats(connection.alias, connection.pool.pop_stats())
+
+
+@contextmanager
+def time_export(fmt: str, table: str):
+    """Observe the duration of the enclosed export, if it completes."""
+    started = perf_counter()
+    yield
+    if enabled():
+        export_duration.observe(perf_counter() - started, format=fmt, table=table)
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CHUNK_SIZE = 2000
+
+
+def backfill_documents(apps, schema_editor):
+    SurveyResponse = apps.get_model("surveys", "SurveyResponse")
+    SurveyAnswer = apps.get_model("surveys", "SurveyAnswer")
+    ResponseDocument = apps.get_model("surveys", "ResponseDocument")
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            SurveyResponse.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("id", "respondent_name", "respondent_email", "respondent_role", "created_at")[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        answers = {}
+        for response_id, question_id, answer_text in (
+            SurveyAnswer.objects.filter(response_id__gte=chunk[0][0], response_id__lte=chunk[-1][0])
+            .order_by("response_id", "question_id")
+            .values_list("response_id", "question_id", "answer_text")
+        ):
+            answers.setdefault(response_id, {})[str(question_id)] = answer_text
+        ResponseDocument.objects.bulk_create([
+            ResponseDocument(
+                response_id=response_id,
+                respondent_name=name,
+                respondent_email=email,
+                respondent_role=role,
+                created_at=created_at,
+                answers=answers.get(response_id, {}),
+            )
+            for response_id, name, email, role, created_at in chunk
+        ])
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0013_submission_id_and_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseDocument',
+            fields=[
+                ('response', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='surveys.surveyresponse')),
+                ('respondent_name', models.CharField(blank=True, max_length=120)),
+                ('respondent_email', models.EmailField(blank=True, max_length=254)),
+                ('respondent_role', models.CharField(choices=[('all', 'General respondent'), ('builders', 'Builder / technical')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('answers', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['response_id'],
+            },
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_tallies(apps, schema_editor):
+    QuestionOption = apps.get_model("surveys", "QuestionOption")
+    SurveyAnswer = apps.get_model("surveys", "SurveyAnswer")
+    OptionTally = apps.get_model("surveys", "OptionTally")
+
+    options = {
+        (question_id, label): option_id
+        for option_id, question_id, label in QuestionOption.objects.filter(question__is_active=True).values_list(
+            "id", "question_id", "label"
+        )
+    }
+    counts = {}
+    grouped = (
+        SurveyAnswer.objects.order_by()
+        .values("question_id", "answer_text", "response__respondent_role")
+        .annotate(total=Count("id"))
+        .values_list("question_id", "answer_text", "response__respondent_role", "total")
+    )
+    for question_id, answer_text, role, total in grouped:
+        option_id = options.get((question_id, answer_text))
+        if option_id is not None:
+            key = (question_id, option_id, role)
+            counts[key] = counts.get(key, 0) + total
+    OptionTally.objects.bulk_create(
+        [
+            OptionTally(question_id=question_id, option_id=option_id, respondent_role=role, count=total)
+            for (question_id, option_id, role), total in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0014_response_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptionTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respondent_role', models.CharField(choices=[('all', 'General respondent'), ('builders', 'Builder / technical')], max_length=20)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('count', models.BigIntegerField(default=0)),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='surveys.questionoption')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='surveys.question')),
+            ],
+            options={
+                'ordering': ['question_id', 'option_id', 'respondent_role', 'shard'],
+                'constraints': [models.UniqueConstraint(fields=('option', 'respondent_role', 'shard'), name='surveys_optiontally_unique_shard')],
+            },
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0015_option_tally'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveyanswer',
+            name='option',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='answers', to='surveys.questionoption'),
+        ),
+        migrations.AlterField(
+            model_name='surveyanswer',
+            name='answer_text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='surveyanswer',
+            index=models.Index(fields=['question', 'option'], name='surveys_answer_question_option'),
+        ),
+    ]
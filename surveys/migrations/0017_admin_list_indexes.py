@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0016_answer_option'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='surveyanswer',
+            index=models.Index(fields=['created_at'], name='surveys_answer_created'),
+        ),
+        migrations.AddIndex(
+            model_name='surveyresponse',
+            index=models.Index(fields=['created_at'], name='surveys_response_created'),
+        ),
+        migrations.AddIndex(
+            model_name='surveyresponse',
+            index=models.Index(fields=['respondent_role', 'created_at'], name='surveys_response_role_created'),
+        ),
+        migrations.AddIndex(
+            model_name='surveyresponse',
+            index=models.Index(fields=['respondent_email'], name='surveys_response_email'),
+        ),
+    ]
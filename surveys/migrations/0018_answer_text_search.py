@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Frozen copies of the DDL in surveys.search as of this migration; later
+# changes to the app module must not change what this migration does.
+PG_INSTALL = [
+    "CREATE INDEX IF NOT EXISTS surveys_answer_text_fts ON surveys_surveyanswer "
+    "USING GIN (to_tsvector('english', answer_text))",
+]
+PG_UNINSTALL = [
+    "DROP INDEX IF EXISTS surveys_answer_text_fts",
+]
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS surveys_answer_fts USING fts5("
+    "answer_text, content='surveys_surveyanswer', content_rowid='id', tokenize='porter unicode61')",
+    """
+    CREATE TRIGGER IF NOT EXISTS surveys_answer_fts_ai AFTER INSERT ON surveys_surveyanswer BEGIN
+        INSERT INTO surveys_answer_fts(rowid, answer_text) VALUES (new.id, new.answer_text);
+    END""",
+    """
+    CREATE TRIGGER IF NOT EXISTS surveys_answer_fts_ad AFTER DELETE ON surveys_surveyanswer BEGIN
+        INSERT INTO surveys_answer_fts(surveys_answer_fts, rowid, answer_text)
+        VALUES ('delete', old.id, old.answer_text);
+    END""",
+    """
+    CREATE TRIGGER IF NOT EXISTS surveys_answer_fts_au AFTER UPDATE OF answer_text ON surveys_surveyanswer BEGIN
+        INSERT INTO surveys_answer_fts(surveys_answer_fts, rowid, answer_text)
+        VALUES ('delete', old.id, old.answer_text);
+        INSERT INTO surveys_answer_fts(rowid, answer_text) VALUES (new.id, new.answer_text);
+    END""",
+    "INSERT INTO surveys_answer_fts(surveys_answer_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS surveys_answer_fts_ai",
+    "DROP TRIGGER IF EXISTS surveys_answer_fts_ad",
+    "DROP TRIGGER IF EXISTS surveys_answer_fts_au",
+    "DROP TABLE IF EXISTS surveys_answer_fts",
+]
+
+
+def _run(schema_editor, statements):
+    vendor = schema_editor.connection.vendor
+    for sql in statements.get(vendor, []):
+        schema_editor.execute(sql)
+
+
+def install_search(apps, schema_editor):
+    _run(schema_editor, {"postgresql": PG_INSTALL, "sqlite": SQLITE_INSTALL})
+
+
+def uninstall_search(apps, schema_editor):
+    _run(schema_editor, {"postgresql": PG_UNINSTALL, "sqlite": SQLITE_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0017_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
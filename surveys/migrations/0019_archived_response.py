@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0018_answer_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedResponse',
+            fields=[
+                ('response_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('submission_id', models.UUIDField(blank=True, editable=False, null=True, unique=True)),
+                ('respondent_role', models.CharField(choices=[('all', 'General respondent'), ('builders', 'Builder / technical')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('payload', models.BinaryField()),
+            ],
+            options={
+                'ordering': ['-response_id'],
+                'indexes': [models.Index(fields=['created_at'], name='surveys_archived_created')],
+            },
+        ),
+    ]
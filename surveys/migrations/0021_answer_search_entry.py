@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0020_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerSearchEntry',
+            fields=[
+                ('answer', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='surveys.surveyanswer')),
+                ('answer_text', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'surveys_answer_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,4 +1,8 @@
+import json
+import zlib
+
 from django.db import models
+from django.utils import timezone
 
 
 class Question(models.Model):
@@ -58,11 +62,20 @@ class SurveyResponse(models.Model):
         choices=RespondentRole.choices,
         default=RespondentRole.GENERAL,
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Client-side identity of the submission; keeps spooled/replayed submissions exactly-once.
+    submission_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Not auto_now_add: spooled and imported submissions keep their original time.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        # Back the admin's list filters and exact-email search.
+        indexes = [
+            models.Index(fields=["created_at"], name="surveys_response_created"),
+            models.Index(fields=["respondent_role", "created_at"], name="surveys_response_role_created"),
+            models.Index(fields=["respondent_email"], name="surveys_response_email"),
+        ]
 
     def __str__(self) -> str:
         identity = self.respondent_name or "Anonymous responder"
@@ -80,12 +93,144 @@ class SurveyAnswer(models.Model):
         on_delete=models.PROTECT,
         related_name="answers",
     )
-    answer_text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Choice answers reference their option and leave answer_text empty;
+    # free-text answers (and stored texts that match no option) use answer_text.
+    option = models.ForeignKey(
+        QuestionOption,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="answers",
+    )
+    answer_text = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ["question_id"]
         unique_together = ("response", "question")
+        indexes = [
+            models.Index(fields=["question", "option"], name="surveys_answer_question_option"),
+            models.Index(fields=["created_at"], name="surveys_answer_created"),
+        ]
 
     def __str__(self) -> str:
         return f"Response {self.response_id} → Question {self.question_id}"
+
+    @property
+    def answer_display(self) -> str:
+        return self.option.label if self.option_id else self.answer_text
+
+
+class AnswerSearchEntry(models.Model):
+    """
+    A row of the SQLite FTS5 index over answer texts (see ``surveys.search``).
+
+    The table exists on SQLite only and is kept in sync by triggers; Django
+    never writes it. The model lets searches join the index and read its
+    ``rank`` in the same query.
+    """
+
+    answer = models.OneToOneField(
+        SurveyAnswer,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_entry",
+    )
+    answer_text = models.TextField()
+    # FTS5's hidden bm25 column; lower is better.
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "surveys_answer_fts"
+
+
+class ResponseDocument(models.Model):
+    """
+    One row per response with every answer in a JSON object keyed by question id.
+
+    Written in the same transaction as the response and its answers, so
+    exports read one row per response instead of pivoting ``SurveyAnswer``.
+    """
+
+    response = models.OneToOneField(
+        SurveyResponse,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="document",
+    )
+    respondent_name = models.CharField(max_length=120, blank=True)
+    respondent_email = models.EmailField(blank=True)
+    respondent_role = models.CharField(max_length=20, choices=SurveyResponse.RespondentRole.choices)
+    created_at = models.DateTimeField()
+    answers = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["response_id"]
+
+    def __str__(self) -> str:
+        return f"Document for response {self.response_id}"
+
+
+class OptionTally(models.Model):
+    """
+    Running count of answers per (question, option, respondent role).
+
+    Each key is split over ``SURVEY_TALLY_SHARDS`` rows so concurrent
+    submissions rarely update the same row; read the total with ``Sum``.
+    See ``surveys.tallies``.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="tallies")
+    option = models.ForeignKey(QuestionOption, on_delete=models.CASCADE, related_name="tallies")
+    respondent_role = models.CharField(max_length=20, choices=SurveyResponse.RespondentRole.choices)
+    shard = models.PositiveSmallIntegerField(default=0)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["question_id", "option_id", "respondent_role", "shard"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["option", "respondent_role", "shard"],
+                name="surveys_optiontally_unique_shard",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.option} · {self.respondent_role} · shard {self.shard}: {self.count}"
+
+
+class ArchivedResponse(models.Model):
+    """
+    A response moved out of the live tables by ``manage.py archive_responses``.
+
+    Respondent details and answers (as in ``ResponseDocument``) are kept as
+    zlib-compressed JSON in ``payload``; the role and date stay plain columns
+    for filtering. Exports include these rows on request.
+    """
+
+    response_id = models.BigIntegerField(primary_key=True)
+    submission_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    respondent_role = models.CharField(max_length=20, choices=SurveyResponse.RespondentRole.choices)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now, editable=False)
+    payload = models.BinaryField()
+
+    class Meta:
+        ordering = ["-response_id"]
+        indexes = [models.Index(fields=["created_at"], name="surveys_archived_created")]
+
+    def __str__(self) -> str:
+        return f"Archived response {self.response_id}"
+
+    @staticmethod
+    def pack(data: dict) -> bytes:
+        return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+    @staticmethod
+    def unpack(payload: bytes) -> dict:
+        """``{"respondent_name": ..., "respondent_email": ..., "answers": {question id: text}}``"""
+        return json.loads(zlib.decompress(payload))
@@ -1,6 +1,25 @@
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from import_export import resources, fields
-from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
+from import_export.results import Result
+from import_export.widgets import DateTimeWidget, ForeignKeyWidget, IntegerWidget, ManyToManyWidget
+from .catalog import get_catalog
+from .documents import refresh_documents
+from .exports import detailed_headers, iter_detailed_rows, question_column_name, read_snapshot
 from .models import Question, QuestionOption, SurveyResponse, SurveyAnswer
+from .tallies import apply_deltas, count_answers
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk_create and per transaction in bulk imports
+IMPORT_BATCH_SIZE = 1000
+# Existing responses are looked up this many ids at a time
+LOOKUP_CHUNK_SIZE = 1000
 
 
 class QuestionResource(resources.ModelResource):
@@ -39,6 +58,12 @@ class SurveyAnswerResource(resources.ModelResource):
     answer_text = fields.Field(attribute='answer_text', column_name='Answer')
     created_at = fields.Field(attribute='created_at', column_name='Answered At')
     
+    def dehydrate_answer_text(self, answer):
+        return answer.answer_display
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('response', 'question', 'option')
+
     class Meta:
         model = SurveyAnswer
         fields = ('response_id', 'respondent_name', 'respondent_email', 'question_id', 
@@ -47,6 +72,183 @@ class SurveyAnswerResource(resources.ModelResource):
                        'question_category', 'question_prompt', 'answer_text', 'created_at')
 
 
+class IsoDateTimeWidget(DateTimeWidget):
+    """Also reads the ISO 8601 text the answer export writes, offset included"""
+
+    def clean(self, value, row=None, **kwargs):
+        if isinstance(value, str):
+            parsed = parse_datetime(value.strip())
+            if parsed is not None:
+                return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+        return super().clean(value, row=row, **kwargs)
+
+
+class SummaryResult(Result):
+    """
+    Import result that keeps totals, errors and only the first rows, so a file
+    with hundreds of thousands of rows does not pile up a row result each.
+    """
+
+    preview_rows = 100
+
+    def append_row_result(self, row_result):
+        if len(self.rows) < self.preview_rows:
+            self.rows.append(row_result)
+
+    def has_errors(self):
+        return bool(self.base_errors or self.error_rows)
+
+
+class SurveyAnswerBulkResource(resources.ModelResource):
+    """
+    Bulk import of answers in the layout ``SurveyAnswerResource`` exports.
+
+    Rows with the same Response ID belong to one response; a response missing
+    from the database is created with that id from the row's respondent
+    columns (and an optional Respondent Role column). Questions, options and
+    the existing responses are loaded into memory in ``before_import``, so no
+    row runs a query. Answers already stored for a (response, question) are
+    skipped, which makes an interrupted import safe to run again.
+
+    Every ``batch_size`` rows are written with ``bulk_create`` in their own
+    transaction, together with the responses they need, their documents and
+    tallies. Dry runs (the admin preview) validate rows without writing.
+    """
+
+    response_id = fields.Field(attribute='response_id', column_name='Response ID', widget=IntegerWidget())
+    question_id = fields.Field(attribute='question_id', column_name='Question ID', widget=IntegerWidget())
+    respondent_name = fields.Field(column_name='Respondent Name')
+    respondent_email = fields.Field(column_name='Respondent Email')
+    answer_text = fields.Field(attribute='answer_text', column_name='Answer')
+    created_at = fields.Field(attribute='created_at', column_name='Answered At', widget=IsoDateTimeWidget())
+
+    def __init__(self, progress=None, **kwargs):
+        super().__init__(**kwargs)
+        # Called as progress(rows read, total rows) after every batch.
+        self.progress = progress
+
+    def get_result_class(self):
+        return SummaryResult
+
+    def before_import(self, dataset, **kwargs):
+        self.total_rows = len(dataset)
+        self.rows_read = 0
+        self.new_responses = {}
+        self.created_responses = 0
+        # Role of every response the file touches, and the questions each already answered.
+        self.roles = {}
+        self.answered = set()
+        self.question_ids = set(Question.objects.values_list('id', flat=True))
+        self.options = {}
+        for question_id, option_id, value, label in QuestionOption.objects.values_list(
+            'question_id', 'id', 'value', 'label'
+        ):
+            choices = self.options.setdefault(question_id, {})
+            choices.setdefault(value, option_id)
+            choices.setdefault(label, option_id)
+
+        response_ids = sorted({
+            int(value) for value in dataset['Response ID'] if str(value).strip().isdigit()
+        })
+        for start in range(0, len(response_ids), LOOKUP_CHUNK_SIZE):
+            chunk = response_ids[start:start + LOOKUP_CHUNK_SIZE]
+            self.roles.update(SurveyResponse.objects.filter(pk__in=chunk).values_list('pk', 'respondent_role'))
+            self.answered.update(
+                SurveyAnswer.objects.filter(response_id__in=chunk).values_list('response_id', 'question_id')
+            )
+
+    def import_instance(self, instance, row, **kwargs):
+        super().import_instance(instance, row, **kwargs)
+        if instance.response_id is None:
+            raise ValidationError({'response_id': 'Response ID is required.'})
+        if instance.question_id not in self.question_ids:
+            raise ValidationError({'question_id': f'Unknown question {instance.question_id}.'})
+        choices = self.options.get(instance.question_id)
+        text = '' if instance.answer_text is None else str(instance.answer_text).strip()
+        if choices:
+            instance.option_id = choices.get(text)
+            if instance.option_id is None:
+                raise ValidationError({'answer_text': f'"{text}" is not an option of question {instance.question_id}.'})
+            instance.answer_text = ''
+        else:
+            instance.answer_text = text
+        if instance.created_at is None:
+            raise ValidationError({'created_at': 'Answered At is required.'})
+        if instance.response_id not in self.roles:
+            role = (row.get('Respondent Role') or SurveyResponse.RespondentRole.GENERAL).strip()
+            # Exports write the role's label; accept it or the stored value.
+            role = {label: value for value, label in SurveyResponse.RespondentRole.choices}.get(role, role)
+            if role not in SurveyResponse.RespondentRole.values:
+                raise ValidationError({'respondent_role': f'Unknown respondent role "{role}".'})
+            self.roles[instance.response_id] = role
+            self.new_responses[instance.response_id] = SurveyResponse(
+                pk=instance.response_id,
+                respondent_name=(row.get('Respondent Name') or '').strip(),
+                respondent_email=(row.get('Respondent Email') or '').strip(),
+                respondent_role=role,
+                created_at=instance.created_at,
+            )
+
+    def skip_row(self, instance, original, row, import_validation_errors=None):
+        if import_validation_errors:
+            return False
+        key = (instance.response_id, instance.question_id)
+        if key in self.answered:
+            return True
+        self.answered.add(key)
+        return False
+
+    def before_import_row(self, row, **kwargs):
+        self.rows_read += 1
+
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        answers, self.create_instances = self.create_instances, []
+        if answers and not dry_run:
+            try:
+                self.write_batch(answers, batch_size)
+            except Exception as e:
+                self.handle_import_error(result, e, raise_errors)
+        if self.progress is not None:
+            self.progress(self.rows_read, self.total_rows)
+
+    def write_batch(self, answers, batch_size=None):
+        responses = [
+            self.new_responses.pop(response_id)
+            for response_id in dict.fromkeys(answer.response_id for answer in answers)
+            if response_id in self.new_responses
+        ]
+        with transaction.atomic(using=self.get_db_connection_name()):
+            SurveyResponse.objects.bulk_create(responses, batch_size=batch_size)
+            SurveyAnswer.objects.bulk_create(answers, batch_size=batch_size)
+            # bulk_create sends no signals: keep documents and tallies in step here.
+            refresh_documents({answer.response_id for answer in answers})
+            apply_deltas(count_answers(
+                (answer.question_id, answer.option_id, self.roles[answer.response_id]) for answer in answers
+            ))
+        self.created_responses += len(responses)
+        logger.info('Imported %d of %d answer rows', self.rows_read, self.total_rows)
+
+    def after_import(self, dataset, result, **kwargs):
+        if self.created_responses:
+            # Responses were inserted with explicit ids; move the id sequence past them.
+            connection = connections[self.get_db_connection_name()]
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [SurveyResponse]):
+                    cursor.execute(sql)
+
+    class Meta:
+        model = SurveyAnswer
+        fields = ('response_id', 'respondent_name', 'respondent_email', 'question_id', 'answer_text', 'created_at')
+        import_id_fields = ('response_id', 'question_id')
+        use_bulk = True
+        batch_size = IMPORT_BATCH_SIZE
+        # Every row is a new answer: no instance lookups, diffs or per-row transactions.
+        force_init_instance = True
+        skip_diff = True
+        skip_html_diff = True
+        use_transactions = False
+
+
 class SurveyResponseDetailedResource(resources.ModelResource):
     """
     Resource for exporting Survey Responses in a wide format where each question becomes a column.
@@ -61,13 +263,10 @@ class SurveyResponseDetailedResource(resources.ModelResource):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Dynamically add question fields
-        questions = Question.objects.filter(is_active=True).order_by('id')
-        for question in questions:
+        self.catalog = get_catalog()
+        for question in self.catalog:
             field_name = f'q{question.id}'
-            # Truncate long prompts for column headers
-            prompt_short = question.prompt[:60] + '...' if len(question.prompt) > 60 else question.prompt
-            column_name = f'Q{question.id}: {prompt_short}'
-            setattr(self, field_name, fields.Field(column_name=column_name, readonly=True))
+            setattr(self, field_name, fields.Field(column_name=question_column_name(question), readonly=True))
     
     def dehydrate_respondent_name(self, response):
         return response.respondent_name or 'Anonymous'
@@ -81,59 +280,20 @@ class SurveyResponseDetailedResource(resources.ModelResource):
     def dehydrate_response_date(self, response):
         return response.created_at.strftime('%Y-%m-%d %H:%M:%S') if response.created_at else ''
     
-    def get_queryset(self):
-        """Prefetch related answers for efficiency"""
-        return super().get_queryset().prefetch_related('answers__question')
-    
     def get_export_headers(self):
         """Get headers for export, including dynamic question columns"""
-        headers = ['ID', 'Respondent Name', 'Respondent Email', 'Respondent Role', 'Response Date']
-        questions = Question.objects.filter(is_active=True).order_by('id')
-        for question in questions:
-            prompt_short = question.prompt[:60] + '...' if len(question.prompt) > 60 else question.prompt
-            column_name = f'Q{question.id}: {prompt_short}'
-            headers.append(column_name)
-        return headers
+        return detailed_headers(self.catalog)
     
     def export(self, queryset=None, *args, **kwargs):
         """Override export to populate question columns dynamically"""
         if queryset is None:
             queryset = self.get_queryset()
         
-        # Get all active questions ordered by ID
-        questions = list(Question.objects.filter(is_active=True).order_by('id'))
-        question_ids = [q.id for q in questions]
-        
-        # Prefetch answers for efficiency
-        queryset = queryset.prefetch_related('answers__question')
-        
-        # Build the dataset manually
-        rows = []
-        headers = ['ID', 'Respondent Name', 'Respondent Email', 'Respondent Role', 'Response Date']
-        
-        # Add question headers
-        for question in questions:
-            prompt_short = question.prompt[:60] + '...' if len(question.prompt) > 60 else question.prompt
-            headers.append(f'Q{question.id}: {prompt_short}')
-        
-        # Build rows
-        for response in queryset:
-            row = [
-                response.id,
-                response.respondent_name or 'Anonymous',
-                response.respondent_email or '',
-                response.get_respondent_role_display(),
-                response.created_at.strftime('%Y-%m-%d %H:%M:%S') if response.created_at else '',
-            ]
-            
-            # Create a dictionary of question_id -> answer_text for quick lookup
-            answers_dict = {answer.question_id: answer.answer_text for answer in response.answers.all()}
-            
-            # Add answer for each question
-            for qid in question_ids:
-                row.append(answers_dict.get(qid, ''))
-            
-            rows.append(row)
+        # Rows are read in primary-key chunks with answers as plain tuples
+        # (see surveys.exports); for large exports prefer the streaming CSV action.
+        headers = detailed_headers(self.catalog)
+        with read_snapshot():
+            rows = list(iter_detailed_rows(queryset.prefetch_related(None), self.catalog))
         
         # Return as tablib Dataset
         try:
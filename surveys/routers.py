@@ -0,0 +1,248 @@
+"""
+Read replica routing for the admin's read-only views, exports and analytics.
+
+With ``DATABASE_REPLICA_URL`` set, settings add a ``replica`` database and
+``ReplicaRouter``. Reads go to the replica only inside ``replica_reads()``,
+which the survey admins use around changelists, analytics and exports, and
+``export_responses`` around its export; everything else, and every write,
+stays on the primary. Only response data is routed: the question catalog is
+always read from the primary, so a lagging replica never feeds it.
+
+``replica_reads()`` decides once, on entry, and falls back to the primary
+when the replica is unreachable or more than ``SURVEY_REPLICA_MAX_LAG``
+seconds behind. The check is cached for ``SURVEY_REPLICA_CHECK_INTERVAL``
+seconds per process. After an admin POST, ``ReadYourWritesMiddleware`` sets
+a signed cookie that keeps that browser on the primary for
+``SURVEY_READ_YOUR_WRITES_SECONDS``, so the changelist it returns to shows
+the edit. Streaming responses read after the view returns; wrap their
+content in ``in_context`` to keep the view's routing.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+
+from . import metrics
+
+REPLICA = "replica"
+PIN_COOKIE = "survey_primary"
+
+# Response data that may be read from the replica; the catalog (questions, options) never is.
+REPLICA_MODELS = frozenset(
+    ["surveys.surveyresponse", "surveys.surveyanswer", "surveys.responsedocument",
+     "surveys.archivedresponse", "surveys.optiontally"]
+)
+
+_SAFE_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "TRACE"])
+
+# Seconds the standby is behind; 0 when it has replayed everything it received, or is not a standby.
+_POSTGRESQL_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+logger = logging.getLogger(__name__)
+
+_read_database: contextvars.ContextVar[str | None] = contextvars.ContextVar("surveys_read_database", default=None)
+_pinned: contextvars.ContextVar[bool] = contextvars.ContextVar("surveys_read_your_writes", default=False)
+
+
+def replica_configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+def replica_lag() -> float | None:
+    """Seconds the replica is behind the primary, or None when it cannot be reached."""
+    connection = connections[REPLICA]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(_POSTGRESQL_LAG_SQL)
+                return float(cursor.fetchone()[0])
+            cursor.execute("SELECT 1")
+            return 0.0
+    except DatabaseError:
+        logger.warning("Replica database is unavailable; reading from the primary.", exc_info=True)
+        return None
+
+
+class _ReplicaHealth:
+    """
+    The last lag check, shared by the threads of a process. One thread at a
+    time runs the check, outside the lock; the others keep using the previous
+    state meanwhile, rather than queueing behind a slow or unreachable replica.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.refreshing = False
+        self.state = "unavailable"
+
+    def current(self) -> str:
+        """``"replica"`` when reads may go to the replica, otherwise why not."""
+        interval = getattr(settings, "SURVEY_REPLICA_CHECK_INTERVAL", 5.0)
+        with self.lock:
+            fresh = self.checked_at is not None and time.monotonic() - self.checked_at < interval
+            if fresh or self.refreshing:
+                return self.state
+            self.refreshing = True
+        try:
+            lag = replica_lag()
+        except BaseException:
+            with self.lock:
+                self.refreshing = False
+            raise
+        if lag is None:
+            state = "unavailable"
+        elif lag > getattr(settings, "SURVEY_REPLICA_MAX_LAG", 30.0):
+            state = "lagging"
+        else:
+            state = "replica"
+        with self.lock:
+            if state == "lagging" and self.state != "lagging":
+                logger.warning("Replica is %.1fs behind; reading from the primary.", lag)
+            self.state, self.checked_at, self.refreshing = state, time.monotonic(), False
+        return state
+
+    def reset(self) -> None:
+        with self.lock:
+            self.checked_at = None
+
+
+_health = _ReplicaHealth()
+
+
+@receiver(setting_changed)
+def _reset_health(setting, **kwargs):
+    if setting in ("DATABASES", "SURVEY_REPLICA_MAX_LAG", "SURVEY_REPLICA_CHECK_INTERVAL"):
+        _health.reset()
+
+
+@contextmanager
+def replica_reads():
+    """
+    Read response data from the replica in the enclosed block, unless it is
+    unavailable, lagging or the request is pinned to the primary. Yields the
+    database alias reads go to.
+    """
+    if not replica_configured():
+        yield DEFAULT_DB_ALIAS
+        return
+    state = "pinned" if _pinned.get() else _health.current()
+    if metrics.enabled():
+        metrics.replica_reads.inc(route=state)
+    database = REPLICA if state == "replica" else None
+    token = _read_database.set(database)
+    try:
+        yield database or DEFAULT_DB_ALIAS
+    finally:
+        _read_database.reset(token)
+
+
+def in_context(iterable):
+    """Iterate ``iterable`` in a copy of the current context, e.g. the content of a streaming response."""
+    # Copied now, not on first iteration: by then the view has left replica_reads().
+    context = contextvars.copy_context()
+
+    def run():
+        iterator = iter(iterable)
+        try:
+            while True:
+                try:
+                    item = context.run(next, iterator)
+                except StopIteration:
+                    return
+                yield item
+        finally:
+            # An abandoned response must still end the transactions of the iterable, in its context.
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                context.run(close)
+
+    return run()
+
+
+class ReplicaRouter:
+    """Reads of response data inside ``replica_reads()`` go to the replica; all writes go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in REPLICA_MODELS:
+            return _read_database.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows.
+        return True
+
+
+class ReadYourWritesMiddleware:
+    """
+    After a successful admin POST, keep the browser on the primary for
+    ``SURVEY_READ_YOUR_WRITES_SECONDS`` with a signed cookie. Only the admin
+    sets it, so the survey flow never reads the user or the session.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.seconds = getattr(settings, "SURVEY_READ_YOUR_WRITES_SECONDS", 60)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _pinned.set(self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self.is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.pin(request, response)
+
+    def is_pinned(self, request) -> bool:
+        if PIN_COOKIE not in request.COOKIES:
+            return False
+        return request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=self.seconds) is not None
+
+    def pin(self, request, response):
+        match = request.resolver_match
+        if (
+            request.method not in _SAFE_METHODS
+            and match is not None
+            and "admin" in match.namespaces
+            and response.status_code < 400
+        ):
+            response.set_signed_cookie(
+                PIN_COOKIE, "1", salt=PIN_COOKIE, max_age=self.seconds,
+                secure=request.is_secure(), httponly=True, samesite="Lax",
+            )
+        return response
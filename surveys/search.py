@@ -0,0 +1,138 @@
+"""
+Ranked full-text search over answer texts.
+
+PostgreSQL uses a GIN expression index on ``to_tsvector(answer_text)``, which
+the database keeps current on every write. SQLite uses an FTS5
+external-content table kept in sync by triggers on ``surveys_surveyanswer``
+and mapped by the unmanaged ``AnswerSearchEntry`` model, so a search joins it
+once and reads the rank from the same row. Both are created by migration
+``0018_answer_text_search``; other backends fall back to a plain
+``icontains`` scan.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Lookup, Value
+from django.db.models.expressions import RawSQL
+
+from .models import AnswerSearchEntry, SurveyAnswer
+
+TS_CONFIG = "english"
+FTS_TABLE = "surveys_answer_fts"
+PG_INDEX = "surveys_answer_text_fts"
+
+ANSWER_TABLE = SurveyAnswer._meta.db_table
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ANSWER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, answer_text) VALUES (new.id, new.answer_text);
+        END""",
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ANSWER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, answer_text) VALUES ('delete', old.id, old.answer_text);
+        END""",
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF answer_text ON {ANSWER_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, answer_text) VALUES ('delete', old.id, old.answer_text);
+            INSERT INTO {FTS_TABLE}(rowid, answer_text) VALUES (new.id, new.answer_text);
+        END""",
+}
+
+
+def install(connection) -> None:
+    """Create the search index for ``connection`` and fill it from the existing answers."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {ANSWER_TABLE} "
+                f"USING GIN (to_tsvector('{TS_CONFIG}', answer_text))"
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"answer_text, content='{ANSWER_TABLE}', content_rowid='id', tokenize='porter unicode61')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(connection) -> None:
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+        elif connection.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def repair(connection) -> bool:
+    """
+    Restore missing SQLite triggers. Migrations that rebuild the answer table
+    on SQLite drop its triggers; returns True if the index had to be rebuilt.
+    """
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE name LIKE %s", [f"{FTS_TABLE}%"])
+        present = {name for kind, name in cursor.fetchall()}
+    if FTS_TABLE not in present or present.issuperset(SQLITE_TRIGGERS):
+        return False
+    install(connection)
+    return True
+
+
+class Match(Lookup):
+    """``answer_text__match``: an FTS5 query against the index's only column."""
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+AnswerSearchEntry._meta.get_field("answer_text").register_lookup(Match)
+
+
+def _fts5_query(text: str) -> str:
+    # Quote every term as an FTS5 string (doubling embedded quotes) so user
+    # input is never parsed as syntax; the tokenizer then splits "a@b.com"
+    # into a phrase. Terms without a single word character match nothing.
+    terms = [term for term in text.split() if re.search(r"\w", term)]
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def search_answers(text: str, queryset=None):
+    """
+    Filter ``queryset`` (default: all answers) to answers matching ``text``,
+    annotated with ``search_rank`` (higher is better) and ordered by it.
+    """
+    if queryset is None:
+        queryset = SurveyAnswer.objects.all()
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        vector = f"to_tsvector('{TS_CONFIG}', {ANSWER_TABLE}.answer_text)"
+        query = f"websearch_to_tsquery('{TS_CONFIG}', %s)"
+        queryset = queryset.filter(
+            RawSQL(f"{vector} @@ {query}", [text], output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(f"ts_rank({vector}, {query})", [text], output_field=FloatField()))
+    elif vendor == "sqlite":
+        match = _fts5_query(text)
+        if not match:
+            return queryset.none()
+        # Join the index so MATCH runs once. A rank subquery per row would
+        # rerun it for every candidate, and bm25 rescans the doclist each time.
+        queryset = queryset.filter(search_entry__answer_text__match=match).annotate(
+            # FTS5's rank is bm25, where lower is better.
+            search_rank=-F("search_entry__rank")
+        )
+    else:
+        queryset = queryset.filter(answer_text__icontains=text).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+    return queryset.order_by("-search_rank", "-pk")
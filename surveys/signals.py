@@ -0,0 +1,140 @@
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalog, search, timing
+from .documents import refresh_documents, upsert_documents
+from .models import Question, QuestionOption, ResponseDocument, SurveyAnswer, SurveyResponse
+from .tallies import apply_deltas, count_answers
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=QuestionOption)
+@receiver(post_delete, sender=QuestionOption)
+def invalidate_catalog(sender, **kwargs):
+    # Bump right away so this process never serves the old snapshot, and again
+    # on commit so no other worker caches a rebuild that read uncommitted state.
+    catalog.invalidate()
+    transaction.on_commit(catalog.invalidate, robust=True)
+
+
+@receiver(post_migrate)
+def invalidate_catalog_after_migrate(sender, **kwargs):
+    # Data migrations use historical models, which never reach the receivers above.
+    catalog.invalidate()
+
+
+@receiver(post_migrate)
+def repair_answer_search(sender, using="default", **kwargs):
+    # SQLite rebuilds a table to alter it, dropping the search triggers with it.
+    if sender.label == "surveys":
+        search.repair(connections[using])
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    timing.install(connection)
+
+
+@receiver(post_save, sender=SurveyResponse)
+def save_response_document(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # A new response has no answers yet; skip reading them back. The
+        # submission paths bulk-insert and write complete documents themselves.
+        upsert_documents([
+            ResponseDocument(
+                response=instance,
+                respondent_name=instance.respondent_name,
+                respondent_email=instance.respondent_email,
+                respondent_role=instance.respondent_role,
+                created_at=instance.created_at,
+            )
+        ])
+    else:
+        refresh_documents([instance.pk])
+
+
+@receiver(post_save, sender=SurveyAnswer)
+@receiver(post_delete, sender=SurveyAnswer)
+def refresh_response_document(sender, instance, raw=False, origin=None, **kwargs):
+    # Answers deleted by cascade from their response take the document with them.
+    if raw or isinstance(origin, SurveyResponse) or getattr(origin, "model", None) is SurveyResponse:
+        return
+    refresh_documents([instance.response_id])
+
+
+# Tallies for edits made through models; the submission paths count their own
+# bulk inserts. Previous values are read in pre_save so changes can be undone.
+
+
+def _answer_rows(response_id, role):
+    return [
+        (question_id, option_id, role)
+        for question_id, option_id in SurveyAnswer.objects.filter(response_id=response_id).values_list(
+            "question_id", "option_id"
+        )
+    ]
+
+
+@receiver(pre_save, sender=SurveyAnswer)
+def remember_previous_answer(sender, instance, raw=False, **kwargs):
+    instance._tally_previous = None
+    if not raw and instance.pk is not None:
+        instance._tally_previous = (
+            SurveyAnswer.objects.filter(pk=instance.pk).values_list("question_id", "option_id").first()
+        )
+
+
+@receiver(post_save, sender=SurveyAnswer)
+def tally_saved_answer(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    role = SurveyResponse.objects.values_list("respondent_role", flat=True).get(pk=instance.response_id)
+    deltas = count_answers([(instance.question_id, instance.option_id, role)])
+    if instance._tally_previous is not None:
+        deltas.subtract(count_answers([(*instance._tally_previous, role)]))
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=SurveyAnswer)
+def tally_deleted_answer(sender, instance, origin=None, **kwargs):
+    # Cascades from a response were already counted down in its pre_delete.
+    if isinstance(origin, SurveyResponse) or getattr(origin, "model", None) is SurveyResponse:
+        return
+    role = SurveyResponse.objects.values_list("respondent_role", flat=True).filter(pk=instance.response_id).first()
+    if role is not None:
+        deltas = Counter()
+        deltas.subtract(count_answers([(instance.question_id, instance.option_id, role)]))
+        apply_deltas(deltas)
+
+
+@receiver(pre_save, sender=SurveyResponse)
+def remember_previous_role(sender, instance, raw=False, **kwargs):
+    instance._tally_previous_role = None
+    if not raw and instance.pk is not None:
+        instance._tally_previous_role = (
+            SurveyResponse.objects.filter(pk=instance.pk).values_list("respondent_role", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=SurveyResponse)
+def retally_role_change(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, "_tally_previous_role", None)
+    if raw or previous is None or previous == instance.respondent_role:
+        return
+    deltas = count_answers(_answer_rows(instance.pk, instance.respondent_role))
+    deltas.subtract(count_answers(_answer_rows(instance.pk, previous)))
+    apply_deltas(deltas)
+
+
+@receiver(pre_delete, sender=SurveyResponse)
+def untally_deleted_response(sender, instance, **kwargs):
+    deltas = Counter()
+    deltas.subtract(count_answers(_answer_rows(instance.pk, instance.respondent_role)))
+    apply_deltas(deltas)
@@ -0,0 +1,203 @@
+"""
+Local write-behind spool for survey submissions.
+
+When ``SURVEY_SPOOL_PATH`` is set, the survey views append validated
+submissions to an SQLite journal on local disk (WAL, ``synchronous=FULL``)
+and answer immediately, so a slow or unreachable remote database never
+reaches the respondent. ``manage.py flush_spool`` drains the journal into the
+database in batched transactions. Submissions are keyed by
+``submission_id``: the journal ignores repeats, and rows already present in
+the database are skipped, so a flush that dies between the database commit
+and the journal delete is simply replayed without duplicating anything.
+
+A batch that fails is retried one submission at a time. A submission that
+fails on its own (a question deleted since it was spooled, a payload that no
+longer loads) is moved to the journal's ``dead_letter`` table with its error,
+so it cannot hold up the submissions behind it. Errors that mean the database
+itself is unreachable leave everything spooled for the next flush.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
+
+from .submissions import Submission, save_submissions
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    seq INTEGER PRIMARY KEY,
+    submission_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    error TEXT NOT NULL
+);
+"""
+
+# The database is down or the connection broke: retry later, not per submission.
+UNAVAILABLE = (OperationalError, InterfaceError)
+
+# Stay well below SQLite's bound-parameter limit when acknowledging rows.
+ACK_CHUNK_SIZE = 500
+
+
+@dataclass
+class SpoolStats:
+    pending: int
+    oldest_enqueued_at: float | None
+    dead: int = 0
+
+    @property
+    def lag_seconds(self) -> float:
+        if self.oldest_enqueued_at is None:
+            return 0.0
+        return max(0.0, time.time() - self.oldest_enqueued_at)
+
+
+@dataclass
+class FlushResult:
+    batches: int = 0
+    drained: int = 0
+    written: int = 0
+    dead: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.drained - self.written
+
+
+class SubmissionSpool:
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def append(self, submission: Submission) -> bool:
+        """Durably enqueue ``submission``; returns False if it was already spooled."""
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO spool (submission_id, payload, enqueued_at) VALUES (?, ?, ?)",
+            (str(submission.submission_id), json.dumps(submission.to_dict()), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def _rows(self, limit: int) -> list[tuple[int, str]]:
+        return self._connection().execute(
+            "SELECT seq, payload FROM spool ORDER BY seq LIMIT ?", (limit,)
+        ).fetchall()
+
+    def peek(self, limit: int) -> list[tuple[int, Submission]]:
+        return [(seq, _load(payload)) for seq, payload in self._rows(limit)]
+
+    def ack(self, seqs: list[int]) -> None:
+        connection = self._connection()
+        for start in range(0, len(seqs), ACK_CHUNK_SIZE):
+            chunk = seqs[start:start + ACK_CHUNK_SIZE]
+            connection.execute(
+                f"DELETE FROM spool WHERE seq IN ({','.join('?' * len(chunk))})", chunk
+            )
+
+    def bury(self, seq: int, error: Exception) -> None:
+        """Move spool row ``seq`` to ``dead_letter``, recording ``error``."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO dead_letter (seq, submission_id, payload, enqueued_at, failed_at, error) "
+                "SELECT seq, submission_id, payload, enqueued_at, ?, ? FROM spool WHERE seq = ?",
+                (time.time(), f"{type(error).__name__}: {error}", seq),
+            )
+            connection.execute("DELETE FROM spool WHERE seq = ?", (seq,))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def dead_letters(self) -> list[tuple[str, str]]:
+        """``(submission_id, error)`` of every dead-lettered submission, oldest first."""
+        return self._connection().execute("SELECT submission_id, error FROM dead_letter ORDER BY seq").fetchall()
+
+    def stats(self) -> SpoolStats:
+        connection = self._connection()
+        pending, oldest = connection.execute("SELECT COUNT(*), MIN(enqueued_at) FROM spool").fetchone()
+        (dead,) = connection.execute("SELECT COUNT(*) FROM dead_letter").fetchone()
+        return SpoolStats(pending=pending, oldest_enqueued_at=oldest, dead=dead)
+
+    def flush(self, batch_size: int = 500, max_batches: int | None = None) -> FlushResult:
+        """Move spooled submissions into the database, one transaction per batch."""
+        result = FlushResult()
+        while max_batches is None or result.batches < max_batches:
+            rows = self._rows(batch_size)
+            if not rows:
+                break
+            try:
+                written = save_submissions([_load(payload) for _, payload in rows])
+            except UNAVAILABLE:
+                raise
+            except Exception:
+                logger.warning("A spool batch failed; saving its submissions one at a time.", exc_info=True)
+                written, rows = self._flush_singly(rows, result)
+            result.written += written
+            # Acknowledge only after the database transaction committed.
+            self.ack([seq for seq, _ in rows])
+            result.batches += 1
+            result.drained += len(rows)
+        return result
+
+    def _flush_singly(self, rows, result: FlushResult) -> tuple[int, list[tuple[int, str]]]:
+        written, saved = 0, []
+        for seq, payload in rows:
+            try:
+                written += save_submissions([_load(payload)])
+            except UNAVAILABLE:
+                raise
+            except Exception as exc:
+                logger.error("Moving spooled submission %s to the dead letters: %r", seq, exc)
+                self.bury(seq, exc)
+                result.dead += 1
+            else:
+                saved.append((seq, payload))
+        return written, saved
+
+
+def _load(payload: str) -> Submission:
+    return Submission.from_dict(json.loads(payload))
+
+
+_spools: dict[str, SubmissionSpool] = {}
+_spools_lock = threading.Lock()
+
+
+def get_spool() -> SubmissionSpool | None:
+    """Return the configured spool, or None when submissions are saved inline."""
+    path = getattr(settings, "SURVEY_SPOOL_PATH", "")
+    if not path:
+        return None
+    path = str(path)
+    spool = _spools.get(path)
+    if spool is None:
+        with _spools_lock:
+            spool = _spools.setdefault(path, SubmissionSpool(path))
+    return spool
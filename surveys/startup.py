@@ -0,0 +1,194 @@
+"""
+Cold start of the public survey, and the ``manage.py bench_startup`` probe.
+
+With ``SURVEY_APP_PROFILE=public`` the admin is installed through
+``SimpleAdminConfig``, so ``django.setup()`` no longer imports every
+``admin.py`` and with them ``import_export``, tablib and its format
+backends, the analytics and the export writers. ``admin_urls`` mounts the
+admin under a ``LazyURLResolver``: its patterns, and the admin modules, are
+loaded by the first request under ``/admin/``. Reversing other namespaces
+never touches them, so a worker that only serves the survey never loads them.
+
+``python -X importtime -m surveys.startup PATH HOST`` sets up the project,
+builds the WSGI application, serves one GET of ``PATH`` and prints when each
+step finished as one JSON line. The command runs it in a fresh interpreter
+per measurement and reads the import times from its stderr.
+"""
+
+import json
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+
+from django.urls.resolvers import RoutePattern, URLResolver
+from django.utils.functional import cached_property
+
+PROFILES = ("full", "public")
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)\s*$")
+
+
+class LazyURLResolver(URLResolver):
+    """
+    A namespaced ``include()`` whose patterns are built by ``loader`` the first
+    time a request resolves under it or a name in its namespace is reversed.
+    """
+
+    def __init__(self, pattern, loader, app_name, namespace=None):
+        super().__init__(pattern, None, app_name=app_name, namespace=namespace)
+        self.loader = loader
+
+    @cached_property
+    def urlconf_module(self):
+        return self.loader()
+
+    def _populate(self):
+        # The root resolver populates every include when it first reverses any
+        # name; a namespaced one only needs its own patterns for its own names.
+        if "urlconf_module" in self.__dict__:
+            super()._populate()
+
+    def _reverse_with_prefix(self, lookup_view, _prefix, *args, **kwargs):
+        self.url_patterns
+        return super()._reverse_with_prefix(lookup_view, _prefix, *args, **kwargs)
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} {self.loader.__qualname__} "
+            f"({self.app_name}:{self.namespace}) {self.pattern.describe()}>"
+        )
+
+
+def _admin_patterns():
+    from django.contrib import admin
+
+    # A no-op when the full admin app already discovered them at startup.
+    admin.autodiscover()
+    return admin.site.get_urls()
+
+
+def admin_urls(route: str = "admin/") -> LazyURLResolver:
+    """The default admin site under ``route``, loaded on its first request."""
+    return LazyURLResolver(RoutePattern(route, is_endpoint=False), _admin_patterns, "admin", "admin")
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(text: str) -> list[ImportRecord]:
+    """The ``-X importtime`` lines of ``text`` (a process's stderr); other lines are ignored."""
+    records = []
+    for line in text.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def summarize_imports(records: list[ImportRecord], top: int = 10) -> dict:
+    """Import time, the slowest top-level imports and the import time of each top-level package."""
+    packages: dict[str, int] = {}
+    for record in records:
+        package = record.module.partition(".")[0]
+        packages[package] = packages.get(package, 0) + record.self_us
+    roots = sorted((record for record in records if record.depth == 0), key=lambda r: -r.cumulative_us)
+    return {
+        "import_ms": sum(record.self_us for record in records) / 1e3,
+        "slowest": {record.module: record.cumulative_us / 1e3 for record in roots[:top]},
+        "packages": {
+            name: us / 1e3 for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        },
+    }
+
+
+def summarize_runs(runs: list[dict]) -> dict:
+    """Median of each timing over several cold starts."""
+    return {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("setup_ms", "application_ms", "first_response_ms")
+        if key in runs[0]
+    }
+
+
+def forbidden_imports(modules: list[str], prefixes: list[str]) -> dict[str, int]:
+    """For each of ``prefixes`` that was imported, the number of its modules in ``modules``."""
+    found = {}
+    for prefix in prefixes:
+        count = sum(1 for module in modules if module == prefix or module.startswith(prefix + "."))
+        if count:
+            found[prefix] = count
+    return found
+
+
+def compare(report: dict, baseline: dict) -> list[tuple[str, float, float, float]]:
+    """``(metric, baseline, current, change %)`` rows; positive change is always worse."""
+    rows = []
+    for profile, current in report["profiles"].items():
+        old = baseline.get("profiles", {}).get(profile)
+        if old is None:
+            continue
+        for metric in ("first_response_ms", "setup_ms", "import_ms", "modules"):
+            if old.get(metric) is None or current.get(metric) is None:
+                continue
+            change = ((current[metric] - old[metric]) / old[metric] * 100.0) if old[metric] else 0.0
+            rows.append((f"{profile} {metric}", old[metric], current[metric], change))
+    return rows
+
+
+def _first_response(path: str, host: str) -> None:
+    """Print when setup, the WSGI application and one GET of ``path`` (if given) were done."""
+    import os
+    from io import BytesIO
+
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "survey_site.settings")
+    django.setup()
+    marks = {"setup": time.time()}
+
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    marks["application"] = time.time()
+    # -X importtime does not report modules loaded through importlib (models, admin modules), so list them all.
+    modules = set(sys.modules)
+
+    if path:
+        statuses = []
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": host,
+            "SERVER_PORT": "443",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": host,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "https",
+            "wsgi.version": (1, 0),
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        for _ in body:
+            pass
+        body.close()
+        marks["response"] = time.time()
+        marks["status"] = int(statuses[0].split()[0])
+    marks["modules"] = sorted(modules | set(sys.modules))
+    print(json.dumps(marks))
+
+
+if __name__ == "__main__":
+    _first_response(*sys.argv[1:3])
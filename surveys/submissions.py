@@ -0,0 +1,190 @@
+"""
+Validated survey submissions and the code that writes them to the database.
+
+A ``Submission`` is a plain, JSON-serializable record built from a valid
+``SurveyForm``. The survey views save it inline, or append it to the local
+spool (``surveys.spool``) whose flusher saves many of them at once.
+"""
+
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .catalog import BUILDER_ROLE_VALUES, Catalog
+from .documents import document_answers
+from .forms import SurveyForm
+from .models import ResponseDocument, SurveyAnswer, SurveyResponse
+from .tallies import apply_deltas, count_answers
+from .timing import phase
+
+
+class AnswerData(NamedTuple):
+    question_id: int
+    # Display text: the option label for choice answers.
+    text: str
+    option_id: int | None = None
+
+
+@dataclass
+class Submission:
+    submission_id: uuid.UUID
+    respondent_name: str
+    respondent_email: str
+    respondent_role: str
+    answers: list[AnswerData]
+    created_at: datetime = field(default_factory=timezone.now)
+
+    @classmethod
+    def from_form(cls, catalog: Catalog, cleaned_data: dict, submission_id: uuid.UUID | None = None) -> "Submission":
+        # Determine respondent_role based on Q1 answer
+        q1_answer = cleaned_data.get("question_1", "")
+        if q1_answer in BUILDER_ROLE_VALUES:
+            respondent_role = SurveyResponse.RespondentRole.BUILDERS
+        else:
+            respondent_role = cleaned_data.get("respondent_role", SurveyResponse.RespondentRole.GENERAL)
+
+        answers = []
+        for question in catalog:
+            answer_value = cleaned_data.get(SurveyForm.answer_field_name(question), "")
+            if answer_value:
+                option = question.option_for_value(answer_value)
+                answers.append(
+                    AnswerData(question.id, question.label_for(answer_value), option.id if option else None)
+                )
+
+        return cls(
+            submission_id=submission_id or cleaned_data.get("submission_id") or uuid.uuid4(),
+            respondent_name=cleaned_data.get("respondent_name", "").strip(),
+            respondent_email=cleaned_data.get("respondent_email", "").strip(),
+            respondent_role=str(respondent_role),
+            answers=answers,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "submission_id": str(self.submission_id),
+            "respondent_name": self.respondent_name,
+            "respondent_email": self.respondent_email,
+            "respondent_role": self.respondent_role,
+            "answers": [list(answer) for answer in self.answers],
+            "created_at": self.created_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Submission":
+        return cls(
+            submission_id=uuid.UUID(data["submission_id"]),
+            respondent_name=data["respondent_name"],
+            respondent_email=data["respondent_email"],
+            respondent_role=data["respondent_role"],
+            answers=[AnswerData(*answer) for answer in data["answers"]],
+            created_at=parse_datetime(data["created_at"]),
+        )
+
+    def build_response(self) -> SurveyResponse:
+        return SurveyResponse(
+            submission_id=self.submission_id,
+            respondent_name=self.respondent_name,
+            respondent_email=self.respondent_email,
+            respondent_role=self.respondent_role,
+            created_at=self.created_at,
+        )
+
+    def build_answers(self, response: SurveyResponse) -> list[SurveyAnswer]:
+        return [
+            SurveyAnswer(
+                response=response,
+                question_id=answer.question_id,
+                option_id=answer.option_id,
+                answer_text="" if answer.option_id else answer.text,
+                created_at=self.created_at,
+            )
+            for answer in self.answers
+        ]
+
+    def tally_rows(self) -> list[tuple[int, int | None, str]]:
+        return [(answer.question_id, answer.option_id, self.respondent_role) for answer in self.answers]
+
+    def build_document(self, response: SurveyResponse) -> ResponseDocument:
+        return ResponseDocument(
+            response=response,
+            respondent_name=self.respondent_name,
+            respondent_email=self.respondent_email,
+            respondent_role=self.respondent_role,
+            created_at=self.created_at,
+            answers=document_answers({answer.question_id: answer.option_id or answer.text for answer in self.answers}),
+        )
+
+
+def save_submission(submission: Submission) -> tuple[SurveyResponse, bool]:
+    """
+    Save ``submission`` unless its ``submission_id`` is already stored.
+
+    Returns ``(response, created)``. The duplicate check is a unique-index
+    lookup in the same transaction as the inserts; a concurrent request that
+    wins the race surfaces as an IntegrityError and is treated as a duplicate.
+    """
+    try:
+        with transaction.atomic():
+            existing = SurveyResponse.objects.filter(submission_id=submission.submission_id).first()
+            if existing is not None:
+                return existing, False
+            # bulk_create sends no post_save, so the document is written once,
+            # complete, instead of empty first and then overwritten.
+            with phase("insert"):
+                [response] = SurveyResponse.objects.bulk_create([submission.build_response()])
+            answers = submission.build_answers(response)
+            if answers:
+                with phase("answers"):
+                    SurveyAnswer.objects.bulk_create(answers)
+            with phase("document"):
+                ResponseDocument.objects.bulk_create([submission.build_document(response)])
+            with phase("tallies"):
+                apply_deltas(count_answers(submission.tally_rows()))
+            return response, True
+    except IntegrityError:
+        existing = SurveyResponse.objects.filter(submission_id=submission.submission_id).first()
+        if existing is None:
+            raise
+        return existing, False
+
+
+# Transactions are sync-only in Django, so the async views save through a
+# single thread hop instead of separate acreate/abulk_create calls.
+asave_submission = sync_to_async(save_submission)
+
+
+def save_submissions(submissions: Iterable[Submission], batch_size: int = 1000) -> int:
+    """
+    Save many submissions in one transaction, skipping any whose
+    ``submission_id`` is already stored. Returns the number written.
+    """
+    pending = {submission.submission_id: submission for submission in submissions}
+    if not pending:
+        return 0
+    with transaction.atomic():
+        existing = set(
+            SurveyResponse.objects.filter(submission_id__in=list(pending)).values_list(
+                "submission_id", flat=True
+            )
+        )
+        new = [submission for key, submission in pending.items() if key not in existing]
+        responses = SurveyResponse.objects.bulk_create(
+            [submission.build_response() for submission in new], batch_size=batch_size
+        )
+        answers = []
+        for submission, response in zip(new, responses):
+            answers.extend(submission.build_answers(response))
+        SurveyAnswer.objects.bulk_create(answers, batch_size=batch_size)
+        ResponseDocument.objects.bulk_create(
+            [submission.build_document(response) for submission, response in zip(new, responses)],
+            batch_size=batch_size,
+        )
+        apply_deltas(count_answers(row for submission in new for row in submission.tally_rows()))
+    return len(new)
@@ -0,0 +1,117 @@
+"""
+Per-option answer counts, maintained as answers are written.
+
+``OptionTally`` keeps one counter per (question, option, respondent role),
+split over ``SURVEY_TALLY_SHARDS`` rows. A writer adds its deltas to one
+randomly chosen shard with a single ``INSERT ... ON CONFLICT DO UPDATE``
+statement inside its own transaction, so concurrent submissions seldom wait
+on the same row and a rolled-back submission never counts. Readers sum the
+shards, which costs the same however many answers exist.
+``manage.py reconcile_tallies`` recomputes everything from ``SurveyAnswer``.
+Choice answers saved before answers referenced their option hold only the
+label text and are not counted until ``manage.py backfill_answer_options``
+links them; ``unlinked_choice_answers`` finds them.
+"""
+
+import random
+from collections import Counter
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+
+from .models import OptionTally, QuestionOption, SurveyAnswer
+
+# (question id, option id, respondent role)
+TallyKey = tuple[int, int, str]
+
+
+def shard_count() -> int:
+    return max(1, int(getattr(settings, "SURVEY_TALLY_SHARDS", 8)))
+
+
+def count_answers(answers: Iterable[tuple[int, int | None, str]]) -> Counter:
+    """Count ``(question_id, option_id, respondent_role)`` rows per tally key; free text is skipped."""
+    counts: Counter = Counter()
+    for question_id, option_id, role in answers:
+        if option_id is not None:
+            counts[question_id, option_id, role] += 1
+    return counts
+
+
+def apply_deltas(deltas: Counter, using: str = "default") -> None:
+    """Add ``deltas`` (tally key -> change) to one shard of each key."""
+    rows = sorted((key, delta) for key, delta in deltas.items() if delta)
+    if not rows:
+        return
+    table = OptionTally._meta.db_table
+    shard = random.randrange(shard_count())
+    # Rows are sorted so concurrent writers lock shared keys in the same order.
+    sql = (
+        f"INSERT INTO {table} (question_id, option_id, respondent_role, shard, count) "
+        f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))} "
+        f"ON CONFLICT (option_id, respondent_role, shard) "
+        f"DO UPDATE SET count = {table}.count + excluded.count"
+    )
+    params = []
+    for (question_id, option_id, role), delta in rows:
+        params.extend([question_id, option_id, role, shard, delta])
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def option_totals(question_ids: Iterable[int] | None = None) -> dict[int, dict[str, int]]:
+    """Map option id -> {respondent role: count}, summed over shards."""
+    tallies = OptionTally.objects.all()
+    if question_ids is not None:
+        tallies = tallies.filter(question_id__in=list(question_ids))
+    totals: dict[int, dict[str, int]] = {}
+    for option_id, role, count in (
+        tallies.order_by().values("option_id", "respondent_role").annotate(total=Sum("count"))
+        .values_list("option_id", "respondent_role", "total")
+    ):
+        totals.setdefault(option_id, {})[role] = count
+    return totals
+
+
+def unlinked_choice_answers(question_ids: Iterable[int] | None = None) -> int:
+    """Answers whose text names an option of their question but that do not reference it (not yet backfilled)."""
+    options = QuestionOption.objects.filter(question_id=OuterRef("question_id")).filter(
+        Q(label=OuterRef("answer_text")) | Q(value=OuterRef("answer_text"))
+    )
+    answers = SurveyAnswer.objects.filter(option__isnull=True).exclude(answer_text="").filter(Exists(options))
+    if question_ids is not None:
+        answers = answers.filter(question_id__in=list(question_ids))
+    return answers.count()
+
+
+def reconcile() -> tuple[int, int]:
+    """
+    Recompute all tallies from ``SurveyAnswer`` with a ``GROUP BY`` on the
+    option foreign key.
+    Returns ``(keys, answers counted)``.
+    """
+    with transaction.atomic():
+        connection = connections["default"]
+        if connection.vendor == "postgresql":
+            # Writers increment inside their own transactions; holding them off
+            # until this one commits keeps their deltas from being counted twice.
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {OptionTally._meta.db_table} IN EXCLUSIVE MODE")
+        counts = list(
+            SurveyAnswer.objects.filter(option__isnull=False)
+            .order_by()
+            .values("question_id", "option_id", "response__respondent_role")
+            .annotate(total=Count("id"))
+            .values_list("question_id", "option_id", "response__respondent_role", "total")
+        )
+        OptionTally.objects.all().delete()
+        OptionTally.objects.bulk_create(
+            [
+                OptionTally(question_id=question_id, option_id=option_id, respondent_role=role, count=total)
+                for question_id, option_id, role, total in counts
+            ],
+            batch_size=1000,
+        )
+    return len(counts), sum(row[-1] for row in counts)
@@ -0,0 +1,106 @@
+"""
+Template tags for the assets built by ``surveys.assets.SurveyStaticFilesStorage``.
+
+Each tag falls back to plain markup when its build output is missing, as in
+development without ``collectstatic``. Lookups are cached per process; a
+deploy runs ``collectstatic`` and restarts the workers.
+"""
+
+from functools import lru_cache
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from ..assets import IMAGE_VARIANTS, critical_name, variant_name
+
+register = template.Library()
+
+
+def _collected(name: str) -> bool:
+    stored_name = getattr(staticfiles_storage, "stored_name", None)
+    if stored_name is None:
+        return staticfiles_storage.exists(name)
+    try:
+        stored_name(name)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def _critical_css(name: str) -> str:
+    path = critical_name(name)
+    if not staticfiles_storage.exists(path):
+        return ""
+    with staticfiles_storage.open(path) as file:
+        return file.read().decode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _image_variants(name: str) -> tuple[tuple[str, str], ...]:
+    """``(url, media type)`` of each built variant of ``name``, best first."""
+    return tuple(
+        (static(variant_name(name, extension)), media_type)
+        for extension, media_type, _ in IMAGE_VARIANTS
+        if _collected(variant_name(name, extension))
+    )
+
+
+@receiver(setting_changed)
+def _clear_caches(setting, **kwargs):
+    if setting in ("STORAGES", "STATIC_ROOT", "STATIC_URL"):
+        _critical_css.cache_clear()
+        _image_variants.cache_clear()
+
+
+@register.simple_tag
+def stylesheet(name):
+    """
+    Inline the stylesheet's critical CSS and load the rest without blocking
+    rendering; a plain ``<link>`` when no critical CSS was built.
+    """
+    url = static(name)
+    css = _critical_css(name)
+    if not css:
+        return format_html('<link rel="stylesheet" href="{}">', url)
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        # Already CSS, not HTML: only a closing tag could break out of the element.
+        mark_safe(css.replace("</", "<\\/")),
+        url,
+        url,
+    )
+
+
+@register.simple_tag
+def preload_image(name):
+    """Preload hint for the best variant of an image shown above the fold."""
+    variants = _image_variants(name)
+    if not variants:
+        return format_html('<link rel="preload" href="{}" as="image">', static(name))
+    url, media_type = variants[0]
+    # Browsers that can't decode the type skip the hint and fetch through <picture> as usual.
+    return format_html('<link rel="preload" href="{}" as="image" type="{}">', url, media_type)
+
+
+@register.simple_tag
+def picture(name, alt, **attrs):
+    """``<picture>`` offering the AVIF/WebP variants of ``name``, with the original as the ``<img>``."""
+    img = format_html(
+        '<img src="{}" alt="{}"{}>',
+        static(name),
+        alt,
+        format_html_join("", ' {}="{}"', sorted(attrs.items())),
+    )
+    variants = _image_variants(name)
+    if not variants:
+        return img
+    sources = format_html_join("", '<source srcset="{}" type="{}">', variants)
+    return format_html("<picture>{}{}</picture>", sources, img)
@@ -1,7 +1,77 @@
-from django.test import TestCase
-from django.urls import reverse
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
 
-from .models import Question, QuestionOption, SurveyAnswer, SurveyResponse
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.urls.resolvers import RoutePattern
+from django.utils import timezone
+
+from . import catalog, metrics, views
+from .analytics import chi2_sf, crosstab
+from .checks import check_shared_catalog_cache
+from .columnar import _Dictionary, write_answers, write_responses
+from .exports import iter_detailed_csv, iter_detailed_rows, iterate_in_thread, read_snapshot
+from .resources import SurveyAnswerBulkResource, SurveyAnswerResource
+from .loadtest import LoadTest, compare, discard_submissions, form_fields, local_server, percentile
+from .search import search_answers
+from .spool import get_spool
+from .submissions import AnswerData, Submission, save_submission, save_submissions
+from .forms import SurveyForm, get_survey_form_class
+from .archive import archivable, archive_responses
+from .assets import TemplateVocabulary, critical_css, minify_css
+from .routers import PIN_COOKIE, REPLICA, REPLICA_MODELS, ReplicaRouter, _health, in_context, replica_reads
+from .startup import LazyURLResolver, parse_importtime, summarize_imports
+from .models import (
+    ArchivedResponse,
+    OptionTally,
+    Question,
+    QuestionOption,
+    ResponseDocument,
+    SurveyAnswer,
+    SurveyResponse,
+)
+from .tallies import option_totals, reconcile
+
+
+def setUpModule():
+    # Keep the suite's file cache and metrics samples out of the checkout.
+    directory = tempfile.TemporaryDirectory()
+    overrides = override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": str(Path(directory.name) / "cache"),
+            }
+        },
+        SURVEY_METRICS_DIR=str(Path(directory.name) / "metrics"),
+    )
+    overrides.enable()
+    unittest.addModuleCleanup(directory.cleanup)
+    unittest.addModuleCleanup(overrides.disable)
+
+
+def redirect_path(response) -> str:
+    """Where a redirect points, without its query (the thank-you confirmation token)."""
+    return urlsplit(response["Location"]).path
 
 
 class SurveyViewTests(TestCase):
@@ -46,7 +116,7 @@ class SurveyViewTests(TestCase):
             "question_2": "",
         }
         response = self.client.post(reverse("surveys:form"), data=payload)
-        self.assertRedirects(response, reverse("surveys:thank_you"))
+        self.assertEqual(redirect_path(response), reverse("surveys:thank_you"))
         self.assertEqual(SurveyResponse.objects.count(), 1)
         self.assertEqual(SurveyAnswer.objects.count(), 1)
 
@@ -61,3 +131,1689 @@ class SurveyViewTests(TestCase):
         response = self.client.post(reverse("surveys:form"), data=payload)
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "This question is required for builders.")
+        self.assertContains(response, views.INVALID_FORM_MESSAGE)
+
+    def test_submission_flow_keeps_no_session_state(self):
+        # A visitor who also has an admin session: the survey still never touches it.
+        self.client.force_login(get_user_model().objects.create_user("analyst"))
+        payload = {"respondent_role": SurveyResponse.RespondentRole.GENERAL, "question_1": "password_manager"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("surveys:form"), data=payload)
+            thanks = self.client.get(response["Location"])
+        self.assertEqual([q["sql"] for q in queries if "django_session" in q["sql"]], [])
+        self.assertEqual(set(response.cookies) | set(thanks.cookies), set())
+        self.assertContains(thanks, "Your responses were saved successfully.")
+
+    def test_confirmation_token_must_be_valid_and_recent(self):
+        payload = {"respondent_role": SurveyResponse.RespondentRole.GENERAL, "question_1": "password_manager"}
+        location = self.client.post(reverse("surveys:form"), data=payload)["Location"]
+        self.assertNotContains(self.client.get(location + "x"), "saved successfully")
+        self.assertNotContains(self.client.get(reverse("surveys:thank_you")), "saved successfully")
+        with self.settings(SURVEY_CONFIRMATION_MAX_AGE=-1):
+            self.assertNotContains(self.client.get(location), "saved successfully")
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        self.question = Question.objects.create(
+            id=1,
+            category="Behavior",
+            prompt="How do you manage passwords?",
+        )
+        QuestionOption.objects.create(
+            question=self.question,
+            value="password_manager",
+            label="Password manager",
+            order=1,
+        )
+
+    def test_snapshot_holds_questions_and_labels(self):
+        snapshot = catalog.get_catalog()
+        self.assertEqual([q.id for q in snapshot], [1])
+        self.assertEqual(snapshot.by_id[1].label_for("password_manager"), "Password manager")
+        self.assertEqual(snapshot.by_id[1].label_for("free text"), "free text")
+
+    def test_steady_state_makes_no_queries(self):
+        catalog.get_catalog()
+        with self.assertNumQueries(0):
+            catalog.get_catalog()
+        with self.assertNumQueries(0):
+            self.client.get(reverse("surveys:form"))
+
+    def test_saving_an_option_invalidates_snapshot(self):
+        before = catalog.get_catalog()
+        QuestionOption.objects.create(
+            question=self.question,
+            value="reuse",
+            label="I reuse passwords",
+            order=2,
+        )
+        after = catalog.get_catalog()
+        self.assertNotEqual(before.version, after.version)
+        self.assertEqual(len(after.by_id[1].options), 2)
+
+    @override_settings(SURVEY_CATALOG_CHECK_INTERVAL=0)
+    def test_other_workers_pick_up_version_bump(self):
+        before = catalog.get_catalog()
+        # Another process edited the catalog: this one only sees the shared version move.
+        Question.objects.filter(pk=1).update(prompt="Updated prompt")
+        cache.set(catalog.VERSION_CACHE_KEY, "edited-elsewhere", timeout=None)
+        after = catalog.get_catalog()
+        self.assertEqual(after.version, "edited-elsewhere")
+        self.assertEqual(after.by_id[1].prompt, "Updated prompt")
+        self.assertNotEqual(after.digest, before.digest)
+
+    def test_deploy_check_warns_about_a_host_local_catalog_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_catalog_cache(None)], ["surveys.W001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "survey_cache"}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_shared_catalog_cache(None), [])
+            cache.set("shared", 1)
+            self.assertEqual(cache.get("shared"), 1)
+
+
+@override_settings(SURVEY_EDGE_CACHE=True)
+class EdgeCachedFormTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        question = Question.objects.create(
+            id=1,
+            category="Behavior",
+            prompt="How do you manage passwords?",
+        )
+        QuestionOption.objects.create(
+            question=question,
+            value="password_manager",
+            label="Password manager",
+            order=1,
+        )
+
+    def test_page_is_shared_and_carries_no_csrf_token(self):
+        response = self.client.get(reverse("surveys:form"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "How do you manage passwords?")
+        self.assertContains(response, 'name="csrfmiddlewaretoken" value=""')
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("s-maxage=300", response["Cache-Control"])
+        self.assertIn("survey-form", response["Surrogate-Key"])
+        self.assertNotIn("csrftoken", response.cookies)
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+
+    def test_conditional_request_returns_not_modified(self):
+        etag = self.client.get(reverse("surveys:form"))["ETag"]
+        response = self.client.get(reverse("surveys:form"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_catalog_edit_changes_etag(self):
+        etag = self.client.get(reverse("surveys:form"))["ETag"]
+        Question.objects.get(pk=1).options.update(label="A password manager")
+        Question.objects.get(pk=1).save()
+        response = self.client.get(reverse("surveys:form"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "A password manager")
+
+    def test_csrf_endpoint_supplies_token_for_post(self):
+        client = Client(enforce_csrf_checks=True)
+        token_response = client.get(reverse("surveys:csrf"))
+        self.assertIn("no-cache", token_response["Cache-Control"])
+        payload = {
+            "csrfmiddlewaretoken": token_response.json()["token"],
+            "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+            "question_1": "password_manager",
+        }
+        response = client.post(reverse("surveys:form"), data=payload)
+        self.assertEqual(redirect_path(response), reverse("surveys:thank_you"))
+
+
+class SurveyFormCompilationTests(TestCase):
+    def setUp(self):
+        self.catalog = catalog.Catalog.build(
+            [
+                (1, "About You", "Which of these best describes you?", "all", ""),
+                (5, "The Core Problem", "How big of a problem are bots?", "builders", "For builders only"),
+            ],
+            [(10, 1, "developer", "Software Developer / Engineer", 1)],
+            version="compiled-test",
+        )
+
+    def test_form_class_is_compiled_once_per_version(self):
+        form_class = get_survey_form_class(self.catalog)
+        self.assertIs(get_survey_form_class(self.catalog), form_class)
+        self.assertTrue(issubclass(form_class, SurveyForm))
+        self.assertEqual(
+            list(form_class.base_fields),
+            [
+                "respondent_name",
+                "respondent_email",
+                "respondent_role",
+                "submission_id",
+                "question_1",
+                "question_5",
+            ],
+        )
+        self.assertEqual(
+            form_class.base_fields["question_5"].help_text,
+            "The Core Problem • Builders only • For builders only",
+        )
+
+    def test_instances_share_compiled_fields(self):
+        form_class = get_survey_form_class(self.catalog)
+        first, second = form_class(), form_class()
+        self.assertIsNot(first.fields, second.fields)
+        self.assertIs(first.fields["question_1"], second.fields["question_1"])
+
+    def test_clean_requires_builder_questions_and_strips_text(self):
+        form_class = get_survey_form_class(self.catalog)
+        form = form_class({"respondent_role": "all", "question_1": "developer"})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["question_5"], ["This question is required for builders."])
+
+        form = form_class({"respondent_role": "all", "question_5": "  Lots of bots  "})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["question_5"], "Lots of bots")
+
+
+class AsyncSurveyURLConf:
+    urlpatterns = [
+        path(
+            "",
+            include(
+                (
+                    [
+                        path("", views.survey_form_async, name="form"),
+                        path("thanks/", views.thank_you_async, name="thank_you"),
+                    ],
+                    "surveys",
+                ),
+                namespace="surveys",
+            ),
+        ),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncSurveyURLConf)
+class AsyncSurveyViewTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(
+            id=1,
+            category="Behavior",
+            prompt="How do you manage passwords?",
+        )
+        Question.objects.create(
+            id=2,
+            category="Builders",
+            prompt="Builders only question",
+            target_audience=Question.TargetAudience.BUILDERS,
+        )
+        QuestionOption.objects.create(
+            question=q1,
+            value="password_manager",
+            label="Password manager",
+            order=1,
+        )
+
+    async def test_get_form_renders_questions(self):
+        response = await self.async_client.get(reverse("surveys:form"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "How do you manage passwords?")
+
+    async def test_post_creates_response_and_answers(self):
+        payload = {
+            "respondent_name": "Alex",
+            "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+            "question_1": "password_manager",
+        }
+        response = await self.async_client.post(reverse("surveys:form"), data=payload)
+        self.assertEqual(redirect_path(response), reverse("surveys:thank_you"))
+        self.assertEqual(await SurveyResponse.objects.acount(), 1)
+        answer = await SurveyAnswer.objects.select_related("option").aget()
+        self.assertEqual((answer.option.label, answer.answer_text), ("Password manager", ""))
+
+    async def test_invalid_post_renders_errors(self):
+        payload = {
+            "respondent_role": SurveyResponse.RespondentRole.BUILDERS,
+            "question_1": "password_manager",
+        }
+        response = await self.async_client.post(reverse("surveys:form"), data=payload)
+        self.assertContains(response, "This question is required for builders.")
+
+    async def test_thank_you(self):
+        response = await self.async_client.get(reverse("surveys:thank_you"))
+        self.assertContains(response, "Thank you for the insight!")
+
+
+class SubmissionSpoolTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        QuestionOption.objects.create(
+            question=q1,
+            value="password_manager",
+            label="Password manager",
+            order=1,
+        )
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        spool_settings = override_settings(SURVEY_SPOOL_PATH=Path(tmpdir.name) / "spool.sqlite3")
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+        self.spool = get_spool()
+
+    def submit(self):
+        payload = {
+            "respondent_name": "Alex",
+            "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+            "question_1": "password_manager",
+        }
+        return self.client.post(reverse("surveys:form"), data=payload)
+
+    def test_post_is_spooled_not_written(self):
+        response = self.submit()
+        self.assertEqual(redirect_path(response), reverse("surveys:thank_you"))
+        self.assertEqual(SurveyResponse.objects.count(), 0)
+        self.assertEqual(self.spool.stats().pending, 1)
+
+    def test_flush_writes_batches_and_empties_spool(self):
+        self.submit()
+        self.submit()
+        spooled_at = [s.created_at for _, s in self.spool.peek(10)]
+        result = self.spool.flush(batch_size=1)
+        self.assertEqual((result.batches, result.written, result.duplicates), (2, 2, 0))
+        self.assertEqual(self.spool.stats().pending, 0)
+        self.assertEqual(SurveyAnswer.objects.filter(option__label="Password manager").count(), 2)
+        self.assertEqual(
+            sorted(SurveyResponse.objects.values_list("created_at", flat=True)), sorted(spooled_at)
+        )
+
+    def test_replayed_batch_is_written_once(self):
+        self.submit()
+        # A flusher that committed but died before acknowledging the spool rows.
+        save_submissions([submission for _, submission in self.spool.peek(10)])
+        result = self.spool.flush()
+        self.assertEqual((result.written, result.duplicates), (0, 1))
+        self.assertEqual(SurveyResponse.objects.count(), 1)
+        self.assertEqual(SurveyAnswer.objects.count(), 1)
+
+    def test_submissions_that_fail_alone_are_dead_lettered(self):
+        self.submit()
+        self.submit()
+        poisoned = self.spool.peek(10)[0][1].submission_id
+        with self.spool._connection() as journal:
+            journal.execute(
+                "INSERT INTO spool (submission_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                ("broken", '{"submission_id": "broken"}', time.time()),
+            )
+
+        def save(submissions):
+            # A question deleted after spooling, say.
+            if any(submission.submission_id == poisoned for submission in submissions):
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            return save_submissions(submissions)
+
+        with patch("surveys.spool.save_submissions", side_effect=save), self.assertLogs("surveys.spool", "WARNING"):
+            result = self.spool.flush()
+        self.assertEqual((result.written, result.dead), (1, 2))
+        self.assertEqual(SurveyResponse.objects.count(), 1)
+        stats = self.spool.stats()
+        self.assertEqual((stats.pending, stats.dead), (0, 2))
+        errors = dict(self.spool.dead_letters())
+        self.assertEqual(errors[str(poisoned)], "IntegrityError: FOREIGN KEY constraint failed")
+        self.assertTrue(errors["broken"].startswith("ValueError"))
+
+    def test_an_unreachable_database_leaves_the_batch_spooled(self):
+        self.submit()
+        with (
+            patch("surveys.spool.save_submissions", side_effect=OperationalError("connection refused")),
+            self.assertRaises(OperationalError),
+        ):
+            self.spool.flush()
+        self.assertEqual((self.spool.stats().pending, self.spool.stats().dead), (1, 0))
+
+    def test_spool_depth_and_age_are_exported(self):
+        self.submit()
+        with tempfile.TemporaryDirectory() as directory, self.settings(SURVEY_METRICS_DIR=directory):
+            body = metrics.render()
+        self.assertIn("survey_spool_pending 1\n", body)
+        self.assertIn("# TYPE survey_spool_oldest_age_seconds gauge", body)
+        self.assertIn("survey_spool_dead_letters 0\n", body)
+
+    def test_flush_loop_reconnects_after_a_database_error(self):
+        self.submit()
+        flush = self.spool.flush
+        attempts = []
+
+        def flaky_flush(**kwargs):
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                raise OperationalError("server closed the connection unexpectedly")
+            return flush(**kwargs)
+
+        stderr = io.StringIO()
+        with (
+            patch("surveys.management.commands.flush_spool.get_spool", return_value=self.spool),
+            patch.object(self.spool, "flush", side_effect=flaky_flush),
+            # Closing the connection would end the test's transaction.
+            patch("surveys.management.commands.flush_spool.close_old_connections") as close_old_connections,
+            patch("surveys.management.commands.flush_spool.time.sleep", side_effect=[None, KeyboardInterrupt]),
+            self.assertRaises(KeyboardInterrupt),
+        ):
+            call_command("flush_spool", loop=True, interval=0, stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(len(attempts), 2)
+        self.assertIn("flush failed", stderr.getvalue())
+        # Before each attempt, and after the failed one.
+        self.assertEqual(close_old_connections.call_count, 3)
+        self.assertEqual(SurveyResponse.objects.count(), 1)
+        self.assertEqual(self.spool.stats().pending, 0)
+
+
+class IdempotentSubmissionTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        QuestionOption.objects.create(
+            question=q1,
+            value="password_manager",
+            label="Password manager",
+            order=1,
+        )
+
+    def test_form_carries_a_fresh_token(self):
+        first = self.client.get(reverse("surveys:form")).context["form"]["submission_id"].value()
+        second = self.client.get(reverse("surveys:form")).context["form"]["submission_id"].value()
+        self.assertTrue(first)
+        self.assertNotEqual(first, second)
+
+    def test_repeated_token_is_saved_once(self):
+        payload = {
+            "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+            "question_1": "password_manager",
+            "submission_id": "4f0c1b5e-2a51-4d35-8f53-0f3f6f1d9a10",
+        }
+        first = self.client.post(reverse("surveys:form"), data=payload)
+        with self.assertNumQueries(3):
+            # savepoint, indexed token lookup, release; no answer-table writes.
+            second = self.client.post(reverse("surveys:form"), data=payload)
+        self.assertEqual(redirect_path(first), reverse("surveys:thank_you"))
+        self.assertEqual(redirect_path(second), reverse("surveys:thank_you"))
+        self.assertEqual(SurveyResponse.objects.count(), 1)
+        self.assertEqual(SurveyAnswer.objects.count(), 1)
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        option = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        self.responses = []
+        for index in range(5):
+            response = SurveyResponse.objects.create(respondent_name=f"R{index}")
+            SurveyAnswer.objects.create(response=response, question=q1, option=option)
+            SurveyAnswer.objects.create(response=response, question_id=4, answer_text=f"wand {index}")
+            self.responses.append(response)
+
+    def test_rows_are_read_in_primary_key_chunks(self):
+        current = catalog.get_catalog()
+        with read_snapshot(), self.assertNumQueries(1 + 3 + 1):
+            # upper bound, one document query per chunk of 2, then the empty chunk
+            rows = list(iter_detailed_rows(catalog=current, chunk_size=2))
+        self.assertEqual([row[0] for row in rows], [r.pk for r in self.responses])
+        self.assertEqual(rows[0][1:], ["R0", "", "General respondent", rows[0][4], "Password manager", "wand 0"])
+
+    def test_admin_action_streams_csv(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse("admin:surveys_surveyresponse_changelist"),
+            {
+                "action": "export_detailed_csv_stream",
+                "_selected_action": [r.pk for r in self.responses[:3]],
+            },
+        )
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:5], ["ID", "Respondent Name", "Respondent Email", "Respondent Role", "Response Date"])
+        self.assertEqual(rows[0][5:], ["Q1: How do you manage passwords?", "Q4: Magic wand?"])
+        self.assertEqual([row[1] for row in rows[1:]], ["R0", "R1", "R2"])
+
+    async def test_admin_action_streams_asynchronously_under_asgi(self):
+        user = await get_user_model().objects.acreate_superuser("admin", "admin@example.com", "pw")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.post(
+            reverse("admin:surveys_surveyresponse_changelist"),
+            {"action": "export_detailed_csv_stream", "_selected_action": [r.pk for r in self.responses[:3]]},
+        )
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([row[1] for row in csv.reader(io.StringIO(content))][1:], ["R0", "R1", "R2"])
+
+    async def test_iterate_in_thread_batches_and_closes_the_iterable(self):
+        closed = []
+
+        def lines():
+            try:
+                yield from ["a\n", "b\n", "c\n"]
+            finally:
+                closed.append(threading.get_ident())
+
+        chunks = iterate_in_thread(lines(), batch_size=2)
+        self.assertEqual(await anext(chunks), "a\nb\n")
+        await chunks.aclose()
+        # Closed on the thread-sensitive thread (the test's own here), where it was iterated.
+        self.assertEqual(closed, [threading.main_thread().ident])
+        self.assertEqual([chunk async for chunk in iterate_in_thread(["a\n", "b\n", "c\n"], 2)], ["a\nb\n", "c\n"])
+
+
+class ResponseDocumentTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.option = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+
+    def submit(self, **answers):
+        data = {"respondent_role": SurveyResponse.RespondentRole.GENERAL, **answers}
+        form = get_survey_form_class(catalog.get_catalog())(data=data)
+        self.assertTrue(form.is_valid(), form.errors)
+        return Submission.from_form(form.catalog, form.cleaned_data)
+
+    def test_submissions_write_documents(self):
+        response, _ = save_submission(self.submit(question_1="password_manager", question_4="A wand"))
+        save_submissions([self.submit(question_4="Another")])
+        documents = dict(ResponseDocument.objects.values_list("response_id", "answers"))
+        self.assertEqual(documents[response.pk], {"1": self.option.pk, "4": "A wand"})
+        self.assertEqual(sorted(documents.values(), key=len)[0], {"4": "Another"})
+
+    def test_a_submission_writes_its_document_once(self):
+        submission = self.submit(question_1="password_manager", question_4="A wand")
+        with CaptureQueriesContext(connection) as queries:
+            save_submission(submission)
+        writes = [
+            query["sql"] for query in queries
+            if "surveys_responsedocument" in query["sql"] and not query["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(len(writes), 1, writes)
+
+    def test_model_edits_refresh_the_document(self):
+        response, _ = save_submission(self.submit(question_4="A wand"))
+        answer = response.answers.get()
+        answer.answer_text = "Two wands"
+        answer.save()
+        self.assertEqual(ResponseDocument.objects.get(pk=response.pk).answers, {"4": "Two wands"})
+        answer.delete()
+        self.assertEqual(ResponseDocument.objects.get(pk=response.pk).answers, {})
+        response.delete()
+        self.assertFalse(ResponseDocument.objects.exists())
+
+    def test_rebuild_restores_documents_from_answers(self):
+        response, _ = save_submission(self.submit(question_1="password_manager"))
+        ResponseDocument.objects.all().delete()
+        call_command("rebuild_response_documents", stdout=io.StringIO())
+        self.assertEqual(ResponseDocument.objects.get(pk=response.pk).answers, {"1": self.option.pk})
+
+    def test_relabelled_options_are_exported_with_their_new_label(self):
+        save_submission(self.submit(question_1="password_manager", question_4="A wand"))
+        # A queryset update (as in a data migration) sends no signals and touches no document.
+        QuestionOption.objects.filter(pk=self.option.pk).update(label="A password manager")
+        catalog.invalidate()
+        [row] = iter_detailed_rows()
+        self.assertEqual(row[-2:], ["A password manager", "A wand"])
+
+
+class AnswerOptionBackfillTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.option = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        for text in ["Password manager", "password_manager", "Sticky notes"]:
+            response = SurveyResponse.objects.create()
+            SurveyAnswer.objects.create(response=response, question=q1, answer_text=text)
+            SurveyAnswer.objects.create(response=response, question_id=4, answer_text="Password manager")
+
+    def test_label_and_value_texts_are_linked_in_chunks(self):
+        call_command("backfill_answer_options", "--chunk-size", "2", stdout=io.StringIO())
+        self.assertEqual(
+            sorted(SurveyAnswer.objects.filter(question_id=1).values_list("option_id", "answer_text"), key=str),
+            sorted([(self.option.pk, ""), (self.option.pk, ""), (None, "Sticky notes")], key=str),
+        )
+        # Free-text questions are never touched.
+        self.assertEqual(SurveyAnswer.objects.filter(question_id=4, option__isnull=True).count(), 3)
+        self.assertEqual(option_totals(), {self.option.pk: {"all": 2}})
+
+
+class OptionTallyTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.manager = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        self.memory = QuestionOption.objects.create(question=q1, value="memory", label="Memory", order=2)
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+
+    def submit(self, role=SurveyResponse.RespondentRole.GENERAL, **answers):
+        form = get_survey_form_class(catalog.get_catalog())(data={"respondent_role": role, **answers})
+        self.assertTrue(form.is_valid(), form.errors)
+        return Submission.from_form(form.catalog, form.cleaned_data)
+
+    def test_submissions_increment_sharded_tallies(self):
+        with self.settings(SURVEY_TALLY_SHARDS=4):
+            for _ in range(6):
+                save_submission(self.submit(question_1="password_manager", question_4="free text"))
+            save_submissions([
+                self.submit(question_1="memory"),
+                self.submit(role=SurveyResponse.RespondentRole.BUILDERS, question_1="memory"),
+            ])
+        totals = option_totals()
+        self.assertEqual(totals[self.manager.pk], {"all": 6})
+        self.assertEqual(totals[self.memory.pk], {"all": 1, "builders": 1})
+        self.assertLessEqual(OptionTally.objects.filter(option=self.manager).count(), 4)
+
+    def test_model_edits_adjust_tallies_and_reconcile_agrees(self):
+        response, _ = save_submission(self.submit(question_1="password_manager"))
+        answer = response.answers.get(question_id=1)
+        answer.option = self.memory
+        answer.save()
+        response.respondent_role = SurveyResponse.RespondentRole.BUILDERS
+        response.save()
+        self.assertEqual(option_totals(), {self.manager.pk: {"all": 0}, self.memory.pk: {"all": 0, "builders": 1}})
+        save_submission(self.submit(question_1="memory"))
+        response.delete()
+
+        incremental = {
+            option: {role: count for role, count in roles.items() if count}
+            for option, roles in option_totals().items()
+        }
+        call_command("reconcile_tallies", stdout=io.StringIO())
+        self.assertEqual(option_totals(), {k: v for k, v in incremental.items() if v})
+        self.assertEqual(option_totals(), {self.memory.pk: {"all": 1}})
+
+    def test_question_admin_shows_tallies(self):
+        save_submission(self.submit(question_1="memory"))
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        changelist = self.client.get(reverse("admin:surveys_question_changelist"))
+        self.assertContains(changelist, '<td class="field-answer_total">1</td>', html=True)
+        change = self.client.get(reverse("admin:surveys_question_change", args=[1]))
+        self.assertContains(change, "<tr><td>Memory</td><td>1</td><td>0</td><td>1</td></tr>", html=True)
+
+    def test_reconcile_refuses_while_choice_answers_are_not_linked(self):
+        response = SurveyResponse.objects.create()
+        SurveyAnswer.objects.create(response=response, question_id=1, answer_text="Memory")
+        SurveyAnswer.objects.create(response=response, question_id=4, answer_text="Free text")
+        with self.assertRaisesMessage(CommandError, "1 choice answers are stored as label text only"):
+            call_command("reconcile_tallies", stdout=io.StringIO())
+        call_command("backfill_answer_options", stdout=io.StringIO())
+        call_command("reconcile_tallies", stdout=io.StringIO())
+        self.assertEqual(option_totals(), {self.memory.pk: {"all": 1}})
+
+
+class BulkAnswerImportTests(TestCase):
+    HEADER = "Response ID,Respondent Name,Respondent Email,Question ID,Answer,Answered At,Respondent Role\n"
+
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.manager = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        self.memory = QuestionOption.objects.create(question=q1, value="memory", label="Memory", order=2)
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        self.existing, _ = save_submission(Submission(
+            uuid.uuid4(), "Ann", "ann@example.com", SurveyResponse.RespondentRole.BUILDERS,
+            [AnswerData(1, "Memory", self.memory.pk)],
+        ))
+
+    def import_file(self, rows, *args):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "answers.csv"
+        path.write_text(self.HEADER + rows)
+        out = io.StringIO()
+        call_command("import_answers", str(path), *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_rows_are_imported_in_batches_with_documents_and_tallies(self):
+        new_id = self.existing.pk + 100
+        rows = (
+            f"{self.existing.pk},Ann,ann@example.com,4,A wand,2024-01-02 10:00:00,\n"
+            f"{self.existing.pk},Ann,ann@example.com,1,Memory,2024-01-02 10:00:00,\n"
+            f"{new_id},Bob,,1,Password manager,2023-05-06 07:08:09,Builder / technical\n"
+            f"{new_id},Bob,,4,Less phishing,2023-05-06 07:08:09,Builder / technical\n"
+            f"{new_id},Bob,,4,Duplicate row,2023-05-06 07:08:09,Builder / technical\n"
+            f"{new_id + 1},,,1,memory,2023-05-07 07:08:09,\n"
+        )
+        with patch.object(SurveyAnswerBulkResource._meta, "batch_size", 2):
+            output = self.import_file(rows)
+        self.assertIn("imported 4 answers (2 new responses), skipped 2, 0 failed", output)
+        self.assertIn("6/6 rows", output)
+
+        bob = SurveyResponse.objects.get(pk=new_id)
+        self.assertEqual((bob.respondent_name, bob.respondent_role), ("Bob", SurveyResponse.RespondentRole.BUILDERS))
+        self.assertEqual(bob.created_at.year, 2023)
+        self.assertEqual(
+            ResponseDocument.objects.get(pk=new_id).answers, {"1": self.manager.pk, "4": "Less phishing"}
+        )
+        self.assertEqual(
+            ResponseDocument.objects.get(pk=self.existing.pk).answers, {"1": self.memory.pk, "4": "A wand"}
+        )
+        self.assertEqual(SurveyAnswer.objects.get(response_id=new_id + 1).option_id, self.memory.pk)
+        self.assertEqual(
+            option_totals(),
+            {self.manager.pk: {"builders": 1}, self.memory.pk: {"all": 1, "builders": 1}},
+        )
+        # The id sequence was moved past the imported responses.
+        self.assertGreater(SurveyResponse.objects.create().pk, new_id + 1)
+        # Re-running the same file writes nothing new.
+        self.assertIn("imported 0 answers (0 new responses), skipped 6", self.import_file(rows))
+
+    def test_dry_run_and_invalid_rows(self):
+        rows = f"{self.existing.pk + 1},,,1,Carrier pigeon,2024-01-02 10:00:00,\n"
+        with self.assertRaisesMessage(CommandError, "Some rows were not imported"):
+            self.import_file(rows)
+        output = self.import_file(f"{self.existing.pk + 1},,,4,Text,2024-01-02 10:00:00,\n", "--dry-run")
+        self.assertIn("checked 1 answers", output)
+        self.assertEqual(SurveyResponse.objects.count(), 1)
+        self.assertEqual(SurveyAnswer.objects.count(), 1)
+
+    def test_answer_export_round_trips(self):
+        save_submission(Submission(
+            uuid.uuid4(), "Cy", "", SurveyResponse.RespondentRole.GENERAL,
+            [AnswerData(1, "Password manager", self.manager.pk), AnswerData(4, "A wand")],
+        ))
+        exported = SurveyAnswerResource().export()
+        expected = sorted(SurveyAnswer.objects.values_list("response_id", "question_id", "option_id", "answer_text"))
+        SurveyResponse.objects.all().delete()
+
+        result = SurveyAnswerBulkResource().import_data(exported)
+        self.assertFalse(result.has_errors() or result.has_validation_errors())
+        self.assertEqual(
+            sorted(SurveyAnswer.objects.values_list("response_id", "question_id", "option_id", "answer_text")),
+            expected,
+        )
+
+
+
+class IngestResponsesTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.manager = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        self.memory = QuestionOption.objects.create(question=q1, value="memory", label="Memory", order=2)
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def ingest(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content)
+        out, err = io.StringIO(), io.StringIO()
+        try:
+            call_command("ingest_responses", str(path), *args, stdout=out, stderr=err)
+        finally:
+            self.errors = err.getvalue()
+        return out.getvalue()
+
+    def test_csv_records_are_validated_and_loaded_in_batches(self):
+        content = (
+            "respondent_name,respondent_role,question_1,question_4,created_at\n"
+            "Ann,all,Password manager,\"A wand,\nwith a comma\",2024-03-01 09:30:00\n"
+            "Bob,builders,MEMORY,,\n"
+            "Cy,all,Carrier pigeon,,\n"
+        )
+        with self.assertRaisesMessage(CommandError, "1 invalid records were skipped"):
+            self.ingest("paper.csv", content, "--batch-size", "1")
+        self.assertIn("paper.csv:5: question_1: Select a valid choice.", self.errors)
+
+        ann = SurveyResponse.objects.get(respondent_name="Ann")
+        self.assertEqual(ann.created_at.year, 2024)
+        self.assertEqual(ann.answers.get(question_id=4).answer_text, "A wand,\nwith a comma")
+        self.assertEqual(
+            ResponseDocument.objects.get(pk=ann.pk).answers, {"1": self.manager.pk, "4": "A wand,\nwith a comma"}
+        )
+        bob = SurveyResponse.objects.get(respondent_name="Bob")
+        self.assertEqual(bob.answers.get().option_id, self.memory.pk)
+        self.assertEqual(option_totals(), {self.manager.pk: {"all": 1}, self.memory.pk: {"builders": 1}})
+        self.assertEqual(search_answers("comma").get().response_id, ann.pk)
+
+    def test_stored_submission_ids_are_skipped(self):
+        submission_id = uuid.uuid4()
+        content = "\n".join([
+            json.dumps({"submission_id": str(submission_id), "respondent_role": "all", "question_1": "memory"}),
+            "",
+            json.dumps({"respondent_role": "all", "question_4": "Kiosk"}),
+        ])
+        output = self.ingest("kiosk.jsonl", content)
+        self.assertIn("loaded 2 of 2 records: 2 new responses, 0 already stored, 0 invalid", output)
+        with self.assertRaises(CommandError):
+            self.ingest("again.jsonl", content.split("\n")[0] + "\n{broken")
+        self.assertIn("again.jsonl:2: Invalid JSON", self.errors)
+        self.assertEqual(SurveyResponse.objects.count(), 2)
+        self.assertEqual(SurveyResponse.objects.filter(submission_id=submission_id).count(), 1)
+
+        output = self.ingest("new.jsonl", json.dumps({"respondent_role": "all"}), "--dry-run")
+        self.assertIn("validated 1 of 1 records: 0 new responses", output)
+        self.assertEqual(SurveyResponse.objects.count(), 2)
+
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+
+@unittest.skipUnless(pyarrow, "pyarrow is not installed")
+class ColumnarExportTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        option = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        QuestionOption.objects.create(question=q1, value="memory", label="Memory", order=2)
+        for index in range(5):
+            response = SurveyResponse.objects.create(respondent_name=f"R{index}")
+            if index == 3:
+                SurveyAnswer.objects.create(response=response, question=q1, answer_text="Sticky notes")
+            else:
+                SurveyAnswer.objects.create(response=response, question=q1, option=option)
+            SurveyAnswer.objects.create(response=response, question_id=4, answer_text=f"wand {index}")
+
+    def test_parquet_responses_have_typed_columns(self):
+        output = io.BytesIO()
+        self.assertEqual(write_responses(output, "parquet", chunk_size=2), 5)
+        table = pyarrow.parquet.read_table(io.BytesIO(output.getvalue()))
+        self.assertEqual(table.schema.field("response_id").type, pyarrow.int64())
+        self.assertTrue(pyarrow.types.is_timestamp(table.schema.field("created_at").type))
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field("q1").type))
+        self.assertEqual(
+            table.column("q1").to_pylist(),
+            ["password_manager", "password_manager", "password_manager", "Sticky notes", "password_manager"],
+        )
+        self.assertEqual(table.column("q4").to_pylist()[0], "wand 0")
+        self.assertEqual(table.column("respondent_role").to_pylist(), ["all"] * 5)
+
+    def test_relabelled_options_keep_their_values(self):
+        QuestionOption.objects.filter(value="password_manager").update(label="A password manager")
+        catalog.invalidate()
+        output = io.BytesIO()
+        write_responses(output, "parquet")
+        table = pyarrow.parquet.read_table(io.BytesIO(output.getvalue()))
+        self.assertEqual(table.column("q1").to_pylist().count("password_manager"), 4)
+
+    def test_values_missing_from_the_dictionary_are_an_error(self):
+        dictionary = _Dictionary(["password_manager"], aliases={"Password manager": "password_manager"})
+        self.assertEqual(
+            dictionary.array(pyarrow, ["Password manager", "", None]).to_pylist(), ["password_manager", None, None]
+        )
+        with self.assertRaisesMessage(ValueError, "Old label"):
+            dictionary.array(pyarrow, ["Old label"])
+
+    def test_arrow_answers_are_written_in_record_batches(self):
+        output = io.BytesIO()
+        self.assertEqual(write_answers(output, "arrow", chunk_size=4), 10)
+        reader = pyarrow.ipc.open_file(io.BytesIO(output.getvalue()))
+        self.assertEqual(reader.num_record_batches, 3)
+        table = reader.read_all()
+        self.assertEqual(table.schema.field("question_id").type, pyarrow.int16())
+        self.assertEqual(table.column("question_id").to_pylist()[:2], [1, 4])
+
+    def test_admin_action_downloads_parquet(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse("admin:surveys_surveyanswer_changelist"),
+            {"action": "export_parquet", "_selected_action": list(SurveyAnswer.objects.values_list("pk", flat=True))},
+        )
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet")
+        table = pyarrow.parquet.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(table.num_rows, 10)
+
+    def test_stale_documents_are_reported_by_the_admin_action(self):
+        # Documents written before option ids were stored hold the label of the day.
+        document = ResponseDocument.objects.first()
+        document.answers = {"1": "Old label"}
+        document.save()
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse("admin:surveys_surveyresponse_changelist"),
+            {"action": "export_parquet", "_selected_action": [document.pk]},
+            follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "rebuild_response_documents")
+
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+
+class CrossTabTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="About You", prompt="Which describes you?")
+        q7 = Question.objects.create(id=7, category="Pricing", prompt="Would you pay?")
+        options = {}
+        for order, (value, label) in enumerate([("student", "Student"), ("developer", "Developer")]):
+            options[label] = QuestionOption.objects.create(question=q1, value=value, label=label, order=order)
+        for order, (value, label) in enumerate([("yes", "Yes"), ("no", "No")]):
+            options[label] = QuestionOption.objects.create(question=q7, value=value, label=label, order=order)
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        combos = [("Student", "No")] * 3 + [("Developer", "Yes")] * 4 + [("Developer", "No")]
+        for index, (role_answer, pay_answer) in enumerate(combos):
+            role = SurveyResponse.RespondentRole.BUILDERS if role_answer == "Developer" else SurveyResponse.RespondentRole.GENERAL
+            response = SurveyResponse.objects.create(respondent_role=role)
+            SurveyAnswer.objects.create(response=response, question=q1, option=options[role_answer])
+            SurveyAnswer.objects.create(response=response, question=q7, option=options[pay_answer])
+        # Only one of the two questions answered: left out of the table.
+        response = SurveyResponse.objects.create()
+        SurveyAnswer.objects.create(response=response, question=q1, option=options["Student"])
+
+    def test_chi_square_survival_function(self):
+        self.assertAlmostEqual(chi2_sf(3.841459, 1), 0.05, places=6)
+        self.assertAlmostEqual(chi2_sf(5.991465, 2), 0.05, places=6)
+        self.assertAlmostEqual(chi2_sf(18.307038, 10), 0.05, places=6)
+        self.assertEqual(chi2_sf(0.0, 3), 1.0)
+
+    @unittest.skipUnless(numpy, "NumPy is not installed")
+    def test_crosstab_counts_by_role(self):
+        overall, general, builders = crosstab(catalog.get_catalog(), 1, 7)
+        self.assertEqual(overall.counts, [[0, 3], [4, 1]])
+        self.assertEqual(overall.total, 8)
+        self.assertEqual(overall.row_percentages[1], [80.0, 20.0])
+        self.assertEqual(general.counts, [[0, 3], [0, 0]])
+        self.assertEqual(builders.counts, [[0, 0], [4, 1]])
+        self.assertEqual(overall.chi_square.dof, 1)
+        self.assertIsNone(general.chi_square)
+
+    @unittest.skipUnless(numpy, "NumPy is not installed")
+    def test_admin_analytics_page(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        url = reverse("admin:surveys_surveyresponse_analytics")
+        response = self.client.get(url, {"row_question": 1, "column_question": 7, "end": "2999-01-01"})
+        self.assertContains(response, "All respondents (8 responses)")
+        self.assertContains(response, "<td>4 <small>(80.0%)</small></td>", html=True)
+        self.assertNotContains(response, "backfill_answer_options")
+
+        # An answer saved before answers referenced their option.
+        SurveyAnswer.objects.create(response=SurveyResponse.objects.create(), question_id=7, answer_text="Yes")
+        response = self.client.get(url, {"row_question": 1, "column_question": 7}, follow=True)
+        self.assertContains(response, "1 choice answers are stored as label text only")
+        response = self.client.get(url, {"row_question": 1, "column_question": 7, "end": "2000-01-01"})
+        self.assertContains(response, "All respondents (0 responses)")
+        changelist = self.client.get(reverse("admin:surveys_surveyresponse_changelist"))
+        self.assertContains(changelist, f'href="{url}"')
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.option = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+
+    def add_responses(self, count):
+        for index in range(count):
+            response = SurveyResponse.objects.create(respondent_name=f"R{index}")
+            SurveyAnswer.objects.create(response=response, question_id=1, option=self.option)
+            SurveyAnswer.objects.create(response=response, question_id=4, answer_text=f"wand {index}")
+
+    def test_answer_changelist_query_count_does_not_grow_with_rows(self):
+        url = reverse("admin:surveys_surveyanswer_changelist")
+        self.add_responses(3)
+        self.client.get(url)
+        # session, user, question filter choices, category filter choices, bounded count, page
+        with self.assertNumQueries(6) as small:
+            self.client.get(url)
+        self.add_responses(60)
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+        sql = " ".join(query["sql"] for query in small.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_answer_column_sorts_choice_and_text_answers_together(self):
+        self.add_responses(2)
+        SurveyAnswer.objects.create(response=SurveyResponse.objects.create(), question_id=4, answer_text="A wand")
+        response = self.client.get(reverse("admin:surveys_surveyanswer_changelist"), {"o": "3"})
+        answers = [row.answer_display for row in response.context["cl"].result_list]
+        self.assertEqual(answers, ["A wand", "Password manager", "Password manager", "wand 0", "wand 1"])
+
+    def test_keyset_pages_walk_every_row_once(self):
+        self.add_responses(130)
+        url = reverse("admin:surveys_surveyresponse_changelist")
+        seen = []
+        while url:
+            response = self.client.get(url)
+            changelist = response.context["cl"]
+            seen.extend(row.pk for row in changelist.result_list)
+            url = changelist.next_page_url() if changelist.next_cursor is not None else None
+            if url:
+                self.assertContains(response, "Next page")
+                url = reverse("admin:surveys_surveyresponse_changelist") + url
+        self.assertEqual(seen, sorted(SurveyResponse.objects.values_list("pk", flat=True), reverse=True))
+
+    def test_response_change_page_inline_is_joined(self):
+        self.add_responses(1)
+        response = SurveyResponse.objects.get()
+        url = reverse("admin:surveys_surveyresponse_change", args=[response.pk])
+        self.client.get(url)
+        # session, user, response, answers joined with question and option
+        with self.assertNumQueries(4) as few:
+            self.client.get(url)
+        for index in range(2, 4):
+            Question.objects.create(id=10 + index, category="Extra", prompt=f"Extra {index}")
+            SurveyAnswer.objects.create(response=response, question_id=10 + index, answer_text="x")
+        with self.assertNumQueries(len(few.captured_queries)):
+            self.client.get(url)
+
+
+class AnswerSearchTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+
+    def answer(self, text):
+        response = SurveyResponse.objects.create(respondent_name="Ada")
+        return SurveyAnswer.objects.create(response=response, question_id=4, answer_text=text)
+
+    def test_matches_are_ranked_and_stemmed(self):
+        weak = self.answer("Passwords everywhere, plus a long story about phishing and nothing else at all")
+        strong = self.answer("password password password")
+        self.answer("Nothing relevant here")
+        results = list(search_answers("password"))
+        self.assertEqual(results, [strong, weak])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        response = SurveyResponse.objects.create(respondent_name="Ada")
+        SurveyAnswer.objects.bulk_create([SurveyAnswer(response=response, question_id=4, answer_text="hardware keys")])
+        self.assertEqual(search_answers("hardware").count(), 1)
+        answer = SurveyAnswer.objects.get()
+        answer.answer_text = "software tokens"
+        answer.save()
+        self.assertEqual(search_answers("hardware").count(), 0)
+        self.assertEqual(search_answers("tokens").count(), 1)
+        answer.delete()
+        self.assertEqual(search_answers("tokens").count(), 0)
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "SQLite FTS5 plan")
+    def test_sqlite_match_runs_once_per_query(self):
+        self.answer("password manager")
+        queryset = search_answers("password")
+        self.assertEqual(str(queryset.query).count("MATCH"), 1)
+        plan = queryset.explain()
+        self.assertEqual(plan.count("VIRTUAL TABLE"), 1, plan)
+        self.assertNotIn("CORRELATED", plan)
+        self.assertIn("SEARCH surveys_surveyanswer USING INTEGER PRIMARY KEY", plan)
+
+    def test_query_syntax_in_terms_is_ignored(self):
+        self.answer('He said "NEAR" and OR')
+        self.assertEqual(search_answers('said" OR (').count(), 1)
+        self.assertEqual(search_answers("***").count(), 0)
+
+    def test_terms_with_punctuation_are_searched_as_phrases(self):
+        mail = self.answer("Write to ann@example.com please")
+        self.answer("Ann wrote an example for .com domains")
+        self.assertEqual(list(search_answers("ann@example.com")), [mail])
+
+    def test_admin_search_for_an_address(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        mail = self.answer("Write to ann@example.com please")
+        response = SurveyResponse.objects.create(respondent_email="bob@example.com")
+        own = SurveyAnswer.objects.create(response=response, question_id=4, answer_text="Keys")
+        url = reverse("admin:surveys_surveyanswer_changelist")
+        for term, expected in [("ann@example.com", [mail]), ("bob@example.com", [own])]:
+            with self.subTest(term=term):
+                changelist = self.client.get(url, {"q": term})
+                self.assertEqual(list(changelist.context["cl"].result_list), expected)
+
+    def test_admin_search_uses_rank_order(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        weak = self.answer("phishing mail and a lot of other unrelated words in this answer")
+        strong = self.answer("phishing phishing")
+        response = self.client.get(reverse("admin:surveys_surveyanswer_changelist"), {"q": "phishing"})
+        self.assertEqual(list(response.context["cl"].result_list), [strong, weak])
+
+    def test_command_prints_hits(self):
+        self.answer("passkeys please")
+        out = io.StringIO()
+        call_command("search_answers", "passkeys", stdout=out)
+        self.assertIn("passkeys please", out.getvalue())
+        self.assertIn("1 results", out.getvalue())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        self.option = QuestionOption.objects.create(
+            question=q1, value="password_manager", label="Password manager", order=1
+        )
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        self.retired = Question.objects.create(id=9, category="Old", prompt="Retired?", is_active=False)
+        self.now = timezone.now()
+        self.old = [self.respond(f"Old {index}", days=400 + index) for index in range(3)]
+        self.new = self.respond("New", days=1)
+
+    def respond(self, name, days, retired=False):
+        response = SurveyResponse.objects.create(
+            respondent_name=name,
+            respondent_email=f"{name[:3].lower()}@example.com",
+            created_at=self.now - timedelta(days=days),
+        )
+        if retired:
+            SurveyAnswer.objects.create(response=response, question=self.retired, answer_text="yes")
+        else:
+            SurveyAnswer.objects.create(response=response, question_id=1, option=self.option)
+            SurveyAnswer.objects.create(response=response, question_id=4, answer_text=f"wand for {name}")
+        return response
+
+    def test_archive_moves_old_responses_and_keeps_tallies_in_step(self):
+        archived = archive_responses(archivable(before=self.now - timedelta(days=365)), chunk_size=2)
+        self.assertEqual(archived, 3)
+        self.assertEqual(list(SurveyResponse.objects.values_list("pk", flat=True)), [self.new.pk])
+        self.assertEqual(SurveyAnswer.objects.count(), 2)
+        self.assertEqual(ResponseDocument.objects.count(), 1)
+        self.assertEqual(option_totals()[self.option.pk], {"all": 1})
+
+        row = ArchivedResponse.objects.get(pk=self.old[0].pk)
+        self.assertEqual(row.created_at, self.old[0].created_at)
+        self.assertEqual(
+            ArchivedResponse.unpack(row.payload),
+            {
+                "respondent_name": "Old 0",
+                "respondent_email": "old@example.com",
+                "answers": {"1": "Password manager", "4": "wand for Old 0"},
+            },
+        )
+        reconcile()
+        self.assertEqual(option_totals()[self.option.pk], {"all": 1})
+
+    def test_retired_question_responses_are_archivable(self):
+        stale = self.respond("Stale", days=2, retired=True)
+        self.assertEqual(list(archivable(retired_questions=True)), [stale])
+        self.assertEqual(archivable().count(), 0)
+
+    def test_exports_include_archived_rows_on_request(self):
+        archive_responses(archivable(before=self.now - timedelta(days=365)))
+        catalog.invalidate()
+        live = list(iter_detailed_rows())
+        self.assertEqual([row[0] for row in live], [self.new.pk])
+        rows = list(iter_detailed_rows(archived=ArchivedResponse.objects.all()))
+        self.assertEqual([row[0] for row in rows], [self.new.pk] + [response.pk for response in self.old])
+        self.assertEqual(rows[1][1:3], ["Old 0", "old@example.com"])
+        self.assertEqual(rows[1][-2:], ["Password manager", "wand for Old 0"])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet_export_appends_archived_rows(self):
+        archive_responses(archivable(before=self.now - timedelta(days=365)))
+        catalog.invalidate()
+        output = io.BytesIO()
+        self.assertEqual(write_responses(output, "parquet", archived=ArchivedResponse.objects.all()), 4)
+        table = pyarrow.parquet.read_table(io.BytesIO(output.getvalue()))
+        self.assertEqual(table.column("q1").to_pylist(), ["password_manager"] * 4)
+        self.assertEqual(table.column("respondent_name").to_pylist()[1], "Old 0")
+
+    def test_command_and_admin(self):
+        out = io.StringIO()
+        call_command("archive_responses", "--older-than", "365", "--dry-run", stdout=out)
+        self.assertIn("3 responses would be archived", out.getvalue())
+        call_command("archive_responses", "--older-than", "365", stdout=out)
+        self.assertEqual(ArchivedResponse.objects.count(), 3)
+
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        response = self.client.get(reverse("admin:surveys_archivedresponse_changelist"))
+        self.assertEqual(len(response.context["cl"].result_list), 3)
+        response = self.client.get(reverse("admin:surveys_archivedresponse_change", args=[self.old[0].pk]))
+        self.assertContains(response, "wand for Old 0")
+
+
+def _fake_survey_app(environ, start_response):
+    """Just enough of the survey flow for the load generator: page, token check, redirect."""
+    if environ["REQUEST_METHOD"] == "POST":
+        body = environ["wsgi.input"].read(int(environ.get("CONTENT_LENGTH") or 0)).decode()
+        if "csrfmiddlewaretoken=tok" in body and "csrftoken=tok" in environ.get("HTTP_COOKIE", ""):
+            start_response("302 Found", [("Location", "/thanks/"), ("Content-Length", "0")])
+            return [b""]
+        page = b'<ul><li class="message error">Bad token</li></ul>'
+        start_response("200 OK", [("Content-Length", str(len(page)))])
+        return [page]
+    if environ["PATH_INFO"] == "/thanks/":
+        # No Content-Length: the server closes the connection after the body.
+        start_response("200 OK", [("Content-Type", "text/html")])
+        return [b"thanks"]
+    page = (
+        b'<form method="post"><input type="hidden" name="csrfmiddlewaretoken" value="tok">'
+        b'<input type="radio" name="question_1" value="a"><input type="radio" name="question_1" value="b">'
+        b'<select name="respondent_role"><option value="all">All</option></select>'
+        b'<textarea name="question_4"></textarea><input name="respondent_name"></form>'
+    )
+    start_response("200 OK", [("Content-Length", str(len(page))), ("Set-Cookie", "csrftoken=tok; Path=/")])
+    return [page]
+
+
+class LoadTestTests(SimpleTestCase):
+    def test_form_fields_pick_a_value_for_every_field(self):
+        page = _fake_survey_app({"REQUEST_METHOD": "GET", "PATH_INFO": "/"}, lambda *args: None)[0]
+        fields = form_fields(page.decode())
+        self.assertEqual(
+            fields,
+            {
+                "csrfmiddlewaretoken": "tok",
+                "question_1": "a",
+                "respondent_role": "all",
+                "question_4": "Load test answer",
+                "respondent_name": "Load test answer",
+            },
+        )
+
+    def test_percentiles_and_baseline_comparison(self):
+        ordered = [i / 1000 for i in range(1, 101)]
+        self.assertEqual([percentile(ordered, q) for q in (50, 95, 99)], [0.05, 0.095, 0.099])
+        baseline = {"summary": {"flows_per_s": 100.0, "error_rate": 0.0}, "steps": {"submit": {"p95_ms": 10.0}}}
+        report = {"summary": {"flows_per_s": 80.0, "error_rate": 0.0}, "steps": {"submit": {"p95_ms": 15.0}}}
+        self.assertEqual(
+            compare(report, baseline),
+            [("flows/s", 100.0, 80.0, 20.0), ("error rate %", 0.0, 0.0, 0.0), ("submit p95_ms", 10.0, 15.0, 50.0)],
+        )
+
+    def test_command_runs_flows_against_a_server_and_checks_the_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp, local_server(_fake_survey_app) as url:
+            results = Path(tmp) / "run.json"
+            out = io.StringIO()
+            call_command(
+                "loadtest", "--url", url, "--flows", "12", "--concurrency", "3",
+                "--output", str(results), stdout=out,
+            )
+            report = json.loads(results.read_text())
+            self.assertEqual(report["summary"]["flows"], 12)
+            self.assertEqual(report["summary"]["failed_flows"], 0)
+            self.assertEqual(report["steps"]["submit"]["requests"], 12)
+            self.assertEqual(report["steps"]["thank_you"]["requests"], 12)
+            self.assertNotIn("csrf", report["steps"])
+
+            report["summary"]["flows_per_s"] *= 1000
+            results.write_text(json.dumps(report))
+            with self.assertRaisesMessage(CommandError, "flows/s"):
+                call_command(
+                    "loadtest", "--url", url, "--flows", "3", "--baseline", str(results),
+                    "--max-regression", "50", stdout=io.StringIO(),
+                )
+
+    def test_flows_record_the_submission_ids_they_post(self):
+        posted = []
+
+        def app(environ, start_response):
+            if environ["REQUEST_METHOD"] == "POST":
+                body = environ["wsgi.input"].read(int(environ["CONTENT_LENGTH"]))
+                posted.append(parse_qs(body.decode())["submission_id"][0])
+                environ["wsgi.input"] = io.BytesIO(body)
+            return _fake_survey_app(environ, start_response)
+
+        with local_server(app) as url:
+            test = LoadTest(url, "/", "/csrf/")
+            asyncio.run(test.run(4, 2))
+        self.assertEqual(len(set(test.submission_ids)), 4)
+        self.assertEqual(sorted(test.submission_ids), sorted(posted))
+
+
+class LoadTestCleanupTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        QuestionOption.objects.create(question=q1, value="password_manager", label="Password manager", order=1)
+
+    def submit(self, submission_id):
+        payload = {
+            "respondent_name": "loadtest",
+            "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+            "question_1": "password_manager",
+            "submission_id": submission_id,
+        }
+        return self.client.post(reverse("surveys:form"), data=payload)
+
+    def test_only_the_recorded_submissions_are_deleted(self):
+        real, direct, spooled = (str(uuid.uuid4()) for _ in range(3))
+        self.submit(real)
+        self.submit(direct)
+        with tempfile.TemporaryDirectory() as tmp, self.settings(SURVEY_SPOOL_PATH=Path(tmp) / "spool.sqlite3"):
+            self.submit(spooled)
+            self.assertEqual(discard_submissions([direct, spooled]), 2)
+            self.assertEqual(get_spool().stats().pending, 0)
+        self.assertEqual(
+            [str(submission_id) for submission_id in SurveyResponse.objects.values_list("submission_id", flat=True)],
+            [real],
+        )
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        QuestionOption.objects.create(question=q1, value="password_manager", label="Password manager", order=1)
+
+    def timings(self, response):
+        entries = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            entries[name] = dict(param.split("=", 1) for param in params)
+        return entries
+
+    def test_submission_reports_phases_queries_and_a_log_line(self):
+        payload = {"respondent_role": SurveyResponse.RespondentRole.GENERAL, "question_1": "password_manager"}
+        with self.assertLogs("surveys.timing", "INFO") as logs:
+            response = self.client.post(reverse("surveys:form"), data=payload)
+        self.assertEqual(response.status_code, 302)
+        entries = self.timings(response)
+        for name in ("catalog", "validate", "save", "insert", "answers", "document", "tallies", "session", "total"):
+            self.assertIn(name, entries)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["path"], reverse("surveys:form"))
+        self.assertEqual(record["status"], 302)
+        self.assertGreater(record["db_queries"], 0)
+        self.assertEqual(entries["db"]["desc"], f'"{record["db_queries"]} queries"')
+
+    def test_slow_requests_log_a_warning(self):
+        with self.settings(SURVEY_SLOW_REQUEST_MS=0), self.assertLogs("surveys.timing", "WARNING"):
+            response = self.client.get(reverse("surveys:form"))
+        self.assertIn("render", self.timings(response))
+
+    @override_settings(SURVEY_EDGE_CACHE=True)
+    def test_edge_cached_page_carries_no_timings(self):
+        with self.assertLogs("surveys.timing", "INFO") as logs:
+            response = self.client.get(reverse("surveys:form"))
+        self.assertIn("s-maxage", response["Cache-Control"])
+        self.assertNotIn("Server-Timing", response)
+        self.assertIn("catalog", json.loads(logs.records[-1].getMessage())["phases_ms"])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        Question.objects.all().delete()
+        q1 = Question.objects.create(id=1, category="Behavior", prompt="How do you manage passwords?")
+        QuestionOption.objects.create(question=q1, value="password_manager", label="Password manager", order=1)
+        Question.objects.create(id=4, category="Core", prompt="Magic wand?")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = self.settings(SURVEY_METRICS_DIR=directory.name, SURVEY_METRICS_TOKEN="s3cret")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.directory = Path(directory.name)
+
+    def scrape(self, authorization="Bearer s3cret"):
+        headers = {"authorization": authorization} if authorization else {}
+        return self.client.get(reverse("surveys:metrics"), headers=headers)
+
+    def test_replayed_submissions_are_counted_as_duplicates(self):
+        payload = {
+            "respondent_role": SurveyResponse.RespondentRole.GENERAL,
+            "question_1": "password_manager",
+            "submission_id": str(uuid.uuid4()),
+        }
+        for _ in range(2):
+            response = self.client.post(reverse("surveys:form"), payload)
+            self.assertEqual(redirect_path(response), reverse("surveys:thank_you"))
+        with tempfile.TemporaryDirectory() as tmp, self.settings(SURVEY_SPOOL_PATH=Path(tmp) / "spool.sqlite3"):
+            payload["submission_id"] = str(uuid.uuid4())
+            for _ in range(2):
+                self.client.post(reverse("surveys:form"), payload)
+        body = self.scrape().content.decode()
+        for mode in ("direct", "spool"):
+            self.assertIn(f'survey_submissions_total{{mode="{mode}",outcome="new"}} 1', body)
+            self.assertIn(f'survey_submissions_total{{mode="{mode}",outcome="duplicate"}} 1', body)
+        self.assertIn("survey_answers_per_submission_count 2", body)
+
+    def test_requests_submissions_and_validation_failures_are_exposed(self):
+        role = SurveyResponse.RespondentRole.GENERAL
+        self.client.post(reverse("surveys:form"), {"respondent_role": role, "question_1": "password_manager"})
+        self.client.post(reverse("surveys:form"), {"respondent_role": role, "question_1": "password_manager",
+                                                   "question_4": "wand"})
+        self.client.post(reverse("surveys:form"), {"respondent_role": role, "question_1": "nope"})
+        body = self.scrape().content.decode()
+        self.assertIn('survey_submissions_total{mode="direct",outcome="new"} 2', body)
+        self.assertIn('survey_validation_failures_total{field="question_1"} 1', body)
+        self.assertIn('survey_answers_per_submission_bucket{le="1"} 1', body)
+        self.assertIn('survey_answers_per_submission_bucket{le="2"} 2', body)
+        self.assertIn('survey_answers_per_submission_sum 3', body)
+        self.assertIn('survey_request_duration_seconds_count{view="surveys:form",method="POST"} 3', body)
+        self.assertIn('survey_request_duration_seconds_bucket{view="surveys:form",method="POST",le="+Inf"} 3', body)
+        self.assertIn("# TYPE survey_request_db_queries histogram", body)
+        self.assertIn('survey_request_db_queries_count{view="surveys:form"} 3', body)
+
+    def test_threads_write_their_own_files_and_are_summed(self):
+        barrier = threading.Barrier(4)
+
+        def work():
+            barrier.wait()
+            for _ in range(500):
+                metrics.submissions.inc(mode="spool", outcome="new")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(list(self.directory.glob("*.metrics"))), 4)
+        key = ("survey_submissions_total", (("mode", "spool"), ("outcome", "new")))
+        self.assertEqual(metrics.collect()[key], 2000)
+
+    def test_files_of_exited_writers_are_compacted_on_scrape(self):
+        key = ("survey_submissions_total", (("mode", "spool"), ("outcome", "new")))
+        # Left behind by a worker process that has exited.
+        (self.directory / "999999-1.metrics").write_bytes(
+            metrics._encode({"survey_submissions_total|mode=spool|outcome=new": 5})
+        )
+        thread = threading.Thread(target=lambda: metrics.submissions.inc(mode="spool", outcome="new"))
+        thread.start()
+        thread.join()
+        metrics.submissions.inc(mode="spool", outcome="new")
+        self.assertEqual(len(list(self.directory.glob("*.metrics"))), 3)
+
+        self.assertEqual(metrics.collect()[key], 7)
+        # Only this thread's file is still held open.
+        remaining = {path.name for path in self.directory.glob("*.metrics")}
+        self.assertEqual(remaining, {"compacted.metrics", f"{os.getpid()}-{threading.get_ident()}.metrics"})
+        metrics.submissions.inc(mode="spool", outcome="new")
+        self.assertEqual(metrics.collect()[key], 8)
+
+    def test_export_durations_are_observed(self):
+        list(iter_detailed_csv())
+        self.assertIn('survey_export_duration_seconds_count{format="csv",table="responses"} 1', metrics.render())
+
+    def test_pool_statistics_become_counters(self):
+        stats = {"requests_num": 40, "requests_queued": 3, "requests_wait_ms": 1250, "connections_lost": 1}
+        metrics.record_pool_stats("default", stats)
+        metrics.record_pool_stats("default", {"requests_num": 2, "pool_size": 4})
+        body = metrics.render()
+        self.assertIn('survey_db_pool_checkouts_total{database="default"} 42', body)
+        self.assertIn('survey_db_pool_waits_total{database="default"} 3', body)
+        self.assertIn('survey_db_pool_wait_seconds_total{database="default"} 1.25', body)
+        self.assertIn('survey_db_pool_connections_lost_total{database="default"} 1', body)
+        self.assertNotIn("survey_db_pool_timeouts_total{", body)
+
+    @unittest.skipIf(connection.vendor == "postgresql", "runs against PostgreSQL")
+    def test_pool_benchmark_needs_postgresql(self):
+        with self.assertRaisesMessage(CommandError, "needs PostgreSQL"):
+            call_command("bench_pool", stdout=io.StringIO())
+
+    @unittest.skipUnless(connection.settings_dict["OPTIONS"].get("pool"), "DB_POOL is off")
+    def test_pooled_connections_are_checked_before_use(self):
+        from psycopg_pool import ConnectionPool
+
+        self.assertIs(connection.pool._check, ConnectionPool.check_connection)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.scrape(authorization=None).status_code, 401)
+        self.assertEqual(self.scrape(authorization="Bearer wrong").status_code, 401)
+        self.assertEqual(self.scrape().status_code, 200)
+        with self.settings(SURVEY_METRICS_TOKEN=""):
+            self.assertEqual(self.scrape().status_code, 404)
+
+
+class StaticAssetPipelineTests(TestCase):
+    PIPELINE = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "surveys.assets.SurveyStaticFilesStorage"},
+    }
+
+    def test_minify_keeps_strings_and_calc_spacing(self):
+        css = '/* note */\na > b ,\n.c:hover {\n  content: "a  ;  b";\n  width: calc(100% - 2px);\n}\n'
+        self.assertEqual(minify_css(css), 'a>b,.c:hover{content:"a  ;  b";width:calc(100% - 2px)}')
+
+    def test_critical_css_keeps_rules_for_the_templates_markup(self):
+        vocabulary = TemplateVocabulary(['<header class="site-header {% if x %}wide{% endif %}"><h1 id="t">x</h1>'])
+        css = minify_css(
+            ".site-header h1{color:red}.site-header .missing{color:blue}#t:hover,.footer{margin:0}"
+            "@media (max-width:10px){.site-header{padding:0}.footer{padding:0}}"
+            "@keyframes glow{to{opacity:1}}@keyframes unused{to{opacity:0}}h1::after{animation:glow 1s}"
+        )
+        self.assertEqual(
+            critical_css(css, vocabulary),
+            ".site-header h1{color:red}#t:hover{margin:0}@media (max-width:10px){.site-header{padding:0}}"
+            "h1::after{animation:glow 1s}@keyframes glow{to{opacity:1}}",
+        )
+
+    def test_collectstatic_builds_the_pipeline_and_pages_use_it(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        # The project's own files only: the survey pages use no app static files.
+        finders = ["django.contrib.staticfiles.finders.FileSystemFinder"]
+        with self.settings(STATIC_ROOT=root, STORAGES=self.PIPELINE, STATICFILES_FINDERS=finders):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            manifest = json.loads((root / "staticfiles.json").read_text())["paths"]
+            styles = root / manifest["styles.css"]
+            self.assertLess(styles.stat().st_size, (Path(settings.BASE_DIR) / "static/styles.css").stat().st_size)
+            self.assertTrue(Path(f"{styles}.gz").exists())
+            critical = (root / "critical/styles.css").read_text()
+            self.assertIn(".logo-mark img{", critical)
+            self.assertNotIn(".btn-secondary{", critical)  # only on the thank-you page
+
+            page = self.client.get(reverse("surveys:form")).content.decode()
+        self.assertIn(f"<style>{critical}</style>", page)
+        self.assertIn(f'<link rel="preload" href="/static/{manifest["styles.css"]}" as="style"', page)
+        self.assertIn(f'<noscript><link rel="stylesheet" href="/static/{manifest["styles.css"]}"></noscript>', page)
+        if "img/sva_logo.webp" in manifest:
+            self.assertIn(f'<source srcset="/static/{manifest["img/sva_logo.webp"]}" type="image/webp">', page)
+        self.assertIn(f'<img src="/static/{manifest["img/sva_logo.png"]}" alt="SVA logo">', page)
+
+    def test_pages_fall_back_to_plain_links_without_a_build(self):
+        page = self.client.get(reverse("surveys:form"))
+        self.assertContains(page, '<link rel="stylesheet" href="/static/styles.css">', html=True)
+        self.assertContains(page, '<img src="/static/img/sva_logo.png" alt="SVA logo">', html=True)
+        self.assertNotContains(page, "<picture>")
+
+
+class StartupTests(SimpleTestCase):
+    @staticmethod
+    def lazy_urlconf(loaded: list):
+        def loader():
+            loaded.append(True)
+            return [path("page/", views.csrf_token, name="page")]
+
+        class urlconf:
+            urlpatterns = [
+                LazyURLResolver(RoutePattern("lazy/", is_endpoint=False), loader, "lazy", "lazy"),
+                path("", views.survey_form, name="home"),
+            ]
+
+        return urlconf
+
+    def test_lazy_resolver_loads_patterns_on_first_request_under_it(self):
+        loaded = []
+        urlconf = self.lazy_urlconf(loaded)
+        self.assertEqual(resolve("/", urlconf=urlconf).url_name, "home")
+        self.assertEqual(loaded, [])
+        match = resolve("/lazy/page/", urlconf=urlconf)
+        self.assertEqual((match.namespace, match.url_name), ("lazy", "page"))
+        resolve("/lazy/page/", urlconf=urlconf)
+        self.assertEqual(loaded, [True])
+
+    def test_lazy_resolver_loads_patterns_on_first_reverse_in_its_namespace(self):
+        loaded = []
+        urlconf = self.lazy_urlconf(loaded)
+        self.assertEqual(reverse("home", urlconf=urlconf), "/")
+        self.assertEqual(loaded, [])
+        self.assertEqual(reverse("lazy:page", urlconf=urlconf), "/lazy/page/")
+        self.assertEqual(loaded, [True])
+
+    def test_admin_is_still_served_and_reversed(self):
+        self.assertEqual(reverse("admin:index"), "/admin/")
+        response = Client().get("/admin/login/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_importtime_summary(self):
+        records = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   tablib.core\n"
+            "import time:        50 |        150 | tablib\n"
+            "Traceback (most recent call last):\n"
+            "import time:       200 |        200 | django\n"
+        )
+        self.assertEqual([(r.module, r.depth) for r in records], [("tablib.core", 1), ("tablib", 0), ("django", 0)])
+        summary = summarize_imports(records, top=1)
+        self.assertEqual(summary["import_ms"], 0.35)
+        self.assertEqual(summary["slowest"], {"django": 0.2})
+        self.assertEqual(summary["packages"], {"django": 0.2})
+
+    def test_public_profile_does_not_import_admin_modules_at_startup(self):
+        out = io.StringIO()
+        call_command(
+            "bench_startup", profile=["public"], path="", repeat=1, forbid=["surveys.admin", "tablib"], stdout=out
+        )
+        self.assertIn("public: setup", out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "full: surveys.admin (1 modules), tablib"):
+            call_command(
+                "bench_startup", profile=["full"], path="", repeat=1, forbid=["surveys.admin", "tablib"],
+                stdout=io.StringIO(),
+            )
+
+
+@contextmanager
+def stand_in_replica():
+    """Route to a ``replica`` alias that shares the test database's connection, and so its transaction."""
+    with (
+        patch.dict(settings.DATABASES, {REPLICA: settings.DATABASES["default"]}),
+        override_settings(DATABASE_ROUTERS=["surveys.routers.ReplicaRouter"], SURVEY_REPLICA_CHECK_INTERVAL=0),
+    ):
+        setattr(connections._connections, REPLICA, connections["default"])
+        try:
+            yield
+        finally:
+            delattr(connections._connections, REPLICA)
+
+
+@contextmanager
+def routed_reads():
+    """Record the database each read of response data is routed to."""
+    seen = []
+    db_for_read = ReplicaRouter.db_for_read
+
+    def record(router, model, **hints):
+        database = db_for_read(router, model, **hints)
+        if model._meta.label_lower in REPLICA_MODELS:
+            seen.append(database or "default")
+        return database
+
+    with patch.object(ReplicaRouter, "db_for_read", record):
+        yield seen
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.response = SurveyResponse.objects.create(respondent_name="Ada")
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        self.url = reverse("admin:surveys_surveyresponse_changelist")
+        self.enterContext(stand_in_replica())
+
+    def test_reads_stay_on_the_primary_without_a_replica(self):
+        with patch.dict(settings.DATABASES):
+            del settings.DATABASES[REPLICA]
+            with replica_reads() as database:
+                self.assertEqual(database, "default")
+
+    def test_response_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        with replica_reads() as database:
+            self.assertEqual(database, REPLICA)
+            self.assertEqual(SurveyResponse.objects.all().db, REPLICA)
+            self.assertEqual(Question.objects.all().db, "default")
+            written = SurveyResponse.objects.create(respondent_name="Grace")
+        self.assertEqual(written._state.db, "default")
+        self.assertEqual(SurveyResponse.objects.all().db, "default")
+
+    def test_lagging_or_unreachable_replica_falls_back_to_the_primary(self):
+        with self.settings(SURVEY_REPLICA_MAX_LAG=-1), replica_reads() as database:
+            self.assertEqual(database, "default")
+            self.assertEqual(SurveyResponse.objects.all().db, "default")
+        with patch("surveys.routers.replica_lag", return_value=None), replica_reads() as database:
+            self.assertEqual(database, "default")
+
+    def test_one_thread_checks_the_lag_while_the_others_use_the_last_state(self):
+        checking, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow_lag():
+            calls.append(threading.get_ident())
+            checking.set()
+            release.wait(5)
+            return None
+
+        with self.settings(SURVEY_REPLICA_CHECK_INTERVAL=0):
+            self.assertEqual(_health.current(), "replica")
+            results = []
+            with patch("surveys.routers.replica_lag", slow_lag):
+                checker = threading.Thread(target=lambda: results.append(_health.current()))
+                checker.start()
+                self.assertTrue(checking.wait(5))
+                self.assertEqual(_health.current(), "replica")
+                release.set()
+                checker.join()
+            self.assertEqual(results, ["unavailable"])
+            self.assertEqual(len(calls), 1)
+
+    def test_in_context_keeps_the_routing_of_the_view(self):
+        def rows():
+            yield SurveyResponse.objects.all().db
+
+        with replica_reads():
+            routed, unrouted = in_context(rows()), rows()
+        # Both are read after the block, like the content of a streaming response.
+        self.assertEqual(list(routed), [REPLICA])
+        self.assertEqual(list(unrouted), ["default"])
+
+    def test_changelist_and_streaming_export_read_the_replica(self):
+        with routed_reads() as seen:
+            self.assertContains(self.client.get(self.url), "Ada")
+            self.assertEqual(set(seen), {REPLICA})
+            response = self.client.post(
+                self.url, {"action": "export_detailed_csv_stream", "_selected_action": [self.response.pk]}
+            )
+            seen.clear()
+            self.assertIn("Ada", b"".join(response.streaming_content).decode())
+            self.assertEqual(set(seen), {REPLICA})
+
+    def test_admin_post_pins_the_browser_to_the_primary(self):
+        response = self.client.post(self.url, {"action": "delete_selected"})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        with routed_reads() as seen:
+            self.client.get(self.url)
+        self.assertEqual(set(seen), {"default"})
+
+        self.client.cookies.pop(PIN_COOKIE)
+        with routed_reads() as seen:
+            self.client.get(self.url)
+        self.assertEqual(set(seen), {REPLICA})
+
+    def test_survey_submission_does_not_pin(self):
+        response = self.client.post(reverse("surveys:form"), {})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
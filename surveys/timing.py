@@ -0,0 +1,168 @@
+"""
+Per-request phase timings, reported as a ``Server-Timing`` header and a log line.
+
+``ServerTimingMiddleware`` keeps a ``RequestTimer`` in a context variable for
+the duration of a request. Code marks its phases with ``with phase("name"):``,
+which costs one context-variable lookup when nothing is being timed. Every
+database connection gets ``count_query`` as an execute wrapper when it is
+created, adding each query's count and duration to the current timer. Threads
+started by ``sync_to_async`` inherit the context, so their queries count too.
+"""
+
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import cc_delim_re
+
+from . import metrics
+
+logger = logging.getLogger("surveys.timing")
+
+# Other methods are counted as "other" so clients cannot add metric series.
+_METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+
+_current: ContextVar["RequestTimer | None"] = ContextVar("surveys_request_timer", default=None)
+
+
+class RequestTimer:
+    __slots__ = ("started", "phases", "queries", "query_seconds")
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.phases: dict[str, float] = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        # Phases may nest (``save`` contains ``insert``); durations are in milliseconds.
+        parts = [f"{name};dur={seconds * 1e3:.1f}" for name, seconds in self.phases.items()]
+        parts.append(f'db;dur={self.query_seconds * 1e3:.1f};desc="{self.queries} queries"')
+        parts.append(f"total;dur={total * 1e3:.1f}")
+        return ", ".join(parts)
+
+    def record(self, request, response, total: float) -> dict:
+        return {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1e3, 2),
+            "db_queries": self.queries,
+            "db_ms": round(self.query_seconds * 1e3, 2),
+            "phases_ms": {name: round(seconds * 1e3, 2) for name, seconds in self.phases.items()},
+        }
+
+
+def current() -> RequestTimer | None:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to phase ``name`` of the current request, if timed."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, perf_counter() - started)
+
+
+def count_query(execute, sql, params, many, context):
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.query_seconds += perf_counter() - started
+
+
+def shared_cacheable(response) -> bool:
+    """Whether shared caches may store ``response``, which then must not carry per-request timings."""
+    directives = {
+        directive.split("=", 1)[0].strip().lower()
+        for directive in cc_delim_re.split(response.get("Cache-Control", ""))
+    }
+    return not directives.isdisjoint({"public", "s-maxage"})
+
+
+def install(connection) -> None:
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request and add ``Server-Timing``, except to responses that shared
+    caches may store and would replay to everyone. One ``surveys.timing`` log
+    line per request is written at INFO, or at WARNING once it takes at least
+    ``SURVEY_SLOW_REQUEST_MS``. With ``SURVEY_METRICS``, the duration and query
+    count also go to the per-view histograms of ``surveys.metrics``, and the
+    statistics of any connection pool to its pool counters.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.header = getattr(settings, "SURVEY_SERVER_TIMING", True)
+        self.metrics = metrics.enabled()
+        if not self.header and not self.metrics:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, "SURVEY_SLOW_REQUEST_MS", 1000) / 1e3
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(timer, request, response)
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(timer, request, response)
+
+    def finish(self, timer: RequestTimer, request, response):
+        total = perf_counter() - timer.started
+        if self.metrics:
+            match = request.resolver_match
+            view = match.view_name if match is not None else "unresolved"
+            method = request.method if request.method in _METHODS else "other"
+            metrics.request_duration.observe(total, view=view, method=method)
+            metrics.request_queries.observe(timer.queries, view=view)
+            metrics.collect_pool_stats()
+        if not self.header:
+            return response
+        if not shared_cacheable(response):
+            response["Server-Timing"] = timer.header(total)
+        level = logging.WARNING if total >= self.slow_seconds else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(timer.record(request, response, total)))
+        return response
@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
 app_name = "surveys"
 
+if getattr(settings, "SURVEY_ASYNC_VIEWS", False):
+    survey_form_view, thank_you_view = views.survey_form_async, views.thank_you_async
+else:
+    survey_form_view, thank_you_view = views.survey_form, views.thank_you
+
 urlpatterns = [
-    path("", views.survey_form, name="form"),
-    path("thanks/", views.thank_you, name="thank_you"),
+    path("", survey_form_view, name="form"),
+    path("thanks/", thank_you_view, name="thank_you"),
+    path("csrf/", views.csrf_token, name="csrf"),
+    path("metrics", views.metrics_view, name="metrics"),
 ]
 
@@ -1,81 +1,140 @@
+import hashlib
+import threading
+import uuid
+
+from asgiref.sync import sync_to_async
 from django import forms
-from django.contrib import messages
+from django.conf import settings
+from django.core import signing
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import urlencode
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+
+from . import metrics
+from .catalog import aget_catalog, get_catalog
+from .forms import SurveyForm, get_survey_form_class
+from .spool import get_spool
+from .submissions import Submission, asave_submission, save_submission
+from .timing import phase
 
-from .forms import SurveyForm
-from .models import Question, SurveyAnswer, SurveyResponse
+CONFIRMATION_SALT = "surveys.thank_you"
+INVALID_FORM_MESSAGE = "Please correct the errors below and try again."
 
 
 def survey_form(request):
-    questions = list(
-        Question.objects.filter(is_active=True)
-        .order_by("id")
-        .prefetch_related("options")
-    )
-    has_questions = len(questions) > 0
+    with phase("catalog"):
+        catalog = get_catalog()
+        questions = catalog.questions
+        has_questions = len(questions) > 0
+        form_class = get_survey_form_class(catalog)
 
     if request.method == "POST":
-        form = SurveyForm(request.POST, questions=questions)
-        if form.is_valid():
+        with phase("validate"):
+            form = form_class(request.POST)
+            valid = form.is_valid()
+        if valid:
             try:
-                # Determine respondent_role based on Q1 answer
-                q1_answer = form.cleaned_data.get("question_1", "")
-                if q1_answer in ["developer", "founder"]:
-                    respondent_role = SurveyResponse.RespondentRole.BUILDERS
-                else:
-                    respondent_role = form.cleaned_data.get("respondent_role", SurveyResponse.RespondentRole.GENERAL)
-                
-                response = SurveyResponse.objects.create(
-                    respondent_name=form.cleaned_data.get("respondent_name", "").strip(),
-                    respondent_email=form.cleaned_data.get("respondent_email", "").strip(),
-                    respondent_role=respondent_role,
-                )
-                answers = []
-                for question in questions:
-                    field_name = SurveyForm.answer_field_name(question)
-                    answer_value = form.cleaned_data.get(field_name, "")
-                    if not answer_value:
-                        continue
-                    options = list(question.options.all())
-                    if options:
-                        option_lookup = {opt.value: opt for opt in options}
-                        selected_option = option_lookup.get(answer_value)
-                        answer_text = (
-                            selected_option.label if selected_option else answer_value
-                        )
+                with phase("save"):
+                    submission = Submission.from_form(catalog, form.cleaned_data)
+                    spool = get_spool()
+                    if spool is not None:
+                        created = spool.append(submission)
                     else:
-                        answer_text = answer_value
-                    answers.append(
-                        SurveyAnswer(
-                            response=response,
-                            question=question,
-                            answer_text=answer_text,
-                        )
-                    )
-                if answers:
-                    SurveyAnswer.objects.bulk_create(answers)
-                messages.success(
-                    request,
-                    "Thanks for sharing! Your responses were saved successfully.",
-                )
-                return redirect(reverse("surveys:thank_you"))
+                        _, created = save_submission(submission)
+                metrics.record_submission(submission, "spool" if spool is not None else "direct", created)
+                return _thank_you_redirect(submission)
             except Exception as e:
-                messages.error(
-                    request,
-                    f"An error occurred while saving your response: {str(e)}",
-                )
+                error_message = f"An error occurred while saving your response: {str(e)}"
         else:
             # Form is invalid - errors will be displayed in template
-            messages.error(
-                request,
-                "Please correct the errors below and try again.",
-            )
+            metrics.record_validation_errors(form)
+            error_message = INVALID_FORM_MESSAGE
+    else:
+        if getattr(settings, "SURVEY_EDGE_CACHE", False):
+            return _edge_cached_form(request, catalog)
+        form = form_class(initial={"submission_id": uuid.uuid4()}) if has_questions else None
+        error_message = None
+
+    with phase("render"):
+        return render(request, "surveys/survey_form.html", _form_context(form, questions, error_message))
+
+
+async def survey_form_async(request):
+    """
+    Native async ``survey_form`` for the ASGI deployment.
+
+    Catalog loading and the submission use the async ORM; rendering the form
+    page reads neither the session nor the database, so it runs on the loop.
+    """
+    with phase("catalog"):
+        catalog = await aget_catalog()
+        questions = catalog.questions
+        form_class = get_survey_form_class(catalog)
+
+    if request.method == "POST":
+        with phase("validate"):
+            form = form_class(request.POST)
+            valid = form.is_valid()
+        if valid:
+            try:
+                with phase("save"):
+                    submission = Submission.from_form(catalog, form.cleaned_data)
+                    spool = get_spool()
+                    if spool is not None:
+                        # The spool fsyncs a local SQLite file; keep that off the loop.
+                        created = await sync_to_async(spool.append, thread_sensitive=False)(submission)
+                    else:
+                        _, created = await asave_submission(submission)
+                metrics.record_submission(submission, "spool" if spool is not None else "direct", created)
+                return _thank_you_redirect(submission)
+            except Exception as e:
+                error_message = f"An error occurred while saving your response: {str(e)}"
+        else:
+            metrics.record_validation_errors(form)
+            error_message = INVALID_FORM_MESSAGE
     else:
-        form = SurveyForm(questions=questions) if has_questions else None
+        if getattr(settings, "SURVEY_EDGE_CACHE", False):
+            return _edge_cached_form(request, catalog)
+        form = form_class(initial={"submission_id": uuid.uuid4()}) if questions else None
+        error_message = None
+
+    with phase("render"):
+        return render(request, "surveys/survey_form.html", _form_context(form, questions, error_message))
+
+
+def _thank_you_redirect(submission):
+    """
+    Redirect to the thank-you page with a signed, timestamped confirmation of
+    ``submission`` in the URL, so no message has to be stored in the session.
+    """
+    token = signing.dumps(str(submission.submission_id), salt=CONFIRMATION_SALT)
+    return redirect(f"{reverse('surveys:thank_you')}?{urlencode({'confirmation': token})}")
 
+
+def _is_confirmed(request) -> bool:
+    """Whether the request carries a confirmation token that is valid and recent enough."""
+    token = request.GET.get("confirmation")
+    if not token:
+        return False
+    try:
+        signing.loads(
+            token, salt=CONFIRMATION_SALT, max_age=getattr(settings, "SURVEY_CONFIRMATION_MAX_AGE", 600)
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _form_context(form, questions, error_message=None):
     question_field_pairs = []
-    if has_questions and form is not None:
+    if questions and form is not None:
         for question in questions:
             field_name = SurveyForm.answer_field_name(question)
             bound_field = form[field_name]
@@ -86,18 +145,96 @@ def survey_form(request):
                     "is_radio": isinstance(bound_field.field.widget, forms.RadioSelect),
                 }
             )
+    return {
+        "form": form,
+        "error_message": error_message,
+        "questions": questions,
+        "question_field_pairs": question_field_pairs,
+        "no_questions": not questions,
+    }
+
+
+class _EdgePage:
+    """The anonymous survey page, rendered once per catalog version."""
+
+    def __init__(self, version: str, content: bytes, surrogate_keys: tuple[str, ...]):
+        self.version = version
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+        self.surrogate_keys = surrogate_keys
+
+
+_edge_page: _EdgePage | None = None
+_edge_page_lock = threading.Lock()
+
+
+def _get_edge_page(catalog) -> _EdgePage:
+    global _edge_page
+    page = _edge_page
+    if page is not None and page.version == catalog.version:
+        return page
+    with _edge_page_lock:
+        page = _edge_page
+        if page is None or page.version != catalog.version:
+            questions = catalog.questions
+            form = get_survey_form_class(catalog)() if questions else None
+            context = _form_context(form, questions)
+            context["edge_cache"] = True
+            context["csrf_cookie_name"] = settings.CSRF_COOKIE_NAME
+            # No request: the page must not depend on the visitor (CSRF, session).
+            content = render_to_string("surveys/survey_form.html", context).encode()
+            page = _EdgePage(
+                catalog.version,
+                content,
+                ("survey-form", f"survey-catalog-{catalog.digest}"),
+            )
+            _edge_page = page
+    return page
+
 
-    return render(
-        request,
-        "surveys/survey_form.html",
-        {
-            "form": form,
-            "questions": questions,
-            "question_field_pairs": question_field_pairs,
-            "no_questions": not has_questions,
-        },
+def _edge_cached_form(request, catalog):
+    """
+    Serve the shared survey page with a strong ETag so Cloudflare (or any shared
+    cache) can store it; the CSRF token is fetched by the page from ``csrf_token``.
+    """
+    page = _get_edge_page(catalog)
+    response = HttpResponse(page.content)
+    response["ETag"] = page.etag
+    response["Surrogate-Key"] = " ".join(page.surrogate_keys)
+    response["Cache-Tag"] = ",".join(page.surrogate_keys)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=getattr(settings, "SURVEY_EDGE_MAX_AGE", 0),
+        s_maxage=getattr(settings, "SURVEY_EDGE_S_MAXAGE", 300),
     )
+    return get_conditional_response(request, etag=page.etag, response=response)
+
+
+@never_cache
+def metrics_view(request):
+    """Prometheus scrape endpoint; requires ``Authorization: Bearer <SURVEY_METRICS_TOKEN>``."""
+    token = getattr(settings, "SURVEY_METRICS_TOKEN", "")
+    # Without a token the endpoint does not exist: the counters are not for the public.
+    if not metrics.enabled() or not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@never_cache
+@ensure_csrf_cookie
+def csrf_token(request):
+    return JsonResponse({"token": get_token(request)})
 
 
 def thank_you(request):
-    return render(request, "surveys/thank_you.html")
+    with phase("render"):
+        return render(request, "surveys/thank_you.html", {"confirmed": _is_confirmed(request)})
+
+
+async def thank_you_async(request):
+    # The page reads neither the session nor the database, so it renders on the loop.
+    with phase("render"):
+        return render(request, "surveys/thank_you.html", {"confirmed": _is_confirmed(request)})